@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Local stand-in for api.meetup.com serving a synthetic Dataset
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+import contextlib
+import functools
+import json
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, urlencode, urlparse
+
+import meetup.api
+from meetup.api import MeetupTransport
+
+MEETUP_URL = "https://api.meetup.com"
+
+# ########################################################################### #
+
+class FakeMeetupAPI (object):
+    """ HTTP server on localhost answering /2/groups and /2/events
+
+    Events are paginated like api.meetup.com v2: ``page`` records per page,
+    ``offset`` pages in, with ``meta.next`` linking the next page. Every
+    response carries ``X-RateLimit-*`` headers for a window of
+    ``rate_limit`` requests per ``rate_window`` seconds; requests over the
+    limit are answered with a 429.
+
+    Use as a context manager and hand ``transport()`` to a MeetupClient.
+
+    Parameters
+    dataset : benchmarks.generators.Dataset
+    rate_limit : int
+    rate_window : float
+        seconds
+    latency : float
+        seconds slept before answering each request
+    """
+
+    def __init__ (self,dataset,rate_limit=100000,rate_window=10,latency=0):
+        self.dataset = dataset
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_count = 0
+        self._server = None
+        self._thread = None
+
+    # ======================= lifecycle
+    @property
+    def url (self):
+        host,port = self._server.server_address[:2]
+        return "http://{}:{}".format(host,port)
+
+    def start (self):
+        self._server = _Server(('127.0.0.1',0),_Handler)
+        self._server.api = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop (self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__ (self):
+        return self.start()
+
+    def __exit__ (self,*exc_info):
+        self.stop()
+
+    def transport (self,**kwargs):
+        """ A MeetupTransport sending api.meetup.com requests here """
+        return LocalTransport(self.url,**kwargs)
+
+    @contextlib.contextmanager
+    def redirect (self):
+        """ Every MeetupClient built inside the block talks to this server
+
+        For code such as the management command which builds its own clients.
+        """
+        original = meetup.api.MeetupTransport
+        meetup.api.MeetupTransport = functools.partial(LocalTransport,self.url)
+        try:
+            yield self
+        finally:
+            meetup.api.MeetupTransport = original
+
+    # ======================= responses
+    def rate_limit_headers (self):
+        """ Spend one request of the window, returns (allowed, headers) """
+        with self._lock:
+            self.requests += 1
+            now = time.time()
+            if now-self._window_start >= self.rate_window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            remaining = self.rate_limit-self._window_count
+            reset = max(1,int(round(self._window_start+self.rate_window-now)))
+        headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(max(0,remaining)),
+            'X-RateLimit-Reset': str(reset),
+        }
+        return remaining >= 0,headers
+
+    def respond (self,path,params):
+        """ Returns (status, body) for a GET of path with query params """
+        if path.rstrip('/') == '/2/groups':
+            ids = [int(i) for i in params.get('group_id','').split(',') if i]
+            results = [self.dataset.group(i) for i in ids if i in self.dataset.group_ids]
+            return 200,{'results':results,'meta':self._meta(path,params,len(results),False)}
+        if path.rstrip('/') == '/2/events':
+            group_id = int(params.get('group_id',0))
+            if group_id not in self.dataset.group_ids:
+                return 200,{'results':[],'meta':self._meta(path,params,0,False)}
+            page = int(params.get('page',200))
+            offset = int(params.get('offset',0))
+            start = offset*page
+            results = list(self.dataset.iter_events(group_id,start,start+page))
+            more = start+page < self.dataset.events_per_group
+            return 200,{'results':results,'meta':self._meta(path,params,len(results),more)}
+        return 404,{'problem':"Not found",'details':"no fake for {}".format(path)}
+
+    def _meta (self,path,params,count,more):
+        next_url = ""
+        if more:
+            next_params = dict(params,offset=int(params.get('offset',0))+1)
+            next_url = "{}{}?{}".format(MEETUP_URL,path,urlencode(sorted(next_params.items())))
+        return {
+            'count': count,
+            'total_count': self.dataset.events_per_group,
+            'next': next_url,
+        }
+
+
+class LocalTransport (MeetupTransport):
+    """ MeetupTransport which sends api.meetup.com urls to another host """
+
+    def __init__ (self,base_url,**kwargs):
+        super(LocalTransport,self).__init__(**kwargs)
+        self.base_url = base_url
+
+    def request (self,method,url,**kwargs):
+        if url.startswith(MEETUP_URL):
+            url = self.base_url+url[len(MEETUP_URL):]
+        return super(LocalTransport,self).request(method,url,**kwargs)
+
+
+class _Server (socketserver.ThreadingMixIn,BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    # keep-alive clients reconnect less under load
+    request_queue_size = 128
+
+
+class _Handler (BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET (self):
+        api = self.server.api
+        if api.latency:
+            time.sleep(api.latency)
+        parsed = urlparse(self.path)
+        params = {k:v[-1] for k,v in parse_qs(parsed.query).items()}
+        allowed,headers = api.rate_limit_headers()
+        if allowed:
+            status,body = api.respond(parsed.path,params)
+        else:
+            status,body = 429,{'errors':[{'code':'throttled'}]}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type','application/json;charset=utf-8')
+        self.send_header('Content-Length',str(len(data)))
+        for key,value in headers.items():
+            self.send_header(key,value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message (self,format,*args):
+        pass
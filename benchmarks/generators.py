@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Synthetic Meetup groups, venues and events for benchmarks
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+import random
+
+# 2014-09-21 22:36:04 UTC in ms, the first synthetic event
+BASE_TIME_MS = 1411338964000
+HOUR_MS = 3600 * 1000
+TIMEZONES = ("US/Mountain", "US/Eastern", "Europe/London", "Asia/Tokyo")
+STATUSES = ("past",) * 8 + ("upcoming", "cancelled")
+
+# ########################################################################### #
+
+class Dataset (object):
+    """ Deterministic synthetic Meetup data
+
+    Records are built on demand from their index, so a dataset of a million
+    events costs no memory until it is iterated.
+
+    Parameters
+    n_groups : int
+    events_per_group : int
+    venues_per_group : int
+    seed : int
+        seeds the rsvp counts
+    description_size : int
+        characters in each event description
+    """
+
+    def __init__ (self,n_groups=1,events_per_group=1000,venues_per_group=5,
+                  seed=0,description_size=400):
+        self.n_groups = n_groups
+        self.events_per_group = events_per_group
+        self.venues_per_group = venues_per_group
+        self.seed = seed
+        self.description_size = description_size
+
+    @property
+    def group_ids (self):
+        return [self.group_id(i) for i in range(self.n_groups)]
+
+    @property
+    def n_events (self):
+        return self.n_groups*self.events_per_group
+
+    def group_id (self,index):
+        return 1000+index
+
+    def group (self,group_id):
+        index = group_id-1000
+        return {
+            'id': group_id,
+            'name': "Benchmark Group {}".format(index),
+            'urlname': "benchmark-group-{}".format(index),
+            'link': "https://www.meetup.com/benchmark-group-{}/".format(index),
+            'city': "Salt Lake City",
+            'state': "UT",
+            'country': "us",
+            'lat': 40.76,
+            'lon': -111.89,
+            'members': 100+index,
+            'who': "Members",
+            'visibility': "public",
+            'join_mode': "open",
+            'timezone': TIMEZONES[index % len(TIMEZONES)],
+            'created': BASE_TIME_MS-365*24*HOUR_MS,
+        }
+
+    def venue (self,group_id,index):
+        venue_id = group_id*1000+index
+        return {
+            'id': venue_id,
+            'name': "Venue {}".format(venue_id),
+            'address_1': "{} Main St".format(index+1),
+            'city': "Salt Lake City",
+            'state': "UT",
+            'country': "us",
+            'localized_country_name': "USA",
+            'lat': 40.7+index/100.0,
+            'lon': -111.8-index/100.0,
+            'repinned': False,
+        }
+
+    def event (self,group_id,index):
+        event_id = (group_id-1000)*self.events_per_group+index+1
+        rng = random.Random(self.seed*1000003+event_id)
+        time_ms = BASE_TIME_MS+index*24*HOUR_MS
+        return {
+            'id': str(event_id),
+            'name': "Event {}".format(event_id),
+            'status': STATUSES[index % len(STATUSES)],
+            'visibility': "public",
+            'event_url': "https://www.meetup.com/benchmark/events/{}/".format(event_id),
+            'description': ("lorem ipsum "*(self.description_size//12+1))[:self.description_size],
+            'headcount': 0,
+            'yes_rsvp_count': rng.randint(0,200),
+            'waitlist_count': 0,
+            'maybe_rsvp_count': 0,
+            'time': time_ms,
+            'created': time_ms-30*24*HOUR_MS,
+            'updated': time_ms-HOUR_MS,
+            'utc_offset': -21600000,
+            'duration': 2*HOUR_MS,
+            'group': {
+                'id': group_id,
+                'name': "Benchmark Group {}".format(group_id-1000),
+                'urlname': "benchmark-group-{}".format(group_id-1000),
+                'who': "Members",
+                'join_mode': "open",
+                'created': BASE_TIME_MS-365*24*HOUR_MS,
+                'group_lat': 40.76,
+                'group_lon': -111.89,
+            },
+            'venue': self.venue(group_id,index % self.venues_per_group),
+        }
+
+    def iter_events (self,group_id,start=0,stop=None):
+        stop = self.events_per_group if stop is None else min(stop,self.events_per_group)
+        for index in range(start,stop):
+            yield self.event(group_id,index)
+
+    def iter_all_events (self):
+        for group_id in self.group_ids:
+            for event in self.iter_events(group_id):
+                yield event
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Measure sync throughput, queries per event and peak memory
+
+    python -m benchmarks.run --events 10000
+    python -m benchmarks.run --bench models --events 1000000 --json results.json
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE","benchmarks.settings")
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+
+from benchmarks.fake_api import FakeMeetupAPI
+from benchmarks.generators import Dataset
+from meetup.api import MeetupClient
+from meetup.models import Event, Group, Venue
+from meetup.retry import NO_RETRY
+from meetup.sync import iter_batches
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has no allocation tracing, peak memory is not reported
+    tracemalloc = None
+
+BENCHMARKS = ('models','client','command')
+
+# ########################################################################### #
+
+class Measurement (object):
+    """ Wall time, database queries and peak Python memory of a block """
+
+    def __init__ (self,name,events):
+        self.name = name
+        self.events = events
+        self.seconds = 0.0
+        self.queries = 0
+        self.peak_bytes = None
+
+    @contextlib.contextmanager
+    def measure (self):
+        def count_query (execute,sql,params,many,context):
+            self.queries += 1
+            return execute(sql,params,many,context)
+
+        gc.collect()
+        if tracemalloc is not None:
+            tracemalloc.start()
+        start = time.time()
+        try:
+            with connection.execute_wrapper(count_query):
+                yield self
+        finally:
+            self.seconds = time.time()-start
+            if tracemalloc is not None:
+                self.peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    @property
+    def events_per_second (self):
+        return self.events/self.seconds if self.seconds else 0.0
+
+    @property
+    def queries_per_event (self):
+        return self.queries/self.events if self.events else 0.0
+
+    def as_dict (self):
+        return OrderedDict([
+            ('name',self.name),
+            ('events',self.events),
+            ('seconds',round(self.seconds,6)),
+            ('events_per_second',round(self.events_per_second,1)),
+            ('queries',self.queries),
+            ('queries_per_event',round(self.queries_per_event,3)),
+            ('peak_bytes',self.peak_bytes),
+        ])
+
+    def __str__ (self):
+        peak = "n/a" if self.peak_bytes is None else "{:.1f} MiB".format(self.peak_bytes/2.0**20)
+        return "{:<24} {:>9} events {:>10.1f} events/s {:>8.3f} queries/event  peak {}".format(
+            self.name,self.events,self.events_per_second,self.queries_per_event,peak)
+
+
+def reset_database ():
+    Event.objects.all().delete()
+    Venue.objects.all().delete()
+    # sync state rows go with their groups
+    Group.objects.all().delete()
+
+def sync_groups (dataset,related):
+    """ Write the groups first, as meetup.sync does from /2/groups """
+    for group_id in dataset.group_ids:
+        Group.objects.from_meetup_data(dataset.group(group_id),related=related)
+
+# ======================= benchmarks
+
+def bench_models (dataset,batch_size,per_record_events):
+    """ Event.objects.from_meetup_data one event at a time against
+    bulk_from_meetup_data in batches, inserting then re-syncing unchanged data
+    """
+    results = []
+    n = min(per_record_events,dataset.events_per_group)
+    group_id = dataset.group_ids[0]
+    reset_database()
+    m = Measurement("models.per_record",n)
+    with m.measure():
+        related = {}
+        sync_groups(dataset,related)
+        for md in dataset.iter_events(group_id,0,n):
+            Event.objects.from_meetup_data(md,related=related)
+    results.append(m)
+
+    for name in ("models.bulk_insert","models.bulk_unchanged"):
+        if name == "models.bulk_insert":
+            reset_database()
+        m = Measurement(name,dataset.n_events)
+        with m.measure():
+            related = {}
+            sync_groups(dataset,related)
+            for batch in iter_batches(dataset.iter_all_events(),batch_size):
+                Event.objects.bulk_from_meetup_data(batch,related=related,batch_size=batch_size)
+        results.append(m)
+    return results
+
+def bench_client (dataset,api):
+    """ MeetupClient.iter_results paging through every event of every group """
+    client = MeetupClient("benchmark-key",transport=api.transport(),retry_policy=NO_RETRY)
+    m = Measurement("client.iter_results",dataset.n_events)
+    with client, m.measure():
+        count = 0
+        for group_id in dataset.group_ids:
+            params = {'group_id':group_id,'status':"past,upcoming,cancelled"}
+            for _ in client.iter_results("/2/events",params):
+                count += 1
+    if count != dataset.n_events:
+        raise RuntimeError("client read {} of {} events".format(count,dataset.n_events))
+    return [m]
+
+def bench_command (dataset,api,workers):
+    """ The sync_group_events management command, full sync of every group """
+    reset_database()
+    m = Measurement("command.full_sync",dataset.n_events)
+    args = [str(gid) for gid in dataset.group_ids]
+    args += ['--full','--workers',str(workers)]
+    with open(os.devnull,'w') as devnull, api.redirect(), m.measure():
+        call_command('sync_group_events',*args,stdout=devnull)
+    synced = Event.objects.count()
+    if synced != dataset.n_events:
+        raise RuntimeError("command synced {} of {} events".format(synced,dataset.n_events))
+    return [m]
+
+# ########################################################################### #
+
+def main (argv=None):
+    parser = argparse.ArgumentParser(description="Measure sync throughput, queries per event and peak memory")
+    parser.add_argument('--events',type=int,default=10000,help="events per group")
+    parser.add_argument('--groups',type=int,default=1,help="number of groups")
+    parser.add_argument('--venues',type=int,default=5,help="venues per group")
+    parser.add_argument('--bench',choices=('all',)+BENCHMARKS,default='all')
+    parser.add_argument('--batch-size',type=int,default=500)
+    parser.add_argument('--per-record-events',type=int,default=2000,
+                        help="events synced one at a time, it is slow")
+    parser.add_argument('--workers',type=int,default=1,
+                        help="command workers, needs BENCHMARK_DB with more than 1")
+    parser.add_argument('--latency',type=float,default=0,
+                        help="seconds the fake api sleeps per request")
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--json',metavar='PATH',help="also write the results as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    call_command('migrate',run_syncdb=True,verbosity=0)
+    dataset = Dataset(n_groups=args.groups,events_per_group=args.events,
+                      venues_per_group=args.venues,seed=args.seed)
+    benches = BENCHMARKS if args.bench == 'all' else (args.bench,)
+    results = []
+    with FakeMeetupAPI(dataset,latency=args.latency) as api:
+        for bench in benches:
+            if bench == 'models':
+                measured = bench_models(dataset,args.batch_size,args.per_record_events)
+            elif bench == 'client':
+                measured = bench_client(dataset,api)
+            else:
+                measured = bench_command(dataset,api,args.workers)
+            for m in measured:
+                print(m)
+            results.extend(measured)
+
+    if args.json:
+        report = OrderedDict([
+            ('python',sys.version.split()[0]),
+            ('django',django.get_version()),
+            ('groups',args.groups),
+            ('events_per_group',args.events),
+            ('batch_size',args.batch_size),
+            ('results',[m.as_dict() for m in results]),
+        ])
+        text = json.dumps(report,indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json,'w') as fp:
+                fp.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Django settings for running the benchmarks
+"""
+# ########################################################################### #
+
+import os
+
+SECRET_KEY = "benchmarks"
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django.contrib.auth',
+    'meetup',
+]
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # BENCHMARK_DB=path keeps the database between runs
+        'NAME': os.environ.get('BENCHMARK_DB', ':memory:'),
+    }
+}
+USE_TZ = True
+MEETUP_KEY = "benchmark-key"
+MEETUP_GROUP_ID = 1000
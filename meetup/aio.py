@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Asyncio client for the Meetup.com API (Python 3.5+ only)
+"""
+# ########################################################################### #
+
+import asyncio
+import functools
+import weakref
+
+from meetup.api import MeetupClient, MeetupTransport
+from meetup.exceptions import MeetupConnectionError, MeetupHTTPError
+from meetup.signals import rate_limit_waited
+
+
+class AsyncMeetupClient(object):
+    """Asyncio counterpart of MeetupClient.
+
+    Requests run on the pooled transport in the event loop's executor, so many
+    groups can be fetched at once while at most ``max_concurrency`` requests
+    are in flight. Waiting on the rate limit sleeps with ``asyncio.sleep`` and
+    does not block the loop.
+
+    Args:
+        api_key (str): see https://secure.meetup.com/meetup_api/key/
+        oauth_token (str): OAuth bearer token used instead of the api_key
+        max_concurrency (int): maximum number of requests in flight
+        transport: object with a ``request(method, url, **kwargs)`` method,
+            by default a MeetupTransport pooled for ``max_concurrency``
+        loop: event loop to run on, by default the loop running each call,
+            so one client can serve several ``asyncio.run()``
+        executor: ``concurrent.futures.Executor`` running the requests,
+            the loop's default executor when None
+        rate_limiter: see MeetupClient
+        retry_policy: see MeetupClient
+    """
+
+    def __init__(self, api_key=None, oauth_token=None, max_concurrency=10,
+                 transport=None, loop=None, executor=None, rate_limiter=None,
+                 retry_policy=None):
+        if transport is None:
+            transport = MeetupTransport(pool_maxsize=max_concurrency)
+        self.client = MeetupClient(
+            api_key,
+            oauth_token,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy
+        )
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self._loop = loop
+        # loop -> the semaphore bounding the requests in flight on it
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _running_loop(self):
+        """The loop given to the client, else the one running the caller.
+
+        Looked up on each call rather than cached: a loop is closed at the
+        end of its ``asyncio.run()``.
+        """
+        if self._loop is not None:
+            return self._loop
+        # get_event_loop() is the running loop inside a coroutine on 3.5/3.6
+        get_running_loop = getattr(asyncio, 'get_running_loop',
+                                   asyncio.get_event_loop)
+        return get_running_loop()
+
+    def _semaphore(self):
+        """Semaphore of the running loop, a semaphore binds to one loop."""
+        loop = self._running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Releases the connections held by the transport."""
+        self.client.close()
+
+    async def invoke(self, meetup_method, params=None, method='GET'):
+        """Awaitable version of ``MeetupClient.invoke``.
+
+        Returns:
+            response : dict
+        """
+        url, params = self.client._prepare_invoke(meetup_method, params, method)
+        url, kwargs = self.client._request_args(method, url, params)
+        return await self._request(method, url, **kwargs)
+
+    async def get_next_page(self, page):
+        """Awaitable version of ``MeetupClient.get_next_page``.
+
+        Returns:
+            None if no next page, or fetched next page
+        """
+        url = self.client._next_page_url(page)
+        if url is None:
+            return None
+        return await self._request('GET', url)
+
+    async def get_events(self, id_type="group", **kwargs):
+        kwargs = kwargs.copy()
+        kwargs.setdefault('status', "upcoming,past")
+        return await self.invoke("2/events", kwargs)
+
+    async def get_profiles(self, **kwargs):
+        return await self.invoke('2/profiles/', kwargs)
+
+    async def _wait_on_rate_limit_reached(self):
+        """Waits for the end of the rate limit time window without blocking."""
+        wait_seconds = self.client._rate_limit_wait_seconds()
+        if wait_seconds:
+            await asyncio.sleep(wait_seconds)
+            rate_limit_waited.send(sender=self.client, seconds=wait_seconds)
+
+    async def _request(self, method, url, **kwargs):
+        """Sends a request, retrying transient failures without blocking."""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self._send(method, url, **kwargs)
+            except (MeetupConnectionError, MeetupHTTPError) as error:
+                policy = self.client.retry_policy
+                delay = policy.get_delay(method, attempt, error)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _send(self, method, url, **kwargs):
+        """Sends one request on the executor once a request slot is free."""
+        async with self._semaphore():
+            await self._wait_on_rate_limit_reached()
+            call = functools.partial(self.client._send, method, url, **kwargs)
+            loop = self._running_loop()
+            response = await loop.run_in_executor(self.executor, call)
+        return self.client._decode(response)
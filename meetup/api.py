@@ -10,28 +10,153 @@ DATE: Mon Sep 15 00:12:21 2014
 from __future__ import print_function, division, unicode_literals
 
 import os
+import threading
 import requests
-from datetime import datetime
-from datetime import timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 import time
-from six.moves.urllib.parse import urlencode
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from meetup.exceptions import (MeetupClientError, MeetupConnectionError,
+                               MeetupHTTPError, MeetupRateLimitError,
+                               MeetupResponseError, MeetupServerError)
+from meetup.ratelimit import InProcessRateLimiter
+from meetup.retry import RetryPolicy
+from meetup.signals import api_request_finished, rate_limit_waited
+
+
+def _response_size(response):
+    """Size in bytes of a response body."""
+    content = getattr(response, 'content', None)
+    if isinstance(content, bytes):
+        return len(content)
+    try:
+        return int(response.headers.get('Content-Length', 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+class _PageFetch(object):
+    """Fetches a page in a background thread."""
+
+    def __init__(self, fetch, page):
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(fetch, page))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, fetch, page):
+        try:
+            self._result = fetch(page)
+        except Exception as error:
+            self._error = error
+
+    def result(self):
+        """Waits for the fetch and returns the page or raises its error."""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class MeetupTransport(object):
+    """Session backed HTTP transport for the MeetupClient.
+
+    Reuses pooled keep-alive connections to api.meetup.com instead of paying
+    a TCP+TLS handshake on every request.
+
+    Args:
+        pool_connections (int): number of host pools to cache
+        pool_maxsize (int): maximum connections kept open per host
+        keep_alive (bool): if False send ``Connection: close`` with requests
+        timeout (float or tuple): default ``(connect, read)`` timeout
+        session (requests.Session): session to use instead of a new one
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True,
+                 timeout=(5, 30), session=None):
+        self.timeout = timeout
+        self.session = session if session is not None else requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def request(self, method, url, **kwargs):
+        """Sends the request over the pooled session.
+
+        Args:
+            method (str): HTTP verb such as 'GET' or 'POST'
+            url (str): fully qualified url
+            kwargs: passed on to ``requests.Session.request``
+
+        Returns:
+            requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
 
 
 class MeetupClient(object):
     """ MeetupClient """
 
-    rate_limit_remaining = 100
-    rate_limit_reset = 1
-    last_response_time = None
+    def __init__(self, api_key=None, oauth_token=None, transport=None,
+                 rate_limiter=None, retry_policy=None, cache=None,
+                 archive=None):
+        """ Find your api_key from https://secure.meetup.com/meetup_api/key/
+
+        transport is an object with a ``request(method, url, **kwargs)``
+        method, by default a pooled MeetupTransport.
 
-    def __init__(self, api_key=None, oauth_token=None):
-        """ Find your api_key from https://secure.meetup.com/meetup_api/key/"""
+        rate_limiter is a ``meetup.ratelimit.RateLimiter``, by default one
+        private to this client. Share one between clients (or use a
+        SQLiteRateLimiter between processes) using the same api key.
+
+        retry_policy is a ``meetup.retry.RetryPolicy`` deciding how failed
+        requests are retried, ``meetup.retry.NO_RETRY`` disables retrying.
+
+        cache is a ``meetup.http_cache.ResponseCache`` for GET responses.
+        Fresh entries are served without a request, stale ones are
+        revalidated with ``If-None-Match``/``If-Modified-Since``.
+
+        archive is a ``meetup.archive.ArchiveWriter`` recording every page
+        returned by a GET, which ``meetup.archive.ReplayClient`` can serve
+        again without the network.
+        """
         self.api_key = api_key
         self.requests_kwargs = {
             'headers': {'Authorization': 'Bearer %s' % oauth_token}
         } if oauth_token else {}
+        self.transport = transport if transport is not None else MeetupTransport()
+        if rate_limiter is None:
+            rate_limiter = InProcessRateLimiter()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.cache = cache
+        self.archive = archive
         self._cached_request_urls = {}
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Releases the connections held by the transport."""
+        close = getattr(self.transport, 'close', None)
+        if close is not None:
+            close()
+
     def signed_request_url(self, meetup_method, params=None, request_hash=None):
         """To GET data from api.meetup.com"""
         if request_hash is not None and request_hash in self._cached_request_urls:
@@ -60,9 +185,25 @@ class MeetupClient(object):
 
         Returns
         response : dict
+
+        Raises
+        MeetupError
+            once the retry policy gives up on a failed request
         """
         # TODO: rename invoke to http_response
+        url, request_params = self._prepare_invoke(meetup_method, params, method)
+        # get response
+        page = self._dispatch(method, url, request_params)
+        if method == 'GET' and self.archive is not None:
+            self.archive.write_page(page, meetup_method=meetup_method, params=params)
+        return page
 
+    def _prepare_invoke(self, meetup_method, params=None, method='GET'):
+        """Builds the url and parameters for a meetup method.
+
+        Returns:
+            tuple of (url, params)
+        """
         # get the parameters
         params = params.copy() if params is not None else {}
         if self.api_key:
@@ -74,18 +215,28 @@ class MeetupClient(object):
             meetup_method = meetup_method[1:]
         url = os.path.join("https://api.meetup.com", meetup_method)
 
-        self._wait_on_rate_limit_reached()
-        # get response
+        if method == 'GET' and 'page' not in params:
+            params['page'] = 1000
+        return url, params
+
+    def _dispatch(self, method, url, params):
+        """Sends a prepared request with the helper for the HTTP method."""
+        url, kwargs = self._request_args(method, url, params)
+        return self._request(method, url, **kwargs)
+
+    def _request_args(self, method, url, params):
+        """Places the parameters where api.meetup.com expects them.
+
+        Returns:
+            tuple of (url, kwargs) for the transport
+        """
         if method == 'GET':
-            if 'page' not in params:
-                params['page'] = 1000
-            return self._get(url, params)
-        elif method == 'POST':
-            return self._post(url, params)
-        elif method == 'PATCH':
-            return self._patch(url, params)
+            return "{}?{}".format(url, urlencode(params)), {}
+        elif method in ('POST', 'PATCH'):
+            return url, {'data': params}
         elif method == 'DELETE':
-            return self._delete(url, params)
+            return url, {'params': params}
+        raise ValueError("unsupported HTTP method {}".format(method))
 
     def get_next_page(self, page):
         """Returns the next page for previous page result.
@@ -95,34 +246,106 @@ class MeetupClient(object):
 
         Returns:
             None if no next page, or fetched next page
+
+        Raises:
+            MeetupError: once the retry policy gives up on the request
         """
-        meta = page.get('meta', {})
-        url = meta.get('next')
+        url = self._next_page_url(page)
         if url is None:
             return None
-        self._wait_on_rate_limit_reached()
-        response = requests.get(url, **self.requests_kwargs)
-        try:
-            self._capture_rate_limit(response)
-            return response.json()
-        except:
-            return None
+        next_page = self._request('GET', url)
+        if self.archive is not None:
+            self.archive.write_page(next_page, url=url)
+        return next_page
+
+    def get_page(self, url):
+        """Returns the page at a ``meta.next`` url saved earlier.
+
+        The url may have had its credentials stripped before it was stored
+        (see ``meetup.archive.strip_secrets``), the api key of this client is
+        then added back.
+
+        Args:
+            url (str): ``meta.next`` url of a previous page
+
+        Raises:
+            MeetupError: once the retry policy gives up on the request
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if self.api_key and not any(k in ('key', 'sig') for k, _ in query):
+            query.append(('key', self.api_key))
+            url = urlunsplit(parts._replace(query=urlencode(query)))
+        page = self._request('GET', url)
+        if self.archive is not None:
+            self.archive.write_page(page, url=url)
+        return page
+
+    def iter_pages(self, meetup_method, params=None, prefetch=True,
+                   next_url=None):
+        """Yields every page of a GET request by following ``meta.next``.
+
+        Args:
+            meetup_method (str): see http://www.meetup.com/meetup_api/docs/
+            params (dict): parameters passed to the first request
+            prefetch (bool): fetch the next page in a background thread while
+                the current one is consumed
+            next_url (str): resume paging at this ``meta.next`` url of an
+                earlier run instead of requesting meetup_method
+
+        Yields:
+            page (dict)
+        """
+        if next_url is not None:
+            page = self.get_page(next_url)
+        else:
+            page = self.invoke(meetup_method, params, method='GET')
+        while page is not None:
+            pending = None
+            if prefetch and self._next_page_url(page) is not None:
+                pending = _PageFetch(self.get_next_page, page)
+            yield page
+            if pending is not None:
+                page = pending.result()
+            else:
+                page = self.get_next_page(page)
+
+    def iter_results(self, meetup_method, params=None, prefetch=True,
+                     next_url=None):
+        """Yields the records of a paginated GET request one at a time.
+
+        Only the current and the next page are held in memory, so this is
+        suitable for groups with thousands of events.
+
+        Args:
+            meetup_method (str): see http://www.meetup.com/meetup_api/docs/
+            params (dict): parameters passed to the first request
+            prefetch (bool): see ``iter_pages``
+            next_url (str): see ``iter_pages``
+
+        Yields:
+            record (dict)
+        """
+        for page in self.iter_pages(meetup_method, params, prefetch=prefetch,
+                                    next_url=next_url):
+            for record in page.get('results', ()):
+                yield record
+
+    def _next_page_url(self, page):
+        """The ``meta.next`` url of a page, None when it is the last page."""
+        meta = page.get('meta', {})
+        return meta.get('next') or None
 
     def _wait_on_rate_limit_reached(self):
-        """Waits for the end of the rate limit time window."""
-        if self.rate_limit_remaining > 0:
-            return
-        if not self.last_response_time:
-            return
-        reset_delta = timedelta(seconds=self.rate_limit_reset)
-        end_of_window = self.last_response_time + reset_delta
-        if end_of_window < datetime.now():
-            return
-        wait_delta = (end_of_window - datetime.now())
-        wait_seconds = (86400 * wait_delta.days) + wait_delta.seconds
-        if wait_delta.microseconds:
-            wait_seconds += 1
-        time.sleep(wait_seconds)
+        """Waits until the rate limiter allows the next request."""
+        wait_seconds = self._rate_limit_wait_seconds()
+        if wait_seconds:
+            time.sleep(wait_seconds)
+            rate_limit_waited.send(sender=self, seconds=wait_seconds)
+
+    def _rate_limit_wait_seconds(self):
+        """Reserves the next request, returns the seconds to wait for it."""
+        return self.rate_limiter.reserve()
 
     def _capture_rate_limit(self, response):
         """Captures Meetup response rate limit information.
@@ -133,50 +356,145 @@ class MeetupClient(object):
         Args:
             response (HTTPResponse): response from the last request
         """
-        self.last_response_time = datetime.now()
         headers = response.headers
         try:
-            self.rate_limit_remaining = int(headers['X-RateLimit-Remaining'])
-            self.rate_limit_reset = int(headers['X-RateLimit-Reset'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers['X-RateLimit-Reset'])
         except KeyError:
-            pass
+            return
+        self.rate_limiter.update(remaining, reset)
 
-    def _delete(self, url, kwargs):
-        response = requests.delete(
-            url,
-            params=kwargs,
-            **self.requests_kwargs
-        )
-        try:
-            self._capture_rate_limit(response)
-            return response.json()
-        except:
-            return None
+    def _request(self, method, url, **kwargs):
+        """Sends a request, retrying transient failures.
 
-    def _get(self, url, kwargs):
-        url = "{}?{}".format(url, urlencode(kwargs))
-        response = requests.get(url, **self.requests_kwargs)
-        try:
-            self._capture_rate_limit(response)
-            return response.json()
-        except:
-            return None
+        Returns:
+            decoded JSON body of the response
+        """
+        if method == 'GET' and self.cache is not None:
+            return self._cached_get(url)
+        response = self._request_response(method, url, **kwargs)
+        return self._decode(response)
+
+    def _cached_get(self, url):
+        """GETs a url through the response cache."""
+        cache = self.cache
+        key = cache.make_key(url, self.requests_kwargs.get('headers'))
+        entry = cache.get(key)
+        headers = {}
+        if entry is not None:
+            if cache.is_fresh(entry):
+                return entry['body']
+            headers = cache.conditional_headers(entry)
+        response = self._request_response('GET', url, headers=headers)
+        if response.status_code == 304:
+            if entry is None:
+                # nothing to serve, and a 304 has no body to decode
+                raise MeetupResponseError(
+                    "304 Not Modified for {} which is not cached".format(
+                        urlsplit(url).path),
+                    response=response
+                )
+            cache.set(key, cache.refresh(entry))
+            return entry['body']
+        body = self._decode(response)
+        cache.set(key, cache.make_entry(body, response))
+        return body
+
+    def _request_response(self, method, url, **kwargs):
+        """Sends a request, retrying transient failures.
+
+        Returns:
+            requests.Response
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._wait_on_rate_limit_reached()
+            try:
+                return self._send(method, url, **kwargs)
+            except (MeetupConnectionError, MeetupHTTPError) as error:
+                delay = self.retry_policy.get_delay(method, attempt, error)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _send(self, method, url, **kwargs):
+        """Sends a request once.
+
+        Returns:
+            requests.Response
 
-    def _patch(self, url, kwargs):
-        response = requests.patch(url, data=kwargs, **self.requests_kwargs)
+        Raises:
+            MeetupConnectionError: no response was received
+            MeetupHTTPError: the response has an error status
+        """
+        headers = dict(self.requests_kwargs.get('headers') or {})
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs = dict(self.requests_kwargs, **kwargs)
+        if headers:
+            kwargs['headers'] = headers
+        start = time.time()
         try:
-            self._capture_rate_limit(response)
-            return response.json()
-        except:
-            return None
+            response = self.transport.request(method, url, **kwargs)
+        except requests.exceptions.ConnectTimeout as error:
+            raise MeetupConnectionError(str(error), connected=False)
+        except requests.exceptions.ConnectionError as error:
+            # a refused or unresolved connection never sent the request
+            reason = error.args[0] if error.args else None
+            reason = getattr(reason, 'reason', reason)
+            connected = not isinstance(reason, NewConnectionError)
+            raise MeetupConnectionError(str(error), connected=connected)
+        except requests.exceptions.RequestException as error:
+            raise MeetupConnectionError(str(error))
+        api_request_finished.send(
+            sender=self,
+            method=method,
+            url=url,
+            status_code=response.status_code,
+            elapsed=time.time() - start,
+            size=_response_size(response)
+        )
+        self._capture_rate_limit(response)
+        self._raise_for_status(response)
+        return response
+
+    def _decode(self, response):
+        """Decodes the JSON body of a response.
 
-    def _post(self, url, kwargs):
-        response = requests.post(url, data=kwargs, **self.requests_kwargs)
+        Raises:
+            MeetupResponseError: the response body is not JSON
+        """
         try:
-            self._capture_rate_limit(response)
             return response.json()
-        except:
-            return None
+        except ValueError as error:
+            raise MeetupResponseError(
+                "invalid JSON from {}: {}".format(
+                    getattr(response, 'url', 'api.meetup.com'), error
+                ),
+                response=response
+            )
+
+    def _raise_for_status(self, response):
+        """Raises the MeetupHTTPError matching an error response."""
+        status_code = response.status_code
+        if status_code < 400:
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        message = "{} error from api.meetup.com".format(status_code)
+        if isinstance(body, dict):
+            details = body.get('errors') or body.get('details') or body.get('problem')
+            if details:
+                message = "{}: {}".format(message, details)
+        if status_code == 429:
+            error_class = MeetupRateLimitError
+        elif status_code >= 500:
+            error_class = MeetupServerError
+        else:
+            error_class = MeetupClientError
+        raise error_class(message, response=response, body=body)
 
     def get_events(self, id_type="group", **kwargs):
         kwargs = kwargs.copy()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Archive raw api.meetup.com pages and replay them without the network
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+
+import datetime
+import gzip
+import json
+import os
+import threading
+
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from meetup.api import MeetupClient
+from meetup.exceptions import MeetupError, MeetupReplayError
+
+ARCHIVE_VERSION = 1
+# query parameters which are credentials and never archived
+SECRET_PARAMS = ('key', 'sig', 'sig_id')
+
+
+def archive_path(directory, group_id, now=None):
+    """Path of a new archive of a group's sync in directory."""
+    now = now or datetime.datetime.utcnow()
+    name = "{}-{}.jsonl.gz".format(group_id, now.strftime("%Y%m%dT%H%M%SZ"))
+    return os.path.join(directory, name)
+
+
+def strip_secrets(url):
+    """The url without the api key or signature in its query."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class ArchiveWriter(object):
+    """Writes the pages a MeetupClient receives to a gzipped JSON-lines file.
+
+    The first line is a header naming the group; every other line is one
+    page with the request which returned it, either the ``meetup_method``
+    and ``params`` given to ``invoke`` or the ``url`` of a ``meta.next``
+    link. The api key is never written.
+
+    Args:
+        path (str): file to write, its directory is created if missing
+        group_id (int): group whose sync is archived
+    """
+
+    def __init__(self, path, group_id=None):
+        self.path = path
+        self.group_id = group_id
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._fp = gzip.open(path, 'wb')
+        self._write({
+            'archive': 'meetup',
+            'version': ARCHIVE_VERSION,
+            'group_id': group_id,
+            'created': datetime.datetime.utcnow().isoformat() + "Z",
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, record):
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            self._fp.write(line.encode('utf-8'))
+
+    def write_page(self, page, meetup_method=None, params=None, url=None):
+        """Appends a page and the request which returned it."""
+        if url is not None:
+            record = {'url': strip_secrets(url)}
+        else:
+            params = dict((k, v) for k, v in (params or {}).items()
+                          if k not in SECRET_PARAMS)
+            record = {'method': meetup_method.lstrip("/"), 'params': params}
+        record['page'] = self._strip_page(page)
+        self._write(record)
+
+    def _strip_page(self, page):
+        """The page with the secrets removed from the urls of its meta."""
+        meta = page.get('meta') if isinstance(page, dict) else None
+        if not meta:
+            return page
+        meta = dict(meta)
+        for key in ('next', 'prev', 'url'):
+            if meta.get(key):
+                meta[key] = strip_secrets(meta[key])
+        return dict(page, meta=meta)
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+def read_archive(path):
+    """Yields the records of an archive, the header first."""
+    with gzip.open(path, 'rb') as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line.decode('utf-8'))
+
+
+class _NoNetwork(object):
+    """Transport of a ReplayClient, any request is a bug."""
+
+    def request(self, method, url, **kwargs):
+        raise MeetupError("replaying an archive, no request to {}".format(url))
+
+
+class ReplayClient(MeetupClient):
+    """MeetupClient serving the pages of an archive instead of the network.
+
+    Pages are streamed from disk in the order they were archived: ``invoke``
+    returns the next page archived for the same meetup method, whatever its
+    parameters (an incremental sync asks for a different ``time`` each
+    run), and ``get_next_page`` the page archived for its ``meta.next`` url.
+    Records skipped while looking ahead are kept until asked for.
+
+    Args:
+        path (str): archive written by an ArchiveWriter
+    """
+
+    def __init__(self, path):
+        super(ReplayClient, self).__init__(transport=_NoNetwork())
+        self.path = path
+        self._records = read_archive(path)
+        header = next(self._records, None)
+        if header is None or header.get('archive') != 'meetup':
+            raise MeetupReplayError("{} is not a meetup archive".format(path))
+        if header.get('version') != ARCHIVE_VERSION:
+            raise MeetupReplayError("{} has unsupported archive version {}".format(
+                path, header.get('version')))
+        self.header = header
+        self.group_id = header.get('group_id')
+        self._skipped = []
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._records.close()
+
+    def _take(self, match, description):
+        with self._lock:
+            for i, record in enumerate(self._skipped):
+                if match(record):
+                    return self._skipped.pop(i)['page']
+            for record in self._records:
+                if match(record):
+                    return record['page']
+                self._skipped.append(record)
+        raise MeetupReplayError("{} has no page for {}".format(self.path, description))
+
+    def invoke(self, meetup_method, params=None, method='GET'):
+        """Returns the next archived page of meetup_method."""
+        if method != 'GET':
+            raise MeetupReplayError("cannot replay a {} request".format(method))
+        meetup_method = meetup_method.lstrip("/")
+        return self._take(lambda record: record.get('method') == meetup_method,
+                          meetup_method)
+
+    def get_next_page(self, page):
+        """Returns the page archived for the ``meta.next`` url of page."""
+        url = self._next_page_url(page)
+        if url is None:
+            return None
+        return self.get_page(url)
+
+    def get_page(self, url):
+        """Returns the page archived for a ``meta.next`` url."""
+        url = strip_secrets(url)
+        return self._take(lambda record: record.get('url') == url, url)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Per group cache of what the views read from the database
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from meetup.models import Event
+
+# name of the cache in settings.CACHES the views use, None disables caching.
+# Syncs invalidate it from another process, so it must be shared between
+# processes (memcached, redis, database), not a per process LocMemCache
+MEETUP_VIEW_CACHE = getattr(settings,"MEETUP_VIEW_CACHE",None)
+# seconds a cached value is kept, the group version invalidates it sooner
+MEETUP_VIEW_CACHE_TIMEOUT = getattr(settings,"MEETUP_VIEW_CACHE_TIMEOUT",300)
+# cache the next upcoming event of each group, rendered on every page
+MEETUP_CACHE_NEXT_EVENT = getattr(settings,"MEETUP_CACHE_NEXT_EVENT",True)
+
+KEY_PREFIX = "meetup:group"
+
+# ########################################################################### #
+
+def get_cache ():
+    if MEETUP_VIEW_CACHE is None:
+        return None
+    return caches[MEETUP_VIEW_CACHE]
+
+def _version_key (group_id):
+    return "{}:{}:version".format(KEY_PREFIX,group_id)
+
+def group_version (group_id,cache=None):
+    """ Token which every cached value of the group is keyed with """
+    cache = cache or get_cache()
+    key = _version_key(group_id)
+    version = cache.get(key)
+    if version is None:
+        # add so concurrent readers agree on the first version
+        cache.add(key,uuid.uuid4().hex,None)
+        version = cache.get(key)
+    return version
+
+def cached_for_group (group_id,name,build,timeout=None):
+    """ Value of build() cached under name until the group is invalidated
+
+    Parameters
+    group_id : int
+    name : str
+        distinguishes the values cached for one group
+    build : callable
+        computes the value on a miss, it must be picklable
+    timeout : float or None
+        seconds, default ``settings.MEETUP_VIEW_CACHE_TIMEOUT``
+
+    """
+    cache = get_cache()
+    if cache is None:
+        return build()
+    key = "{}:{}:{}:{}".format(KEY_PREFIX,group_id,group_version(group_id,cache),name)
+    # values are wrapped in a tuple so a cached None is a hit
+    hit = cache.get(key)
+    if hit is not None:
+        return hit[0]
+    value = build()
+    if timeout is None:
+        timeout = MEETUP_VIEW_CACHE_TIMEOUT
+    cache.set(key,(value,),timeout)
+    return value
+
+def invalidate_group (group_id):
+    """ Drop every value cached for the group
+
+    A new version is set rather than deleting keys, the old values are never
+    read again and expire on their own.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.set(_version_key(group_id),uuid.uuid4().hex,None)
+
+def next_event (group_id):
+    """ The group's next upcoming event or None, cached until it is synced """
+    def build ():
+        return Event.objects.next_upcoming(group_id)
+    if not MEETUP_CACHE_NEXT_EVENT:
+        return build()
+    return cached_for_group(group_id,"next_event",build)
+
+def refresh_group (group_id):
+    """ Invalidate the group and cache its next event again
+
+    Called by meetup.sync after writing to the group, so pages rendering
+    the next event do not all miss at once.
+    """
+    invalidate_group(group_id)
+    if MEETUP_CACHE_NEXT_EVENT and get_cache() is not None:
+        next_event(group_id)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Errors raised when talking to the Meetup.com API
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+
+
+class MeetupError(Exception):
+    """Base class of every error raised by the MeetupClient."""
+
+
+class MeetupConnectionError(MeetupError):
+    """The request failed before a response was received.
+
+    Attributes:
+        connected (bool): False when no connection was ever made, so the
+            request cannot have reached api.meetup.com
+    """
+
+    def __init__(self, message, connected=True):
+        super(MeetupConnectionError, self).__init__(message)
+        self.connected = connected
+
+
+class MeetupResponseError(MeetupError):
+    """The response body could not be decoded as JSON."""
+
+    def __init__(self, message, response=None):
+        super(MeetupResponseError, self).__init__(message)
+        self.response = response
+
+
+class MeetupHTTPError(MeetupError):
+    """api.meetup.com answered with an error status.
+
+    Attributes:
+        status_code (int): HTTP status of the response
+        response (requests.Response): the response itself
+        body (dict or None): decoded JSON error body, if any
+    """
+
+    def __init__(self, message, response=None, body=None):
+        super(MeetupHTTPError, self).__init__(message)
+        self.response = response
+        self.body = body
+        self.status_code = getattr(response, 'status_code', None)
+
+
+class MeetupClientError(MeetupHTTPError):
+    """4xx, the request was rejected."""
+
+
+class MeetupRateLimitError(MeetupClientError):
+    """429, the rate limit was exceeded."""
+
+
+class MeetupServerError(MeetupHTTPError):
+    """5xx, api.meetup.com failed to handle the request."""
+
+
+class MeetupReplayError(MeetupError):
+    """An archive has no page for a request being replayed."""
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Caches for api.meetup.com GET responses
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    """Base class of the MeetupClient response caches.
+
+    An entry is a dict with the decoded ``body`` of a GET response, its
+    ``etag`` and ``last_modified`` validators and the ``expires`` time after
+    which it must be revalidated. Expired entries are kept so they can be
+    revalidated with ``If-None-Match``/``If-Modified-Since``; a 304 answer is
+    then served from the cache.
+
+    Subclasses implement ``get``, ``set`` and ``delete``.
+
+    Args:
+        ttl (float): seconds an entry is served without asking api.meetup.com
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+
+    def make_key(self, url, headers=None):
+        """Cache key of a GET url, distinct per Authorization header."""
+        authorization = (headers or {}).get('Authorization', '')
+        raw = "{}\n{}".format(url, authorization).encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()
+
+    def make_entry(self, body, response, now=None):
+        """Builds the entry stored for a successful response."""
+        now = time.time() if now is None else now
+        headers = response.headers
+        return {
+            'body': body,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires': now + self.ttl,
+        }
+
+    def refresh(self, entry, now=None):
+        """Marks an entry revalidated by a 304 as fresh again."""
+        now = time.time() if now is None else now
+        entry['expires'] = now + self.ttl
+        return entry
+
+    def is_fresh(self, entry, now=None):
+        now = time.time() if now is None else now
+        return entry['expires'] > now
+
+    def conditional_headers(self, entry):
+        """Headers asking api.meetup.com to answer 304 if nothing changed."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """Least recently used cache in the memory of this process.
+
+    Args:
+        ttl (float): see ResponseCache
+        maxsize (int): number of entries kept before evicting
+    """
+
+    def __init__(self, ttl=300, maxsize=1024):
+        super(MemoryCache, self).__init__(ttl)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class FileCache(ResponseCache):
+    """Cache of JSON files in a directory, shared between processes.
+
+    Reading an entry touches its file, so the files with the oldest
+    modification times are the least recently used and evicted first.
+
+    Args:
+        directory (str): where the entries are written, created if missing
+        ttl (float): see ResponseCache
+        max_entries (int): number of files kept before evicting
+    """
+
+    def __init__(self, directory, ttl=300, max_entries=10000):
+        super(FileCache, self).__init__(ttl)
+        self.directory = directory
+        self.max_entries = max_entries
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as fp:
+                entry = json.load(fp)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return entry
+
+    def set(self, key, entry):
+        # write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(entry, fp)
+        os.rename(tmp_path, self._path(key))
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        excess = len(names) - self.max_entries
+        if excess <= 0:
+            return
+        paths = [os.path.join(self.directory, n) for n in names]
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        for _, path in sorted(mtimes)[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class DjangoCache(ResponseCache):
+    """Cache stored in one of the caches of ``settings.CACHES``.
+
+    Eviction is left to the Django cache backend. Entries must outlive
+    their freshness to be revalidated, so the backend keeps them
+    ``STALE_TTLS`` times the ttl by default; with the backend's default
+    timeout (300s, the default ttl) they would be gone once stale.
+
+    Args:
+        alias (str): name of the cache in ``settings.CACHES``
+        ttl (float): see ResponseCache
+        timeout (float): seconds the backend keeps an entry, expired or not,
+            None for ``STALE_TTLS`` times ttl
+        key_prefix (str): prefix of the keys in the Django cache
+    """
+
+    STALE_TTLS = 10
+
+    def __init__(self, alias='default', ttl=300, timeout=None,
+                 key_prefix='meetup:http:'):
+        super(DjangoCache, self).__init__(ttl)
+        self.alias = alias
+        if timeout is None:
+            timeout = ttl * self.STALE_TTLS
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def backend(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.backend.get(self.key_prefix + key)
+
+    def set(self, key, entry):
+        self.backend.set(self.key_prefix + key, entry, timeout=self.timeout)
+
+    def delete(self, key):
+        self.backend.delete(self.key_prefix + key)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Timings, query counts and API budget spent by a sync
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+import contextlib
+import time
+from collections import OrderedDict
+
+from django.db import connection
+
+from meetup.signals import api_request_finished, rate_limit_waited
+from meetup.sync_results import SyncDiff, SyncStats
+
+# upper bounds (ms) of the HTTP latency histogram buckets
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# ########################################################################### #
+
+class LatencyHistogram (object):
+    """ Counts of request latencies per bucket """
+
+    def __init__ (self,buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0]*(len(self.buckets)+1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add (self,seconds):
+        ms = seconds*1000.0
+        index = len(self.buckets)
+        for i,bound in enumerate(self.buckets):
+            if ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max,seconds)
+
+    def merge (self,other):
+        for i,n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max,other.max)
+        return self
+
+    def as_dict (self):
+        labels = ["<={}ms".format(b) for b in self.buckets]
+        labels.append(">{}ms".format(self.buckets[-1]))
+        return OrderedDict([
+            ('count',self.count),
+            ('total_seconds',round(self.total,6)),
+            ('max_seconds',round(self.max,6)),
+            ('buckets',OrderedDict(zip(labels,self.counts))),
+        ])
+
+
+class StageMetrics (object):
+    """ Time and database queries spent in one stage of a sync """
+
+    def __init__ (self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def merge (self,other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.queries += other.queries
+        self.query_seconds += other.query_seconds
+        return self
+
+    def as_dict (self):
+        return OrderedDict([
+            ('calls',self.calls),
+            ('seconds',round(self.seconds,6)),
+            ('queries',self.queries),
+            ('query_seconds',round(self.query_seconds,6)),
+        ])
+
+
+class SyncMetrics (object):
+    """ Collects what a sync spent, per group or merged over a whole run
+
+    Attach it to a client with ``collect(client)`` to record the latency and
+    size of every response and the seconds slept on the rate limit, and wrap
+    database work in ``stage(name)`` to time it and count its queries. The
+    rows inserted, updated and unchanged are kept in ``stats``.
+    """
+
+    def __init__ (self,group_id=None):
+        self.group_id = group_id
+        self.latency = LatencyHistogram()
+        self.bytes_fetched = 0
+        self.status_codes = {}
+        self.rate_limit_waits = 0
+        self.rate_limit_seconds = 0.0
+        self.stages = OrderedDict()
+        self.stats = SyncStats()
+        # meetup.sync_results.SyncDiff of a dry run
+        self.diff = None
+        self.seconds = 0.0
+        self.error = None
+
+    # ======================= collecting
+    @contextlib.contextmanager
+    def collect (self,client):
+        """ Record the requests and rate limit waits of client """
+        def on_request (sender,elapsed,size,status_code,**kwargs):
+            if sender is client:
+                self.latency.add(elapsed)
+                self.bytes_fetched += size
+                key = str(status_code)
+                self.status_codes[key] = self.status_codes.get(key,0)+1
+
+        def on_wait (sender,seconds,**kwargs):
+            if sender is client:
+                self.rate_limit_waits += 1
+                self.rate_limit_seconds += seconds
+
+        api_request_finished.connect(on_request,weak=False)
+        rate_limit_waited.connect(on_wait,weak=False)
+        start = time.time()
+        try:
+            yield self
+        finally:
+            self.seconds += time.time()-start
+            api_request_finished.disconnect(on_request)
+            rate_limit_waited.disconnect(on_wait)
+
+    @contextlib.contextmanager
+    def stage (self,name):
+        """ Time a stage and count the queries it runs on this thread """
+        stage = self.stages.setdefault(name,StageMetrics())
+
+        def count_query (execute,sql,params,many,context):
+            start = time.time()
+            try:
+                return execute(sql,params,many,context)
+            finally:
+                stage.queries += 1
+                stage.query_seconds += time.time()-start
+
+        start = time.time()
+        try:
+            if hasattr(connection,'execute_wrapper'):
+                with connection.execute_wrapper(count_query):
+                    yield stage
+            else:
+                # Django < 2.0 cannot count queries without DEBUG
+                yield stage
+        finally:
+            stage.calls += 1
+            stage.seconds += time.time()-start
+
+    # ======================= reporting
+    def merge (self,other):
+        self.latency.merge(other.latency)
+        self.bytes_fetched += other.bytes_fetched
+        for key,n in other.status_codes.items():
+            self.status_codes[key] = self.status_codes.get(key,0)+n
+        self.rate_limit_waits += other.rate_limit_waits
+        self.rate_limit_seconds += other.rate_limit_seconds
+        for name,stage in other.stages.items():
+            self.stages.setdefault(name,StageMetrics()).merge(stage)
+        self.stats.merge(other.stats)
+        if other.diff is not None:
+            if self.diff is None:
+                self.diff = SyncDiff()
+            self.diff.merge(other.diff)
+        self.seconds += other.seconds
+        return self
+
+    def as_dict (self):
+        data = OrderedDict()
+        if self.group_id is not None:
+            data['group_id'] = self.group_id
+        data['ok'] = self.error is None
+        if self.error is not None:
+            data['error'] = repr(self.error)
+        data['seconds'] = round(self.seconds,6)
+        data['http'] = OrderedDict([
+            ('latency',self.latency.as_dict()),
+            ('bytes_fetched',self.bytes_fetched),
+            ('status_codes',dict(self.status_codes)),
+        ])
+        data['rate_limit'] = OrderedDict([
+            ('waits',self.rate_limit_waits),
+            ('seconds',round(self.rate_limit_seconds,6)),
+        ])
+        data['stages'] = OrderedDict(
+            (name,stage.as_dict()) for name,stage in self.stages.items())
+        data['rows'] = self.stats.as_dict()
+        data['unknown_keys'] = {name:dict(keys) for name,keys in self.stats.unknown_keys.items()}
+        if self.diff is not None:
+            data['diff'] = self.diff.as_dict()
+        return data
+
+    def __str__ (self):
+        text = "{} in {:.2f}s, {} requests, {} bytes, {:.2f}s rate limited".format(
+            self.stats if self.diff is None else self.diff,self.seconds,self.latency.count,self.bytes_fetched,
+            self.rate_limit_seconds)
+        if self.error is not None:
+            text = "FAILED {!r}; ".format(self.error)+text
+        return text
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Long running process syncing each group at its own cadence
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from django.core.management.base import BaseCommand, CommandError
+from meetup.management.options import add_group_arguments, get_group_ids
+from meetup.scheduler import (Cadence, SyncScheduler, MEETUP_SCHEDULER_MIN_INTERVAL,
+                              MEETUP_SCHEDULER_MAX_INTERVAL)
+
+# ########################################################################### #
+
+class Command(BaseCommand):
+    help = 'Keep Meetup groups synced, polling busy groups often and dormant ones rarely'
+
+    def add_arguments(self, parser):
+        add_group_arguments(parser)
+        parser.add_argument('--min-interval',type=float,default=MEETUP_SCHEDULER_MIN_INTERVAL,
+                            help="Seconds between syncs of a group with an event about to start")
+        parser.add_argument('--max-interval',type=float,default=MEETUP_SCHEDULER_MAX_INTERVAL,
+                            help="Seconds between syncs of a dormant group")
+        parser.add_argument('--iterations',type=int,
+                            help="Stop after this many passes, default is to run until interrupted")
+
+    def handle(self, *args, **options):
+        # ======================= get the groups
+        group_ids = get_group_ids(options)
+        if options['min_interval'] > options['max_interval']:
+            raise CommandError("--min-interval is larger than --max-interval")
+        # ======================= run
+        scheduler = SyncScheduler(
+            group_ids,
+            workers=options['workers'],
+            api_key=options.get('api_key'),
+            cadence=Cadence(options['min_interval'],options['max_interval']),
+        )
+        self.stdout.write("scheduling {} groups".format(len(scheduler)))
+        try:
+            scheduler.run(iterations=options.get('iterations'),on_results=self._report)
+        except KeyboardInterrupt:
+            scheduler.stop()
+            self.stdout.write("stopped")
+
+    def _report(self, results):
+        for group_id,metrics in results.items():
+            line = "group {}: {}".format(group_id,metrics)
+            if metrics.error is not None:
+                self.stderr.write(line)
+            else:
+                self.stdout.write(line)
@@ -10,12 +10,13 @@ DATE: Mon Sep 15 00:54:16 2014
 # import modules 
 
 from __future__ import print_function, division, unicode_literals
-from django.conf import settings
+import json
+from collections import OrderedDict
 from django.core.management.base import BaseCommand, CommandError
-from meetup.sync import sync_group_events
-from meetup.api import MeetupClient
-
-MEETUP_KEY =  settings.MEETUP_KEY
+from meetup.instrumentation import SyncMetrics
+from meetup.management.options import (add_group_arguments, add_sync_arguments, get_group_ids,
+                                       get_sync_kwargs)
+from meetup.sync import diff_group_events, replay_archives, sync_group_events, sync_groups
 
 # ########################################################################### #
 
@@ -23,16 +24,68 @@ class Command(BaseCommand):
     help = 'Sync Meetup group events to local database'
 
     def add_arguments(self, parser):
-        parser.add_argument('group_id', nargs='+', type=int,help="group id, default is settings.MEETUP_GROUP_ID")
-        parser.add_argument('--api_key',type=str,help="Key used for querying Meetup")        
+        add_group_arguments(parser)
+        parser.add_argument('--full',action='store_true',default=None,
+                            help="Re-sync the whole event history instead of recent changes")
+        add_sync_arguments(parser)
+        parser.add_argument('--replay',metavar='ARCHIVE',nargs='+',
+                            help="Sync from archives written with --archive instead of api.meetup.com")
+        parser.add_argument('--dry-run',action='store_true',
+                            help="Only report the rows the sync would create, update or delete (-v 2 lists them)")
                     
     def handle(self, *args, **options):
-        client = MeetupClient(options.get('api_key',MEETUP_KEY))
-        # ======================= get the group
-        if len(args) == 1:
-            group_id = int(args[0])
-        else:        
-            group_id = settings.MEETUP_GROUP_ID
-        # ======================= sync events for the group            
-        sync_group_events(group_id,client)
-        
\ No newline at end of file
+        if options.get('replay'):
+            if options['group_id'] or options['all_known'] or options.get('archive') or options.get('full'):
+                raise CommandError("--replay takes no group ids, --all-known, --archive or --full")
+            results = replay_archives(options['replay'],dry_run=options.get('dry_run'))
+            self._report(results,"archive",options)
+            return
+        # ======================= get the groups
+        group_ids = get_group_ids(options)
+        # ======================= sync events for the groups
+        results = sync_groups(
+            group_ids,
+            full=options.get('full'),
+            sync_function=diff_group_events if options.get('dry_run') else sync_group_events,
+            **get_sync_kwargs(options)
+        )
+        self._report(results,"group",options)
+
+    def _report(self, results, label, options):
+        # ======================= summary
+        failed = [key for key,metrics in results.items() if metrics.error is not None]
+        # stdout only holds the JSON summary when it is written there
+        out = self.stderr if options.get('json_summary') == '-' else self.stdout
+        for key,metrics in results.items():
+            line = "{} {}: {}".format(label,key,metrics)
+            if metrics.error is not None:
+                self.stderr.write(line)
+            else:
+                out.write(line)
+            if metrics.diff is not None and options.get('verbosity',1) >= 2:
+                for diff_line in metrics.diff.lines():
+                    out.write("  "+diff_line)
+        out.write("{} {} of {} {}s".format(
+            "compared" if options.get('dry_run') else "synced",
+            len(results)-len(failed),len(results),label))
+        if options.get('json_summary'):
+            self._write_json_summary(options['json_summary'],results)
+        if failed:
+            raise CommandError("sync failed for {}s {}".format(
+                label,", ".join(str(key) for key in failed)))
+
+    def _write_json_summary(self, path, results):
+        total = SyncMetrics()
+        for metrics in results.values():
+            total.merge(metrics)
+        total.error = None
+        summary = OrderedDict([
+            ('groups',[metrics.as_dict() for metrics in results.values()]),
+            ('total',total.as_dict()),
+        ])
+        text = json.dumps(summary,indent=2)
+        if path == '-':
+            self.stdout.write(text)
+        else:
+            with open(path,'w') as fp:
+                fp.write(text)
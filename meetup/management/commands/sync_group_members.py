@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Sync the members of Meetup groups to local database
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from meetup.management.commands.sync_group_events import Command as SyncGroupEventsCommand
+from meetup.management.options import (add_group_arguments, add_sync_arguments, get_group_ids,
+                                       get_sync_kwargs)
+from meetup.sync import sync_group_members, sync_groups
+
+# ########################################################################### #
+
+class Command(SyncGroupEventsCommand):
+    help = 'Sync the members of Meetup groups to local database'
+
+    def add_arguments(self, parser):
+        add_group_arguments(parser,all_known_help="Also sync the members of every group already in the database")
+        add_sync_arguments(parser)
+
+    def handle(self, *args, **options):
+        # ======================= sync members of the groups
+        results = sync_groups(get_group_ids(options),sync_function=sync_group_members,
+                              **get_sync_kwargs(options))
+        self._report(results,"group",options)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Options and group selection shared by the sync management commands
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from django.conf import settings
+from meetup.models import Group
+
+# ########################################################################### #
+
+def add_group_arguments(parser, all_known_help="Also sync every group already in the database"):
+    """ Add the group ids and the options choosing the groups and how to reach Meetup """
+    parser.add_argument('group_id', nargs='*', type=int,help="group id, default is settings.MEETUP_GROUP_ID")
+    parser.add_argument('--api_key',type=str,help="Key used for querying Meetup")
+    parser.add_argument('--all-known',action='store_true',help=all_known_help)
+    parser.add_argument('--workers',type=int,default=1,
+                        help="Number of groups to sync concurrently")
+
+def add_sync_arguments(parser):
+    """ Add the options of a one-off sync of the groups """
+    parser.add_argument('--restart',action='store_true',
+                        help="Start over instead of resuming the interrupted run of a group")
+    parser.add_argument('--json-summary',metavar='PATH',
+                        help="Write timings, queries and API budget as JSON to PATH ('-' for stdout, the report then goes to stderr)")
+    parser.add_argument('--archive',metavar='DIR',
+                        help="Also write the raw API pages of each group to a gzipped JSON-lines file in DIR")
+
+def get_group_ids(options):
+    """ The group ids given, then the known groups with --all-known,
+    else settings.MEETUP_GROUP_ID """
+    group_ids = list(options['group_id'])
+    if options['all_known']:
+        known = Group.objects.order_by('pk').values_list('pk',flat=True)
+        group_ids += [pk for pk in known if pk not in group_ids]
+    if not group_ids:
+        group_ids = [settings.MEETUP_GROUP_ID]
+    return group_ids
+
+def get_sync_kwargs(options):
+    """ Keyword arguments of ``meetup.sync.sync_groups`` for the options of
+    ``add_group_arguments`` and ``add_sync_arguments`` """
+    return dict(
+        workers=max(1,options['workers']),
+        api_key=options.get('api_key'),
+        archive_dir=options.get('archive'),
+        resume=not options.get('restart'),
+    )
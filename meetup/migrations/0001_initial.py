@@ -0,0 +1,100 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('urlname', models.CharField(max_length=128)),
+                ('city', models.CharField(blank=True, max_length=128)),
+                ('state', models.CharField(blank=True, max_length=128)),
+                ('country', models.CharField(blank=True, max_length=128)),
+                ('link', models.URLField()),
+                ('visibility', models.CharField(help_text='Visiblity to the users', max_length=128)),
+                ('timezone', models.CharField(blank=True, max_length=128)),
+                ('lat', models.FloatField(blank=True)),
+                ('lon', models.FloatField(blank=True)),
+                ('n_members', models.IntegerField(blank=True, default=0)),
+                ('who', models.CharField(blank=True, max_length=128)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Member',
+            fields=[
+                ('member_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('bio', models.TextField(blank=True)),
+                ('status', models.CharField(max_length=33)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('visited', models.DateTimeField()),
+                ('profile_url', models.URLField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Venue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('city', models.CharField(blank=True, max_length=128)),
+                ('state', models.CharField(blank=True, max_length=128)),
+                ('country', models.CharField(blank=True, max_length=128)),
+                ('address_1', models.CharField(blank=True, max_length=128)),
+                ('address_2', models.CharField(blank=True, max_length=128)),
+                ('lat', models.FloatField(blank=True)),
+                ('lon', models.FloatField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_url', models.URLField(blank=True, max_length=255)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('upcoming', 'upcoming'), ('past', 'past'), ('proposed', 'proposed'), ('suggested', 'suggested'), ('cancelled', 'cancelled'), ('draft', 'draft')], max_length=16)),
+                ('visibility', models.CharField(choices=[('public', 'public'), ('public_limited', 'public_limited'), ('members', 'members')], max_length=16)),
+                ('description', models.TextField(blank=True)),
+                ('headcount', models.IntegerField(blank=True, default=0)),
+                ('yes_rsvp_count', models.IntegerField(blank=True, default=0)),
+                ('waitlist_count', models.IntegerField(blank=True, default=0)),
+                ('maybe_rsvp_count', models.IntegerField(blank=True, default=0)),
+                ('event_timestamp', models.DateTimeField()),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='meetup.Group')),
+                ('venue', models.ManyToManyField(to='meetup.Venue')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=64)),
+                ('watermark', models.BigIntegerField(blank=True, help_text="Largest Meetup 'updated' time (ms) synced", null=True)),
+                ('last_sync', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync', models.DateTimeField(blank=True, null=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_states', to='meetup.Group')),
+            ],
+            options={
+                'unique_together': {('group', 'endpoint')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['group', 'status', 'event_timestamp'], name='meetup_event_group_status_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'event_timestamp'], name='meetup_event_status_ts'),
+        ),
+    ]
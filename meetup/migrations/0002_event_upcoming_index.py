@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Partial index of upcoming events, only on Django 2.2 and later.
+
+    Older Django cannot declare partial indexes; there Event.Meta leaves it
+    out too, so the migration state still matches the model.
+    """
+
+    dependencies = [
+        ('meetup', '0001_initial'),
+    ]
+
+    operations = []
+    if django.VERSION >= (2, 2):
+        operations.append(migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(status='upcoming'), fields=['group', 'event_timestamp'], name='meetup_event_upcoming_ts'),
+        ))
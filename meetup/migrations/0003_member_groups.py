@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetup', '0002_event_upcoming_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='groups',
+            field=models.ManyToManyField(blank=True, related_name='members', to='meetup.Group'),
+        ),
+    ]
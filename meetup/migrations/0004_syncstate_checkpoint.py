@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetup', '0003_member_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='run_id',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='run_started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='run_full',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='cursor',
+            field=models.TextField(blank=True, help_text="'meta.next' url after the last page fully written, None once the run finished", null=True),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='batches',
+            field=models.IntegerField(default=0, help_text='Batches the run has committed'),
+        ),
+    ]
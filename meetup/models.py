@@ -10,13 +10,17 @@ DATE: Mon Sep 15 00:12:21 2014
 # import modules
 
 from __future__ import print_function, division
-from django.db import models
+import django
+from django.db import models, transaction
 from django.conf import settings
+from collections import OrderedDict
 import datetime
 import pytz
+import uuid
 import warnings
-from meetup.sync_utils import (fro_meetup_geo,to_meetup_geo,
+from meetup.sync_utils import (fro_meetup_geo,to_meetup_geo,get_timezone,
                               fro_meetup_timestamp,to_meetup_timestamp)
+from meetup.sync_results import SyncDiff,SyncStats
 
 DEFAULT_VIEW_TIMEZONE = pytz.timezone(getattr(settings,"TIME_ZONE","UTC"))
 
@@ -62,8 +66,22 @@ class Mapper (object):
     def __iter__ (self):
         return iter(self._to.items())
 
+# (model, meetup keys) already warned about by managers synced without stats
+_warned_unknown_keys = set()
+
+def related_key (model,pk):
+    """ Key of an object in a ``related`` identity map """
+    return (model,model._meta.pk.to_python(pk))
+
 class MeetupManager (models.Manager):
 
+    # field name -> callable converting the meetup value for that field
+    meetup_converters = {}
+    # meetup keys matching no field which the _post_* hooks read, not unknown
+    meetup_hook_keys = ()
+    # model -> compiled field map, see _field_map
+    _field_maps = {}
+
     def _object_to_meetup_params (self,obj):
         mapper = self.meetup_mapper
         kws = {}
@@ -76,27 +94,110 @@ class MeetupManager (models.Manager):
     def _post_object_to_meetup_params (self,obj,kws):
         return kws
 
-    def _meetup_data_to_kws (self,meetup_data):
+    def _field_map (self):
+        """ Meetup key -> (field name, converter or None), built once per model
+
+        A meetup key is taken for the field the mapper maps it to, or for the
+        field of the same name when the mapper does not know it.
+        """
+        try:
+            return self._field_maps[self.model]
+        except KeyError:
+            pass
         mapper = self.meetup_mapper
+        field_names = set(f.name for f in self.model._meta.fields)
+        field_map = {}
+        for meetup_key,field in mapper._from.items():
+            if field in field_names:
+                field_map[meetup_key] = field
+        for field in field_names:
+            if mapper.get_fro(field) is None:
+                field_map.setdefault(field,field)
+        field_map = {key:(field,self.meetup_converters.get(field))
+                     for key,field in field_map.items()}
+        self._field_maps[self.model] = field_map
+        return field_map
+
+    def _meetup_data_to_kws (self,meetup_data,related=None,stats=None):
+        field_map = self._field_map()
         kws = {}
-        field_names = [f.name for f in self.model._meta.fields]
-        for meetup_key in meetup_data:
-            # map the meetup_key to the field name
-            field = mapper.get_fro(meetup_key,meetup_key)
-            # check the field name
-            if field not in field_names:
-                warnings.warn("ignoring meetup_key '{}' as field '{}'".format(meetup_key,field))
+        unknown = None
+        for meetup_key,value in meetup_data.items():
+            try:
+                field,convert = field_map[meetup_key]
+            except KeyError:
+                if meetup_key in self.meetup_hook_keys:
+                    continue
+                if unknown is None:
+                    unknown = []
+                unknown.append(meetup_key)
                 continue
             # get the field values
-            kws[field] = meetup_data[meetup_key]
-        return self._post_meetup_data_to_kws(meetup_data,kws)
+            kws[field] = value if convert is None else convert(value)
+        if unknown:
+            self._report_unknown_keys(unknown,stats)
+        return self._post_meetup_data_to_kws(meetup_data,kws,related=related)
+
+    def _report_unknown_keys (self,meetup_keys,stats=None):
+        """ Tally meetup keys which match no field
 
-    def _post_meetup_data_to_kws (self,meetup_data,kws):
+        With stats they are reported once at the end of the sync, without
+        each key is warned about once per process.
+        """
+        model_name = self.model._meta.model_name
+        if stats is not None:
+            stats.add_unknown_keys(model_name,meetup_keys)
+            return
+        new = [k for k in meetup_keys if (model_name,k) not in _warned_unknown_keys]
+        if new:
+            _warned_unknown_keys.update((model_name,k) for k in new)
+            warnings.warn("ignoring meetup_keys {} of {}".format(", ".join(sorted(new)),model_name))
+
+    def _post_meetup_data_to_kws (self,meetup_data,kws,related=None):
         return kws
 
-    def _post_object_creation_or_update (self,obj,md):
+    def _post_object_creation_or_update (self,obj,md,related=None,stats=None):
         return obj
 
+    def _bulk_post_creation_or_update (self,objects,meetup_data,related,stats=None,batch_size=500):
+        """ Bulk counterpart of ``_post_object_creation_or_update``
+
+        Called once per ``bulk_from_meetup_data`` with the written objects and
+        their records, subclasses override it to write what depends on the
+        objects (e.g. many to many links) in a few queries.
+        """
+        return [self._post_object_creation_or_update(obj,md,related=related,stats=stats)
+                for obj,md in zip(objects,meetup_data)]
+
+    def _field_changes (self,obj,kws):
+        """ ``{field name: (stored value, value of kws)}`` of the fields which differ """
+        changes = OrderedDict()
+        for key,value in kws.items():
+            field = self.model._meta.get_field(key)
+            if field.primary_key:
+                continue
+            if field.is_relation:
+                value = getattr(value,'pk',value)
+            else:
+                value = field.to_python(value)
+            old = getattr(obj,field.attname)
+            if old != value:
+                changes[field.name] = (old,value)
+        return changes
+
+    def _changed_fields (self,obj,kws):
+        """ Names of the fields whose stored value differs from kws """
+        return list(self._field_changes(obj,kws))
+
+    def _bulk_prepare_related (self,meetup_data,related,stats=None,diff=None):
+        """ Sync the objects the records refer to before a bulk sync
+
+        Subclasses add them to the ``related`` identity map, which is keyed
+        by ``(model, pk)``, so each is written once for the whole batch.
+        With a ``diff`` they are only compared, see ``diff_meetup_data``.
+        """
+        pass
+
     def to_meetup_params (self,**filter):
         """ Takes filters and converts each to meetup parameters
         which a client who has permissions can POST via api.meetup.com
@@ -104,21 +205,28 @@ class MeetupManager (models.Manager):
         objs = self.filter(**filter)
         return [self._object_to_meetup_params(obj) for obj in objs]
 
-    def from_meetup_data (self,meetup_data,sync=True):
+    def from_meetup_data (self,meetup_data,sync=True,related=None,stats=None):
         """ Takes Meetup data to model data
 
         Parameters
         meetup_data_kws : dict or list of dict
         sync : bool
             sync objects
-
-        Parameters
-        objects : list of objects OR list of dictionaries
-            If sync is False then returns a list of the dictionary key/values to
-            use to create or update the objects
+        related : dict or None
+            identity map of already synced objects keyed by ``(model, pk)``
+        stats : meetup.sync_results.SyncStats or None
+            counts the rows inserted, updated and left unchanged
+
+        Returns
+        objects : object or list of objects OR dictionaries
+            one per record, a single one when meetup_data is a dict. If sync
+            is False then the dictionary key/values to use to create or update
+            the objects (related objects are still synced, use
+            ``diff_meetup_data`` for a read only preview)
 
         """
-        if isinstance(meetup_data,dict):
+        single = isinstance(meetup_data,dict)
+        if single:
             meetup_data = [meetup_data]
 
         # primary key field name
@@ -127,22 +235,191 @@ class MeetupManager (models.Manager):
         objects = []
         for md in meetup_data:
             # get the key/value data from the meetup_data
-            kws = self._meetup_data_to_kws(md)
+            kws = self._meetup_data_to_kws(md,related=related,stats=stats)
             if sync:
                 # create/update the group
                 try:
                     obj = self.get(pk=kws[pk_field])
+                    changed = self._changed_fields(obj,kws)
                     for key in kws:
                         setattr(obj,key,kws[key])
-                    obj.save()
+                    if changed:
+                        # only write the columns which changed
+                        obj.save(update_fields=changed)
+                    outcome = 'updated' if changed else 'unchanged'
                 except self.model.DoesNotExist:
                     obj = self.create(**kws)
-                obj = self._post_object_creation_or_update(obj,md)
+                    outcome = 'inserted'
+                if stats is not None:
+                    stats.add(self.model._meta.model_name,outcome)
+                obj = self._post_object_creation_or_update(obj,md,related=related,stats=stats)
+                if related is not None:
+                    related[related_key(self.model,obj.pk)] = obj
             else:
                 # pass the key/value data through
                 obj = kws
             objects.append(obj)
-        return obj
+        if single:
+            return objects[0]
+        return objects
+
+    def bulk_from_meetup_data (self,meetup_data,related=None,stats=None,batch_size=500):
+        """ Sync many records of Meetup data in a few queries
+
+        Existing rows are looked up with one ``in_bulk`` query per batch,
+        new rows are inserted with ``bulk_create`` and only the changed columns
+        of changed rows are written with ``bulk_update``, all inside one
+        transaction. Objects the records refer to (e.g. the group of an event)
+        are synced once per call.
+
+        Parameters
+        meetup_data : dict or list of dict
+        related : dict or None
+            identity map of already synced objects keyed by ``(model, pk)``,
+            share it between calls to sync each related object only once
+        stats : meetup.sync_results.SyncStats or None
+            counts the rows inserted, updated and left unchanged
+        batch_size : int
+            number of rows per query
+
+        Returns
+        objects : list of objects
+            one per distinct primary key, the last record of a key wins
+
+        """
+        if isinstance(meetup_data,dict):
+            meetup_data = [meetup_data]
+        if related is None:
+            related = {}
+        meetup_data = list(meetup_data)
+
+        # primary key field
+        pk = self.model._meta.pk
+
+        with transaction.atomic(using=self.db):
+            self._bulk_prepare_related(meetup_data,related,stats=stats)
+            records = OrderedDict()
+            for md in meetup_data:
+                kws = self._meetup_data_to_kws(md,related=related,stats=stats)
+                # meetup sends some ids as strings, key them as the db does
+                kws[pk.name] = pk.to_python(kws[pk.name])
+                records[kws[pk.name]] = (kws,md)
+
+            pks = list(records.keys())
+            existing = {}
+            for i in range(0,len(pks),batch_size):
+                existing.update(self.in_bulk(pks[i:i+batch_size]))
+
+            to_create = []
+            to_update = OrderedDict()
+            unchanged = []
+            for pk,(kws,md) in records.items():
+                obj = existing.get(pk)
+                if obj is None:
+                    to_create.append(self.model(**kws))
+                    continue
+                changed = self._changed_fields(obj,kws)
+                for key in kws:
+                    setattr(obj,key,kws[key])
+                if changed:
+                    to_update.setdefault(tuple(sorted(changed)),[]).append(obj)
+                else:
+                    unchanged.append(obj)
+
+            self.bulk_create(to_create,batch_size=batch_size)
+            updated = []
+            for fields,objs in to_update.items():
+                # one bulk update per set of changed columns
+                self._bulk_update(objs,list(fields),batch_size)
+                updated.extend(objs)
+
+            if stats is not None:
+                name = self.model._meta.model_name
+                stats.add(name,'inserted',len(to_create))
+                stats.add(name,'updated',len(updated))
+                stats.add(name,'unchanged',len(unchanged))
+
+            objects = to_create + updated + unchanged
+            objects = self._bulk_post_creation_or_update(
+                objects,[records[obj.pk][1] for obj in objects],related,
+                stats=stats,batch_size=batch_size)
+            for obj in objects:
+                related[related_key(self.model,obj.pk)] = obj
+        return objects
+
+    def diff_meetup_data (self,meetup_data,related=None,diff=None,batch_size=500):
+        """ What bulk_from_meetup_data would write, without writing
+
+        Existing rows are looked up with one ``in_bulk`` query per batch as
+        for a sync. New rows are recorded in ``diff`` with their values,
+        changed ones with the old and new value of each changed field.
+        Objects the records refer to are compared the same way first.
+
+        Parameters
+        meetup_data : dict or list of dict
+        related : dict or None
+            identity map keyed by ``(model, pk)``, it is filled with the
+            objects as they would be after the sync (new ones unsaved)
+        diff : meetup.sync_results.SyncDiff or None
+        batch_size : int
+            number of rows per query
+
+        Returns
+        objects : list of objects
+            one per distinct primary key, none of them saved
+
+        """
+        if isinstance(meetup_data,dict):
+            meetup_data = [meetup_data]
+        if related is None:
+            related = {}
+        if diff is None:
+            diff = SyncDiff()
+        meetup_data = list(meetup_data)
+        name = self.model._meta.model_name
+        pk = self.model._meta.pk
+
+        self._bulk_prepare_related(meetup_data,related,diff=diff)
+        records = OrderedDict()
+        for md in meetup_data:
+            kws = self._meetup_data_to_kws(md,related=related)
+            kws[pk.name] = pk.to_python(kws[pk.name])
+            records[kws[pk.name]] = kws
+
+        pks = list(records.keys())
+        existing = {}
+        for i in range(0,len(pks),batch_size):
+            existing.update(self.in_bulk(pks[i:i+batch_size]))
+
+        objects = []
+        for key,kws in records.items():
+            obj = existing.get(key)
+            if obj is None:
+                obj = self.model(**kws)
+                diff.add_created(name,key,OrderedDict(
+                    (f,getattr(v,'pk',v)) for f,v in kws.items() if f != pk.name))
+            else:
+                changes = self._field_changes(obj,kws)
+                if changes:
+                    diff.add_updated(name,key,changes)
+                else:
+                    diff.add_unchanged(name)
+                # in memory only, for the records referring to it
+                for field in kws:
+                    setattr(obj,field,kws[field])
+            related[related_key(self.model,key)] = obj
+            objects.append(obj)
+        return objects
+
+    def _bulk_update (self,objs,fields,batch_size):
+        if not objs:
+            return
+        if hasattr(self,'bulk_update'):
+            self.bulk_update(objs,fields,batch_size=batch_size)
+        else:
+            # Django < 2.2 has no bulk_update
+            for obj in objs:
+                obj.save(update_fields=fields)
 
 pass
 # ########################################################################### #
@@ -151,7 +428,7 @@ class VenueManager (MeetupManager):
 
     meetup_mapper = Mapper("venue_model -> meetup_data")
 
-    def _post_meetup_data_to_kws (self,obj,kws):
+    def _post_meetup_data_to_kws (self,obj,kws,related=None):
         # convert longitude and latitude
         for key in ('lon','lat'):
             loc = fro_meetup_geo(kws.pop(key))
@@ -198,8 +475,72 @@ class Venue (models.Model):
         return url
 
 
+class MemberManager (MeetupManager):
+
+    meetup_mapper = Mapper("member_model -> meetup_data")
+    meetup_converters = {
+        # meetup times are milliseconds since the epoch, kept in UTC
+        'created': fro_meetup_timestamp,
+        'updated': fro_meetup_timestamp,
+        'visited': fro_meetup_timestamp,
+    }
+    # the group a profile is listed for becomes a membership
+    meetup_hook_keys = ('group',)
+
+    def _post_object_creation_or_update (self,obj,md,related=None,stats=None):
+        group_data = md.get('group')
+        if group_data is not None:
+            self._add_groups({obj.pk:group_data['id']},stats=stats)
+        return obj
+
+    def _bulk_post_creation_or_update (self,objects,meetup_data,related,stats=None,batch_size=500):
+        # /2/profiles returns one profile per member of the group asked for
+        links = OrderedDict()
+        for obj,md in zip(objects,meetup_data):
+            group_data = md.get('group')
+            if group_data is not None:
+                links[obj.pk] = group_data['id']
+        self._add_groups(links,stats=stats,batch_size=batch_size)
+        return objects
+
+    def _add_groups (self,links,stats=None,batch_size=500):
+        """ Make each member a member of its group
+
+        The existing memberships of the members in those groups are read in
+        one query per batch and the missing ones inserted with one
+        ``bulk_create``. Other memberships are kept, a member's profile in
+        one group says nothing about the others.
+
+        Parameters
+        links : dict
+            member id -> group id
+        stats : meetup.sync_results.SyncStats or None
+            counts the memberships inserted or unchanged as ``membership``
+
+        """
+        if not links:
+            return
+        through = self.model.groups.through
+        to_python = self.model._meta.pk.to_python
+        group_to_python = Group._meta.pk.to_python
+        links = OrderedDict((to_python(m),group_to_python(g)) for m,g in links.items())
+        member_ids = list(links)
+        existing = set()
+        for i in range(0,len(member_ids),batch_size):
+            rows = through.objects.filter(member_id__in=member_ids[i:i+batch_size],
+                                          group_id__in=set(links.values()))
+            existing.update(rows.values_list('member_id','group_id'))
+        to_create = [through(member_id=m,group_id=g) for m,g in links.items()
+                     if (m,g) not in existing]
+        through.objects.bulk_create(to_create,batch_size=batch_size)
+        if stats is not None:
+            stats.add('membership','inserted',len(to_create))
+            stats.add('membership','unchanged',len(links)-len(to_create))
+
 class Member (models.Model):
     """ Meetup member account """
+    objects = MemberManager()
+
     member_id = models.IntegerField(primary_key=True)
     name = models.CharField(max_length=255, blank=True)
     bio = models.TextField(blank=True)
@@ -208,6 +549,7 @@ class Member (models.Model):
     updated = models.DateTimeField()
     visited = models.DateTimeField()
     profile_url = models.URLField(max_length=255, blank=True)
+    groups = models.ManyToManyField('Group', related_name='members', blank=True)
 
     def __unicode__(self):
         return self.name
@@ -216,23 +558,19 @@ class GroupManager (MeetupManager):
 
     meetup_mapper = Mapper("group_model -> meetup_data")
     meetup_mapper['n_members'] = 'members'
+    meetup_converters = {
+        # if there are members then convert that number to an int
+        'n_members': lambda members: int(members or 0),
+        # check and convert to timezone string
+        'timezone': lambda name: str(get_timezone(name)),
+    }
 
-    def _post_meetup_data_to_kws (self,meetup_data,kws):
+    def _post_meetup_data_to_kws (self,meetup_data,kws,related=None):
         # convert longitude and latitude
         for key in ('lon','lat'):
             loc = fro_meetup_geo(kws.pop(key,None))
             if loc is not None:
                 kws[key] = loc
-        # if there are members then convert that number to an int
-        key = str('n_members')
-        if key in kws:
-            kws[key] = int(kws[key] or 0)
-
-        # if timezone then check and convert to timezone string
-        key = 'timezone'
-        if key in kws:
-            kws[key] = str(pytz.timezone(meetup_data[key]))
-
         return kws
 
     def _post_object_to_meetup_params (self,obj,kws):
@@ -275,10 +613,17 @@ class EventManager(MeetupManager):
 
     meetup_mapper = Mapper("event_model_field -> meetup_data_key")
     meetup_mapper['event_timestamp'] = 'time'
+    # the venue is linked through the many to many field
+    meetup_hook_keys = ('venue',)
 
-    def _post_meetup_data_to_kws (self,meetup_data,kws):
+    def _post_meetup_data_to_kws (self,meetup_data,kws,related=None):
         group_data = meetup_data['group']
-        kws['group'] = Group.objects.from_meetup_data(group_data,sync=True)
+        group = None
+        if related is not None:
+            group = related.get(related_key(Group,group_data['id']))
+        if group is None:
+            group = Group.objects.from_meetup_data(group_data,sync=True,related=related)
+        kws['group'] = group
         tzinfo = kws['group'].timezone
         key = self.meetup_mapper.fro('time')
         kws[key] = fro_meetup_timestamp(kws[key],tzinfo)
@@ -290,17 +635,173 @@ class EventManager(MeetupManager):
         raise NotImplementedError("not sure if what data meetup wants back to change this")
         return kws
 
-    def _post_object_creation_or_update (self,obj,md):
-        venue = Venue.objects.from_meetup_data(md['venue'],sync=True)
-        obj.venue.add(venue)
+    def _post_object_creation_or_update (self,obj,md,related=None,stats=None):
+        venue_data = md.get('venue')
+        if venue_data is None:
+            # venue not set yet (or hidden), leave the event's links alone
+            return obj
+        venue = None
+        if related is not None:
+            venue = related.get(related_key(Venue,venue_data['id']))
+        if venue is None:
+            venue = Venue.objects.from_meetup_data(venue_data,sync=True,related=related,stats=stats)
+        self._set_venues({obj.pk:venue.pk},stats=stats)
         return obj
 
+    def _bulk_post_creation_or_update (self,objects,meetup_data,related,stats=None,batch_size=500):
+        # the venues were synced by _bulk_prepare_related
+        links = OrderedDict()
+        for obj,md in zip(objects,meetup_data):
+            venue_data = md.get('venue')
+            if venue_data is not None:
+                links[obj.pk] = related[related_key(Venue,venue_data['id'])].pk
+        self._set_venues(links,stats=stats,batch_size=batch_size)
+        return objects
+
+    def _set_venues (self,links,stats=None,batch_size=500):
+        """ Link each event to exactly its venue
+
+        The existing links of the events are read in one query per batch, the
+        missing ones inserted with one ``bulk_create`` and the ones to other
+        venues (the event moved) deleted with one query.
+
+        Parameters
+        links : dict
+            event id -> venue id
+        stats : meetup.sync_results.SyncStats or None
+            counts the events whose link was inserted, updated or unchanged
+            as ``event_venue``
+
+        """
+        if not links:
+            return
+        through = self.model.venue.through
+        # meetup sends event ids as strings, key them as the db does
+        to_python = self.model._meta.pk.to_python
+        links = OrderedDict((to_python(e),v) for e,v in links.items())
+        event_ids = list(links)
+        existing = {}
+        for i in range(0,len(event_ids),batch_size):
+            rows = through.objects.filter(event_id__in=event_ids[i:i+batch_size])
+            for link_id,event_id,venue_id in rows.values_list('id','event_id','venue_id'):
+                existing.setdefault(event_id,{})[venue_id] = link_id
+
+        to_create = []
+        stale = []
+        counts = dict.fromkeys(SyncStats.OUTCOMES,0)
+        for event_id,venue_id in links.items():
+            linked = existing.get(event_id,{})
+            if venue_id not in linked:
+                to_create.append(through(event_id=event_id,venue_id=venue_id))
+            stale.extend(link_id for v,link_id in linked.items() if v != venue_id)
+            if not linked:
+                counts['inserted'] += 1
+            elif list(linked) == [venue_id]:
+                counts['unchanged'] += 1
+            else:
+                counts['updated'] += 1
+
+        for i in range(0,len(stale),batch_size):
+            through.objects.filter(id__in=stale[i:i+batch_size]).delete()
+        through.objects.bulk_create(to_create,batch_size=batch_size)
+        if stats is not None:
+            for outcome,n in counts.items():
+                stats.add('event_venue',outcome,n)
+
+    def _bulk_prepare_related (self,meetup_data,related,stats=None,diff=None):
+        groups = OrderedDict()
+        venues = OrderedDict()
+        for md in meetup_data:
+            group_data = md['group']
+            if related_key(Group,group_data['id']) not in related:
+                groups[group_data['id']] = group_data
+            # a group reuses a few venues for many events, each is written once
+            venue_data = md.get('venue')
+            if venue_data is not None and related_key(Venue,venue_data['id']) not in related:
+                venues[related_key(Venue,venue_data['id'])] = venue_data
+        if diff is not None:
+            Group.objects.diff_meetup_data(list(groups.values()),related=related,diff=diff)
+            Venue.objects.diff_meetup_data(list(venues.values()),related=related,diff=diff)
+            return
+        Group.objects.bulk_from_meetup_data(list(groups.values()),related=related,stats=stats)
+        Venue.objects.bulk_from_meetup_data(list(venues.values()),related=related,stats=stats)
+
+    def reconcile (self,group,returned_ids,since=None,action='cancel',stats=None,
+                   diff=None,batch_size=500):
+        """ Cancel or delete the group's events which meetup no longer returns
+
+        The ids of the group's local events scheduled since ``since`` (all of
+        them when None) are streamed from the (group, status, event_timestamp)
+        index and compared with the set of ids meetup returned for the same
+        window, so the cost grows with the window rather than the history.
+        The orphans are then cancelled with one UPDATE (or deleted) per
+        ``batch_size`` of them.
+
+        Parameters
+        group : Group or int
+        returned_ids : set
+            ids of the events meetup returned for the window, as the db keys them
+        since : datetime.datetime or None
+            start of the window
+        action : str
+            'cancel' sets the orphans' status to cancelled, 'delete' deletes them
+        stats : meetup.sync_results.SyncStats or None
+            counts cancelled events as updated, deleted ones as deleted
+        diff : meetup.sync_results.SyncDiff or None
+            only record what would change, without writing
+
+        Returns
+        orphans : list of int
+
+        """
+        if action not in ('cancel','delete'):
+            raise ValueError("unknown action for orphaned events {!r}".format(action))
+        statuses = STATUS_OPTIONS
+        if action == 'cancel':
+            # cancelled orphans are left as they are
+            statuses = [s for s in STATUS_OPTIONS if s != 'cancelled']
+        local = self.filter(group=group,status__in=statuses)
+        if since is not None:
+            local = local.filter(event_timestamp__gte=since)
+        orphans = []
+        for pk,status in local.values_list('pk','status').iterator():
+            if pk in returned_ids:
+                continue
+            orphans.append(pk)
+            if diff is None:
+                continue
+            if action == 'cancel':
+                diff.add_updated('event',pk,OrderedDict([('status',(status,'cancelled'))]))
+            else:
+                diff.add_deleted('event',[pk])
+        if diff is not None or not orphans:
+            return orphans
+
+        with transaction.atomic(using=self.db):
+            for i in range(0,len(orphans),batch_size):
+                chunk = self.filter(pk__in=orphans[i:i+batch_size])
+                if action == 'cancel':
+                    chunk.update(status='cancelled')
+                else:
+                    chunk.delete()
+        if stats is not None:
+            stats.add('event','updated' if action == 'cancel' else 'deleted',len(orphans))
+        return orphans
+
     def past(self):
         return Event.objects.filter(status='past')
 
     def upcoming(self):
         return Event.objects.filter(status='upcoming')
 
+    def next_upcoming (self,group,**filter):
+        """ The group's soonest upcoming event or None
+
+        A single ``LIMIT 1`` query on the (group, status, event_timestamp) index
+        """
+        events = self.filter(status='upcoming',group=group,**filter)
+        return events.order_by('event_timestamp').first()
+
     def pending(self):
         return Event.objects.filter(status='pending')
 
@@ -332,6 +833,19 @@ class Event(models.Model):
     # timezone to view event times in
     _view_tz = DEFAULT_VIEW_TIMEZONE
 
+    class Meta:
+        indexes = [
+            # a group's upcoming/past events in time order: the views,
+            # next_upcoming and the admin's status and group filters
+            models.Index(fields=['group','status','event_timestamp'],name='meetup_event_group_status_ts'),
+            # past/upcoming/pending of every group in time order
+            models.Index(fields=['status','event_timestamp'],name='meetup_event_status_ts'),
+        ]
+        if django.VERSION >= (2,2):
+            # partial indexes need Django 2.2, see migration 0002
+            indexes.append(models.Index(fields=['group','event_timestamp'],name='meetup_event_upcoming_ts',
+                                        condition=models.Q(status='upcoming')))
+
     def __unicode__ (self):
         return self.name
 
@@ -425,6 +939,83 @@ class Event(models.Model):
         return when.format(h,m)
 
 
+class SyncState (models.Model):
+    """ How far the events (or other endpoint) of a group have been synced """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='sync_states')
+    endpoint = models.CharField(max_length=64)
+    watermark = models.BigIntegerField(null=True, blank=True,
+        help_text="Largest Meetup 'updated' time (ms) synced")
+    last_sync = models.DateTimeField(null=True, blank=True)
+    last_full_sync = models.DateTimeField(null=True, blank=True)
+    # checkpoint of the latest run, see start_run
+    run_id = models.CharField(max_length=32, blank=True)
+    run_started = models.DateTimeField(null=True, blank=True)
+    run_full = models.BooleanField(default=False)
+    cursor = models.TextField(null=True, blank=True,
+        help_text="'meta.next' url after the last page fully written, None once the run finished")
+    batches = models.IntegerField(default=0,
+        help_text="Batches the run has committed")
+
+    class Meta:
+        unique_together = (('group','endpoint'),)
+
+    def __unicode__ (self):
+        return "{} {}".format(self.group_id,self.endpoint)
+
+    def needs_full_sync (self,interval,now):
+        """ True if never synced or last full sync is older than interval """
+        if self.last_sync is None or self.last_full_sync is None:
+            return True
+        return self.last_full_sync + interval <= now
+
+    def can_resume (self,full,window,now):
+        """ True if an interrupted run left a cursor which is still fresh
+
+        Parameters
+        full : bool or None
+            kind of run asked for, None resumes either kind
+        window : datetime.timedelta
+            a run started longer ago is not resumed, the pages have moved
+        now : datetime.datetime
+
+        """
+        if self.cursor is None or self.run_started is None:
+            return False
+        if full is not None and full != self.run_full:
+            return False
+        return self.run_started + window > now
+
+    def start_run (self,full,now):
+        """ Start a new run, dropping the checkpoint of any other """
+        self.run_id = uuid.uuid4().hex
+        self.run_started = now
+        self.run_full = full
+        self.cursor = None
+        self.batches = 0
+        self.save()
+
+    def checkpoint (self,cursor=None):
+        """ Count a committed batch and move the cursor past its page
+
+        Call it in the transaction writing the batch so the checkpoint is
+        never ahead of the data. cursor is None while the page still has
+        records to write.
+        """
+        self.batches += 1
+        fields = ['batches']
+        if cursor is not None:
+            self.cursor = cursor
+            fields.append('cursor')
+        self.save(update_fields=fields)
+
+    def finish_run (self,watermark):
+        """ Record the finished run, the next one starts from scratch """
+        self.watermark = watermark
+        self.last_sync = self.run_started
+        if self.run_full:
+            self.last_full_sync = self.run_started
+        self.cursor = None
+        self.save()
 
 
 # class SurveyQuestionManager (MeetupManager)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Rate limiters sharing the api.meetup.com request budget
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+
+import math
+import sqlite3
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Token bucket fed by the ``X-RateLimit-*`` headers of each response.
+
+    Meetup reports how many requests remain (``X-RateLimit-Remaining``) and
+    how many seconds until the window resets (``X-RateLimit-Reset``). While
+    more than ``burst`` requests remain they are sent straight away. Below
+    that the remaining requests are spread evenly over the rest of the window
+    instead of spending the budget down to zero and sleeping a whole window.
+
+    Subclasses decide where the bucket lives by implementing ``_transaction``.
+
+    Args:
+        burst (int): remaining requests that may be sent without pacing
+    """
+
+    def __init__(self, burst=10):
+        self.burst = burst
+
+    def reserve(self, now=None):
+        """Claims a request from the budget.
+
+        Returns:
+            seconds (float) to wait before sending the request
+        """
+        now = time.time() if now is None else now
+        return self._transaction(lambda state: self._reserve(state, now))
+
+    def update(self, remaining, reset, now=None):
+        """Records the budget reported by the latest response.
+
+        Args:
+            remaining (int): requests remaining in the window
+            reset (int): seconds until the window resets
+        """
+        now = time.time() if now is None else now
+
+        def _update(state):
+            state['remaining'] = remaining
+            state['reset_at'] = now + reset
+            return None
+
+        self._transaction(_update)
+
+    def _reserve(self, state, now):
+        remaining = state.get('remaining')
+        reset_at = state.get('reset_at')
+        if remaining is None or reset_at is None or reset_at <= now:
+            # no budget known or the window already reset
+            return 0
+        if remaining <= 0:
+            # Meetup reports the reset in whole seconds
+            return int(math.ceil(reset_at - now))
+        state['remaining'] = remaining - 1
+        if remaining > self.burst:
+            return 0
+        # pace what is left of the budget over what is left of the window
+        slot = max(now, state.get('next_at') or now)
+        state['next_at'] = slot + max(reset_at - slot, 0) / remaining
+        return slot - now
+
+    def _transaction(self, func):
+        """Calls ``func(state)`` atomically and persists changes to state."""
+        raise NotImplementedError
+
+
+class InProcessRateLimiter(RateLimiter):
+    """Rate limiter shared by the threads of one process."""
+
+    def __init__(self, burst=10):
+        super(InProcessRateLimiter, self).__init__(burst)
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def _transaction(self, func):
+        with self._lock:
+            return func(self._state)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Rate limiter shared by every process on a host using one API key.
+
+    The bucket is a row of a SQLite database; each reservation runs in an
+    immediate transaction so the processes take turns spending the budget.
+
+    Args:
+        path (str): SQLite database file, created if missing
+        key (str): name of the bucket, e.g. one per api key
+        burst (int): see RateLimiter
+        timeout (float): seconds to wait for the database lock
+    """
+
+    def __init__(self, path, key='default', burst=10, timeout=30):
+        super(SQLiteRateLimiter, self).__init__(burst)
+        self.path = path
+        self.key = key
+        self.timeout = timeout
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meetup_rate_limit ("
+                " key TEXT PRIMARY KEY,"
+                " remaining INTEGER,"
+                " reset_at REAL,"
+                " next_at REAL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None
+        )
+
+    def _transaction(self, func):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT remaining, reset_at, next_at FROM meetup_rate_limit"
+                " WHERE key = ?", (self.key,)
+            ).fetchone()
+            keys = ('remaining', 'reset_at', 'next_at')
+            state = dict(zip(keys, row)) if row is not None else {}
+            try:
+                result = func(state)
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute(
+                "INSERT OR REPLACE INTO meetup_rate_limit"
+                " (key, remaining, reset_at, next_at) VALUES (?, ?, ?, ?)",
+                (self.key,) + tuple(state.get(k) for k in keys)
+            )
+            connection.execute("COMMIT")
+            return result
+        finally:
+            connection.close()
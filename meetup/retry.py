@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Retry policy for transient Meetup.com API failures
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+
+import random
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+from meetup.exceptions import (MeetupConnectionError, MeetupHTTPError,
+                               MeetupRateLimitError)
+
+
+class RetryPolicy(object):
+    """Decides whether and when a failed request is sent again.
+
+    The delay before attempt ``n + 1`` is ``backoff_factor * 2 ** (n - 1)``
+    seconds capped at ``max_backoff``. With ``jitter`` the delay is drawn
+    uniformly from zero to that value so parallel workers do not retry in
+    lockstep. A ``Retry-After`` or, on a 429, ``X-RateLimit-Reset`` header
+    overrides the curve when it asks for a longer wait.
+
+    Requests which are not idempotent (POST by default) are only retried when
+    the server cannot have acted on them: the connection was never made or
+    the rate limit rejected the request.
+
+    Args:
+        max_attempts (int): attempts in total, 1 disables retrying
+        backoff_factor (float): seconds to wait before the first retry
+        max_backoff (float): longest wait between two attempts
+        jitter (bool): randomise the waits
+        retry_statuses (tuple): HTTP statuses worth retrying
+        idempotent_methods (tuple): HTTP methods safe to replay
+    """
+
+    def __init__(self, max_attempts=4, backoff_factor=0.5, max_backoff=60,
+                 jitter=True, retry_statuses=(429, 500, 502, 503, 504),
+                 idempotent_methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.idempotent_methods = frozenset(idempotent_methods)
+
+    def get_delay(self, method, attempt, error):
+        """Seconds to wait before retrying, None to give up.
+
+        Args:
+            method (str): HTTP method of the failed request
+            attempt (int): number of attempts made so far, starting at 1
+            error (MeetupError): the failure of the last attempt
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if not self.is_retryable(method, error):
+            return None
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        requested = self._requested_delay(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_backoff))
+        return delay
+
+    def is_retryable(self, method, error):
+        """Whether the failure is transient and replaying the request safe."""
+        if isinstance(error, MeetupConnectionError):
+            transient = True
+        elif isinstance(error, MeetupHTTPError):
+            transient = error.status_code in self.retry_statuses
+        else:
+            transient = False
+        if not transient:
+            return False
+        if method.upper() in self.idempotent_methods:
+            return True
+        # never reached or explicitly not processed by api.meetup.com
+        if isinstance(error, MeetupConnectionError):
+            return not error.connected
+        return isinstance(error, MeetupRateLimitError)
+
+    def _requested_delay(self, error):
+        """The wait asked for by the response headers, if any."""
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            return None
+        retry_after = headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return max(0, float(retry_after))
+            except ValueError:
+                parsed = parsedate_tz(retry_after)
+                if parsed is not None:
+                    return max(0, mktime_tz(parsed) - time.time())
+        if isinstance(error, MeetupRateLimitError):
+            try:
+                return max(0, float(headers['X-RateLimit-Reset']))
+            except (KeyError, ValueError):
+                pass
+        return None
+
+
+# never retries, for callers handling failures themselves
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Keep many groups synced, each at its own cadence
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from django.conf import settings
+import heapq
+import itertools
+import logging
+import threading
+import time
+from meetup.caching import next_event
+from meetup.models import SyncState
+from meetup.sync import close_old_connections, get_rate_limiter, sync_groups
+from meetup.sync_utils import to_meetup_timestamp
+
+logger = logging.getLogger(__name__)
+
+# seconds between syncs of a group with an event about to start
+MEETUP_SCHEDULER_MIN_INTERVAL = getattr(settings,"MEETUP_SCHEDULER_MIN_INTERVAL",5*60)
+# seconds between syncs of a dormant group
+MEETUP_SCHEDULER_MAX_INTERVAL = getattr(settings,"MEETUP_SCHEDULER_MAX_INTERVAL",24*3600)
+
+HOUR = 3600
+DAY = 24*HOUR
+
+# ########################################################################### #
+
+class Cadence (object):
+    """ Decides how long to wait before syncing a group again
+
+    Two rules, the shorter wait wins:
+
+    * proximity: ``min_interval`` when the group's next event starts within a
+      day, hourly within a week, ``max_interval`` otherwise
+    * activity: the previous wait halves when a sync changed rows and doubles
+      when it changed nothing or failed, within the same bounds
+
+    Parameters
+    min_interval : float
+        seconds
+    max_interval : float
+        seconds
+
+    """
+
+    def __init__ (self,min_interval=MEETUP_SCHEDULER_MIN_INTERVAL,
+                  max_interval=MEETUP_SCHEDULER_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    def _clamp (self,seconds):
+        return min(self.max_interval,max(self.min_interval,seconds))
+
+    def proximity_interval (self,seconds_to_event):
+        """ Wait given the seconds until the next event, None if it has none """
+        if seconds_to_event is None:
+            return self.max_interval
+        if seconds_to_event <= DAY:
+            return self.min_interval
+        if seconds_to_event <= 7*DAY:
+            return self._clamp(HOUR)
+        return self.max_interval
+
+    def activity_interval (self,previous,changed):
+        """ Wait given the previous one and whether the sync changed rows """
+        if previous is None:
+            return self.max_interval
+        if changed:
+            return self._clamp(previous/2.0)
+        return self._clamp(previous*2.0)
+
+    def next_interval (self,previous,changed,seconds_to_event):
+        return min(self.activity_interval(previous,changed),
+                   self.proximity_interval(seconds_to_event))
+
+
+class SyncScheduler (object):
+    """ Priority queue of groups keyed by the time their next sync is due
+
+    Each pass pops every group which is due (at most ``workers`` of them),
+    syncs them concurrently with ``meetup.sync.sync_groups`` sharing one rate
+    limiter and puts them back at the time their ``Cadence`` gives.
+
+    Work is coalesced: a group is queued at most once, asking for an earlier
+    sync of a queued group moves it forward instead of adding a duplicate,
+    and a group is never synced twice at the same time.
+
+    Parameters
+    group_ids : list of int
+    workers : int
+        groups synced at the same time
+    api_key : str or None
+    cadence : Cadence or None
+    clock : callable
+        returns the current time in epoch seconds
+    sleep : callable or None
+        sleeps for a number of seconds, by default the scheduler waits until
+        then or until ``schedule()`` or ``stop()`` is called
+
+    """
+
+    def __init__ (self,group_ids=(),workers=1,api_key=None,cadence=None,
+                  clock=time.time,sleep=None):
+        self.workers = max(1,workers)
+        self.api_key = api_key
+        self.cadence = cadence or Cadence()
+        self.clock = clock
+        self.sleep = sleep
+        self.rate_limiter = get_rate_limiter(api_key)
+        self._queue = []
+        # group id -> due time of its live queue entry
+        self._due = {}
+        # group id -> last wait, drives the activity rule
+        self._intervals = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        for group_id in group_ids:
+            self.schedule(group_id,self._initial_due(group_id))
+
+    # ======================= queue
+    def __len__ (self):
+        return len(self._due)
+
+    def schedule (self,group_id,due=None):
+        """ Queue a sync of the group at due (default now)
+
+        Returns False when the group is already queued at or before due.
+        """
+        if due is None:
+            due = self.clock()
+        with self._lock:
+            queued = self._due.get(group_id)
+            if queued is not None and queued <= due:
+                return False
+            # an earlier entry replaces the queued one, which is skipped when popped
+            self._due[group_id] = due
+            heapq.heappush(self._queue,(due,next(self._counter),group_id))
+        self._wakeup.set()
+        return True
+
+    def next_due (self):
+        """ Time the next sync is due, None when nothing is queued """
+        with self._lock:
+            self._drop_stale()
+            return self._queue[0][0] if self._queue else None
+
+    def _drop_stale (self):
+        while self._queue:
+            due,_,group_id = self._queue[0]
+            if self._due.get(group_id) == due:
+                return
+            heapq.heappop(self._queue)
+
+    def pop_due (self,now=None,limit=None):
+        """ Remove and return the groups due at now, soonest first """
+        now = self.clock() if now is None else now
+        due_groups = []
+        with self._lock:
+            while self._queue and (limit is None or len(due_groups) < limit):
+                self._drop_stale()
+                if not self._queue or self._queue[0][0] > now:
+                    break
+                _,_,group_id = heapq.heappop(self._queue)
+                del self._due[group_id]
+                due_groups.append(group_id)
+        return due_groups
+
+    def _initial_due (self,group_id):
+        """ Continue the cadence of the previous process from the last sync """
+        now = self.clock()
+        state = SyncState.objects.filter(group=group_id,endpoint='events').first()
+        if state is None or state.last_sync is None:
+            return now
+        last = to_meetup_timestamp(state.last_sync)[0]/1000.0
+        interval = self.cadence.proximity_interval(self._seconds_to_event(group_id,now))
+        self._intervals[group_id] = interval
+        return max(now,last+interval)
+
+    def _seconds_to_event (self,group_id,now):
+        event = next_event(group_id)
+        if event is None:
+            return None
+        return max(0,to_meetup_timestamp(event.event_timestamp)[0]/1000.0-now)
+
+    # ======================= running
+    def run_pending (self):
+        """ Sync the groups which are due, returns {group id: SyncMetrics} """
+        group_ids = self.pop_due(limit=self.workers)
+        if not group_ids:
+            return {}
+        results = sync_groups(group_ids,workers=min(self.workers,len(group_ids)),
+                              api_key=self.api_key,rate_limiter=self.rate_limiter)
+        now = self.clock()
+        for group_id,metrics in results.items():
+            changed = metrics.error is None and metrics.stats.changed > 0
+            interval = self.cadence.next_interval(
+                self._intervals.get(group_id),changed,self._seconds_to_event(group_id,now))
+            self._intervals[group_id] = interval
+            self.schedule(group_id,now+interval)
+            logger.info("meetup group %s synced, next sync in %ds: %s",group_id,interval,metrics)
+        return results
+
+    def run (self,iterations=None,on_results=None):
+        """ Sync groups as they come due until stop() or iterations passes
+
+        on_results is called with the {group id: SyncMetrics} of each pass.
+        The process runs for days, so database connections left stale by
+        the waits are closed before and after each pass (and by sync_groups
+        around each group, in the worker threads too).
+        """
+        count = 0
+        while not self._stopped:
+            if iterations is not None and count >= iterations:
+                break
+            due = self.next_due()
+            if due is None:
+                break
+            wait = due-self.clock()
+            if wait > 0:
+                if self.sleep is not None:
+                    self.sleep(wait)
+                else:
+                    # woken early by schedule() or stop()
+                    self._wakeup.wait(wait)
+                    self._wakeup.clear()
+                continue
+            close_old_connections()
+            try:
+                results = self.run_pending()
+            finally:
+                close_old_connections()
+            count += 1
+            if on_results is not None:
+                on_results(results)
+
+    def stop (self):
+        self._stopped = True
+        self._wakeup.set()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Signals sent while talking to api.meetup.com and syncing
+"""
+# ########################################################################### #
+
+from __future__ import print_function, division, unicode_literals
+from django.dispatch import Signal
+
+# sent by a MeetupClient after every HTTP response
+# kwargs: method, url, status_code, elapsed (seconds), size (bytes)
+api_request_finished = Signal()
+
+# sent by a MeetupClient after sleeping to respect the rate limit
+# kwargs: seconds
+rate_limit_waited = Signal()
+
+# sent by meetup.sync once the events of a group have been synced
+# kwargs: group_id, stats (SyncStats), metrics (SyncMetrics)
+group_synced = Signal()
@@ -11,33 +11,520 @@ DATE: Mon Sep 15 00:12:21 2014
 
 from __future__ import print_function, division, unicode_literals
 from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from collections import OrderedDict
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+import datetime
+import logging
 from meetup.api import MeetupClient
-from meetup.models import Venue, Group, Event, STATUS_OPTIONS
+from meetup.archive import ArchiveWriter, ReplayClient, archive_path, strip_secrets
+from meetup.caching import refresh_group
+from meetup.models import Venue, Group, Event, Member, SyncState, STATUS_OPTIONS
+from meetup.http_cache import DjangoCache
+from meetup.instrumentation import SyncMetrics
+from meetup.ratelimit import InProcessRateLimiter, SQLiteRateLimiter
+from meetup.signals import group_synced
+from meetup.sync_results import SyncDiff
+from meetup.sync_utils import to_meetup_timestamp
+
+logger = logging.getLogger(__name__)
 
 MEETUP_KEY =  settings.MEETUP_KEY
+MEETUP_RATE_LIMIT_DB = getattr(settings,"MEETUP_RATE_LIMIT_DB",None)
+MEETUP_HTTP_CACHE = getattr(settings,"MEETUP_HTTP_CACHE",None)
+MEETUP_HTTP_CACHE_TTL = getattr(settings,"MEETUP_HTTP_CACHE_TTL",300)
+MEETUP_SYNC_BATCH_SIZE = getattr(settings,"MEETUP_SYNC_BATCH_SIZE",500)
+# days between full syncs of a group's whole event history
+MEETUP_FULL_SYNC_INTERVAL = getattr(settings,"MEETUP_FULL_SYNC_INTERVAL",7)
+# days before the previous sync an incremental sync looks back
+MEETUP_SYNC_LOOKBACK = getattr(settings,"MEETUP_SYNC_LOOKBACK",30)
+# hours an interrupted sync can be resumed from its checkpoint
+MEETUP_SYNC_RESUME_WINDOW = getattr(settings,"MEETUP_SYNC_RESUME_WINDOW",24)
+# what becomes of local events meetup no longer returns: 'cancel', 'delete' or None to keep them
+MEETUP_SYNC_ORPHANS = getattr(settings,"MEETUP_SYNC_ORPHANS","cancel")
 
 # ########################################################################### #
 
-def sync_group_events (group_id,client=None):
-    """ Use meetup group id to sync all events to this data base """
-    if client is None:
-        client = MeetupClient(MEETUP_KEY)
-    # ======================= get the group
-    params = {}
-    params['group_id'] = group_id
-    results = client.invoke("/2/groups",params=params)['results']
-    if not len(results):
-        raise ValueError("No meetup group_id {}".format(params['group_id']))
+def get_client (api_key=None,**kwargs):
+    """ Build a MeetupClient from the django settings
+
+    When ``settings.MEETUP_RATE_LIMIT_DB`` is set the client shares its
+    rate limit budget with every other process using that file. When
+    ``settings.MEETUP_HTTP_CACHE`` names one of ``settings.CACHES`` GET
+    responses are cached there.
+    """
+    if api_key is None:
+        api_key = MEETUP_KEY
+    if 'rate_limiter' not in kwargs:
+        kwargs['rate_limiter'] = get_rate_limiter(api_key)
+    if MEETUP_HTTP_CACHE and 'cache' not in kwargs:
+        kwargs['cache'] = DjangoCache(MEETUP_HTTP_CACHE,ttl=MEETUP_HTTP_CACHE_TTL)
+    return MeetupClient(api_key,**kwargs)
+
+def get_rate_limiter (api_key=None):
+    """ Rate limiter for an api key, shared between processes when
+    ``settings.MEETUP_RATE_LIMIT_DB`` is set
+    """
+    if api_key is None:
+        api_key = MEETUP_KEY
+    if MEETUP_RATE_LIMIT_DB:
+        return SQLiteRateLimiter(MEETUP_RATE_LIMIT_DB,key=api_key)
+    return InProcessRateLimiter()
+
+def close_old_connections ():
+    """ Close the database connections which are broken or older than
+    ``CONN_MAX_AGE``, as django does around each request
+
+    A long running sync process has no requests, call it around each sync.
+    A connection in a transaction (a caller's ``atomic`` block) is kept.
+    """
+    for conn in connections.all():
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+
+def iter_batches (iterable,size):
+    """ Split an iterable into lists of at most size items """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator,size))
+        if not batch:
+            return
+        yield batch
+
+def iter_page_batches (client,meetup_method,params,batch_size,next_url=None):
+    """ Split the records of every page into lists of at most batch_size
+
+    Yields (batch, cursor) where cursor is the ``meta.next`` url (without the
+    api key) to resume from once the batch is written: it is given with the
+    last batch of a page and None with the others.
+    """
+    pages = client.iter_pages(meetup_method,params,next_url=next_url)
+    for page in pages:
+        next_url = page.get('meta',{}).get('next') or None
+        batches = list(iter_batches(page.get('results',()),batch_size))
+        for i,batch in enumerate(batches):
+            cursor = None
+            if next_url is not None and i == len(batches)-1:
+                cursor = strip_secrets(next_url)
+            yield batch,cursor
+
+def sync_group_events (group_id,client=None,batch_size=MEETUP_SYNC_BATCH_SIZE,full=None,
+                       metrics=None,resume=True,replay=False,reconcile=False):
+    """ Use meetup group id to sync all events to this data base
+
+    Events are written in batches of ``batch_size`` with
+    ``Event.objects.bulk_from_meetup_data``
+
+    A full sync downloads the group's whole event history. An incremental
+    sync only asks for events scheduled since ``MEETUP_SYNC_LOOKBACK`` days
+    before the previous sync and skips past events whose ``updated`` time is
+    not newer than the stored watermark. ``full=None`` runs a full sync when
+    the last one is older than ``MEETUP_FULL_SYNC_INTERVAL`` days.
 
-    # ======================= sync events for the group
+    With ``reconcile=True``, which ``sync_groups`` passes as its client
+    asks api.meetup.com for exactly that window, local events of the window
+    which meetup did not return are then cancelled or deleted as
+    ``MEETUP_SYNC_ORPHANS`` says, see ``EventManager.reconcile``. A resumed
+    run skips this step.
+
+    Groups and venues are kept in an identity map for the run, so each is
+    written at most once however many events refer to it. When any row was
+    written the views' cache of the group is invalidated and its next event
+    cached again.
+
+    Each batch is committed together with a checkpoint of the run in the
+    group's ``SyncState``. A run which died part way is resumed from the
+    page after the last one fully written when it started less than
+    ``MEETUP_SYNC_RESUME_WINDOW`` hours ago, unless ``resume`` is False.
+
+    ``replay=True`` writes every event the client serves from an archive
+    (see ``replay_archives``) as it is. The archive is not the window of
+    today's ``SyncState``, so the state is neither read nor moved and no
+    event is reconciled.
+
+    ``metrics`` is a ``meetup.instrumentation.SyncMetrics`` filled with the
+    requests, rate limit waits and per stage timings and queries of the run.
+
+    Returns a ``meetup.sync_results.SyncStats`` of the rows inserted, updated
+    and left unchanged.
+    """
+    # a client built here is closed here, a given one belongs to the caller
+    own_client = client is None
+    if own_client:
+        client = get_client()
+    if metrics is None:
+        metrics = SyncMetrics(group_id)
+    stats = metrics.stats
+    try:
+        with metrics.collect(client):
+            # ======================= sync events for the group
+            # objects synced during this run keyed by (model, pk)
+            related = {}
+            params = {'group_id':group_id}
+            for group in _sync_group(client,group_id,related,metrics):
+                logger.info("syncing events of meetup group %s (%s)",group.pk,group.name)
+                if replay:
+                    _replay_events(client,params,related,metrics,batch_size)
+                else:
+                    _sync_events(client,group,params,related,metrics,batch_size,full,resume,
+                                 reconcile)
+    finally:
+        if own_client:
+            client.close()
+        # even a failed sync may have written some batches
+        if stats.changed:
+            refresh_group(group_id)
+    logger.info("synced meetup group %s: %s",group_id,metrics)
+    if stats.unknown_keys:
+        # one report per run rather than a warning per record
+        logger.warning("meetup group %s: ignored meetup keys matching no field, %s",
+                       group_id,stats.unknown_keys_report())
+    group_synced.send(sender=sync_group_events,group_id=group_id,stats=stats,metrics=metrics)
+    return stats
+
+def _sync_group (client,group_id,related,metrics):
+    """ Fetch the group from /2/groups and write it, yields the Group """
+    params = {'group_id':group_id}
+    with metrics.stage('fetch_group'):
+        results = client.invoke("/2/groups",params=params)['results']
+    if not len(results):
+        raise ValueError("No meetup group_id {}".format(group_id))
     for group_data in results:
-        # create group
-        group = Group.objects.from_meetup_data(group_data)
-        print(" -- for group {} --".format(group.name))
-        # get all status options
-        params['status'] = ",".join(STATUS_OPTIONS)
-        events = client.invoke("/2/events",params)['results']
-        for event_data in events:
-            event = Event.objects.from_meetup_data(event_data)
-            print("   -- sync event {} --".format(event.name))
+        with metrics.stage('write_group'):
+            group = Group.objects.from_meetup_data(group_data,related=related,stats=metrics.stats)
+        yield group
+
+def sync_group_members (group_id,client=None,batch_size=MEETUP_SYNC_BATCH_SIZE,full=None,
+                        metrics=None,resume=True,reconcile=False):
+    """ Use meetup group id to sync all members of the group to this data base
+
+    The profiles of /2/profiles are streamed page by page and written in
+    batches of ``batch_size`` with ``Member.objects.bulk_from_meetup_data``,
+    so only the columns of members which changed are written and each
+    member is linked to the group once.
+
+    /2/profiles cannot be asked for recent changes and ``visited`` changes
+    without touching ``updated``, so every sync pages through the whole
+    membership; ``full`` and ``reconcile`` are accepted for ``sync_groups``.
+    The ``members`` ``SyncState`` of the group records the run and its
+    checkpoints, an interrupted run is resumed as in ``sync_group_events``.
+
+    Returns a ``meetup.sync_results.SyncStats`` of the rows inserted, updated
+    and left unchanged.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_client()
+    if metrics is None:
+        metrics = SyncMetrics(group_id)
+    stats = metrics.stats
+    try:
+        with metrics.collect(client):
+            related = {}
+            for group in _sync_group(client,group_id,related,metrics):
+                logger.info("syncing members of meetup group %s (%s)",group.pk,group.name)
+                _sync_members(client,group,related,metrics,batch_size,resume)
+    finally:
+        if own_client:
+            client.close()
+    logger.info("synced members of meetup group %s: %s",group_id,metrics)
+    if stats.unknown_keys:
+        logger.warning("meetup group %s: ignored meetup keys matching no field, %s",
+                       group_id,stats.unknown_keys_report())
+    return stats
+
+def _sync_members (client,group,related,metrics,batch_size,resume):
+    """ Stream the member profiles of one group into the database """
+    stats = metrics.stats
+    with metrics.stage('read_state'):
+        state,_ = SyncState.objects.get_or_create(group=group,endpoint='members')
+    with metrics.stage('write_state'):
+        next_url = _begin_run(state,True,resume)
+    batches = iter_page_batches(client,"/2/profiles",{'group_id':group.pk},batch_size,next_url)
+    newest = state.watermark
+    while True:
+        with metrics.stage('fetch_members'):
+            item = next(batches,None)
+        if item is None:
+            break
+        batch,cursor = item
+        updated = [md['updated'] for md in batch if md.get('updated')]
+        if updated:
+            newest = max([newest or 0] + updated)
+        with metrics.stage('write_members'), transaction.atomic():
+            Member.objects.bulk_from_meetup_data(
+                batch,related=related,stats=stats,batch_size=batch_size)
+            state.checkpoint(cursor)
+    with metrics.stage('write_state'):
+        state.finish_run(newest)
+
+def _begin_run (state,full,resume):
+    """ Resume the interrupted run of state or start a new one
+
+    Returns the cursor to page from, None to start from the first page.
+    """
+    now = timezone.now()
+    window = datetime.timedelta(hours=MEETUP_SYNC_RESUME_WINDOW)
+    if resume and state.can_resume(full,window,now):
+        logger.info("resuming run %s of meetup group %s %s after %d batches",
+                    state.run_id,state.group_id,state.endpoint,state.batches)
+        return state.cursor
+    state.start_run(_run_full(state,full,now),now)
+    return None
+
+def _run_full (state,full,now):
+    """ Whether a new run is full
+
+    Always True when state (None if never synced) has no previous sync to
+    start an incremental window from. Otherwise ``full`` unless None, then
+    True when the last full sync is ``MEETUP_FULL_SYNC_INTERVAL`` days old.
+    """
+    if state is None or state.last_sync is None:
+        return True
+    if full is not None:
+        return full
+    interval = datetime.timedelta(days=MEETUP_FULL_SYNC_INTERVAL)
+    return state.needs_full_sync(interval,now)
+
+def _event_window (params,state,run_full):
+    """ What a run asks /2/events for and which events it writes
+
+    Returns (event_params, since, watermark): the request parameters, every
+    status and for an incremental run the ``time`` it starts from, that
+    start (None for a full run, its window is the whole history) and the
+    ``updated`` watermark past events must be newer than (None to keep all).
+    Without a previous sync in state (None if there is none) the window is
+    the whole history, as for a full run.
+    """
+    # get all status options
+    event_params = dict(params,status=",".join(STATUS_OPTIONS))
+    if run_full or state is None or state.last_sync is None:
+        return event_params,None,None
+    since = state.last_sync - datetime.timedelta(days=MEETUP_SYNC_LOOKBACK)
+    event_params['time'] = "{},".format(to_meetup_timestamp(since)[0])
+    return event_params,since,state.watermark
+
+def _sync_events (client,group,params,related,metrics,batch_size,full,resume,reconcile):
+    """ Stream the events of one group into the database """
+    stats = metrics.stats
+    with metrics.stage('read_state'):
+        state,_ = SyncState.objects.get_or_create(group=group,endpoint='events')
+    with metrics.stage('write_state'):
+        next_url = _begin_run(state,full,resume)
+    # the window of the run, a resumed one keeps its own
+    event_params,since,watermark = _event_window(params,state,state.run_full)
+    # stream every page of events rather than only the first,
+    # a resumed run continues from the cursor which holds the same parameters
+    batches = iter_page_batches(client,"/2/events",event_params,batch_size,next_url)
+    newest = state.watermark
+    returned_ids = set()
+    while True:
+        with metrics.stage('fetch_events'):
+            item = next(batches,None)
+        if item is None:
+            break
+        batch,cursor = item
+        returned_ids.update(_event_ids(batch))
+        updated = [md['updated'] for md in batch if md.get('updated')]
+        if updated:
+            newest = max([newest or 0] + updated)
+        if watermark is not None:
+            batch = [md for md in batch if _changed_since(md,watermark)]
+        with metrics.stage('write_events'), transaction.atomic():
+            events_synced = Event.objects.bulk_from_meetup_data(
+                batch,related=related,stats=stats,batch_size=batch_size)
+            # committed with the batch, never ahead of it
+            state.checkpoint(cursor)
+        for event in events_synced:
+            logger.debug("synced meetup event %s (%s)",event.pk,event.name)
+    # a resumed run has not seen the ids of the pages before its cursor
+    if reconcile and MEETUP_SYNC_ORPHANS and next_url is None:
+        with metrics.stage('reconcile_events'):
+            orphans = Event.objects.reconcile(group,returned_ids,since=since,
+                                              action=MEETUP_SYNC_ORPHANS,stats=stats,
+                                              batch_size=batch_size)
+        if orphans:
+            logger.info("meetup group %s no longer has events %s, %s them",
+                        group.pk,orphans,"cancelled" if MEETUP_SYNC_ORPHANS == 'cancel' else "deleted")
+    # only move the watermark once every page has been written
+    with metrics.stage('write_state'):
+        state.finish_run(newest)
+
+def _replay_events (client,params,related,metrics,batch_size):
+    """ Stream the archived events of one group into the database """
+    event_params,_,_ = _event_window(params,None,True)
+    batches = iter_page_batches(client,"/2/events",event_params,batch_size)
+    while True:
+        with metrics.stage('fetch_events'):
+            item = next(batches,None)
+        if item is None:
+            break
+        batch,_ = item
+        with metrics.stage('write_events'), transaction.atomic():
+            Event.objects.bulk_from_meetup_data(
+                batch,related=related,stats=metrics.stats,batch_size=batch_size)
+
+def _event_ids (meetup_data):
+    """ Ids of event records as the db keys them """
+    to_python = Event._meta.pk.to_python
+    return [to_python(md['id']) for md in meetup_data]
+
+def diff_group_events (group_id,client=None,batch_size=MEETUP_SYNC_BATCH_SIZE,full=None,
+                       metrics=None,resume=True,replay=False,reconcile=False):
+    """ Dry run of sync_group_events, what it would write without writing
+
+    The group and its events are fetched as for a sync (the same full or
+    incremental window, ``full=None`` decides from the group's
+    ``SyncState``) and compared batch by batch with the rows in the database
+    using ``diff_meetup_data``, with ``reconcile=True`` orphaned events as
+    ``EventManager.reconcile`` would treat them. Nothing is written, not even
+    the checkpoint; ``resume`` is accepted for ``sync_groups``.
+    ``replay=True`` compares every archived event, as ``sync_group_events``.
+
+    Returns a ``meetup.sync_results.SyncDiff``, also kept as ``metrics.diff``.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_client()
+    if metrics is None:
+        metrics = SyncMetrics(group_id)
+    metrics.diff = diff = SyncDiff()
+    try:
+        with metrics.collect(client):
+            related = {}
+            params = {'group_id':group_id}
+            with metrics.stage('fetch_group'):
+                results = client.invoke("/2/groups",params=params)['results']
+            if not len(results):
+                raise ValueError("No meetup group_id {}".format(group_id))
+            with metrics.stage('diff_group'):
+                groups = Group.objects.diff_meetup_data(results,related=related,diff=diff)
+            for group in groups:
+                state = SyncState.objects.filter(group=group.pk,endpoint='events').first()
+                run_full = True if replay else _run_full(state,full,timezone.now())
+                event_params,since,watermark = _event_window(params,state,run_full)
+                batches = iter_page_batches(client,"/2/events",event_params,batch_size)
+                returned_ids = set()
+                while True:
+                    with metrics.stage('fetch_events'):
+                        item = next(batches,None)
+                    if item is None:
+                        break
+                    batch,_ = item
+                    returned_ids.update(_event_ids(batch))
+                    if watermark is not None:
+                        batch = [md for md in batch if _changed_since(md,watermark)]
+                    with metrics.stage('diff_events'):
+                        Event.objects.diff_meetup_data(
+                            batch,related=related,diff=diff,batch_size=batch_size)
+                if reconcile and MEETUP_SYNC_ORPHANS:
+                    with metrics.stage('reconcile_events'):
+                        Event.objects.reconcile(group.pk,returned_ids,since=since,
+                                                action=MEETUP_SYNC_ORPHANS,diff=diff)
+    finally:
+        if own_client:
+            client.close()
+    logger.info("dry run of meetup group %s: %s",group_id,diff)
+    return diff
+
+def sync_groups (group_ids,workers=1,api_key=None,full=None,rate_limiter=None,
+                 archive_dir=None,sync_function=sync_group_events,resume=True):
+    """ Sync the events of many groups, ``workers`` groups at a time
+
+    ``sync_function`` syncs one group, e.g. ``sync_group_members`` to sync
+    their members instead. ``resume=False`` starts every group over rather
+    than resuming an interrupted run. Each group's window is fetched from
+    api.meetup.com as asked, so ``reconcile=True`` is passed on and events
+    meetup no longer returns are reconciled.
+
+    Every worker's client spends the budget of one shared rate limiter. A
+    group which fails is logged and does not stop the others. Stale
+    database connections are closed before and after each group.
+
+    With ``archive_dir`` every page fetched for a group is also written to
+    a new ``meetup.archive`` file there, see ``replay_archives``.
+
+    Returns an OrderedDict of group id to the ``SyncMetrics`` of the group;
+    ``metrics.error`` is the exception which stopped a failed sync
+    """
+    if rate_limiter is None:
+        rate_limiter = get_rate_limiter(api_key)
+
+    def sync_one (group_id):
+        archive = None
+        if archive_dir is not None:
+            archive = ArchiveWriter(archive_path(archive_dir,group_id),group_id=group_id)
+        client = get_client(api_key,rate_limiter=rate_limiter,archive=archive)
+        metrics = SyncMetrics(group_id)
+        close_old_connections()
+        try:
+            sync_function(group_id,client,full=full,metrics=metrics,resume=resume,
+                          reconcile=True)
+        except Exception as error:
+            logger.exception("sync of meetup group %s failed",group_id)
+            metrics.error = error
+        finally:
+            client.close()
+            if archive is not None:
+                archive.close()
+            close_old_connections()
+            if workers > 1:
+                # each worker thread holds its own database connection
+                connection.close()
+        return group_id,metrics
+
+    if workers > 1:
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(sync_one,group_ids,chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [sync_one(group_id) for group_id in group_ids]
+    return OrderedDict(results)
+
+def replay_archives (paths,dry_run=False):
+    """ Sync from archives written by ``sync_groups(archive_dir=...)``
+
+    The pages of each archive go through the same pipeline as a sync from
+    api.meetup.com, without any request. Archives are replayed one after
+    the other in the order given, so several archives of a group rebuild
+    its history in order. A failed archive does not stop the others.
+
+    Every archived event is written, none is reconciled and the groups'
+    ``SyncState`` is left as it is: an archive may be older than the last
+    sync, which would otherwise cancel the events created since and move
+    the watermark back. ``dry_run`` compares the archives with the database without writing,
+    see ``diff_group_events``.
+
+    Returns an OrderedDict of archive path to the ``SyncMetrics`` of its
+    replay; ``metrics.error`` is the exception which stopped a failed one
+    """
+    results = OrderedDict()
+    for path in paths:
+        metrics = SyncMetrics()
+        client = None
+        try:
+            client = ReplayClient(path)
+            metrics.group_id = client.group_id
+            sync = diff_group_events if dry_run else sync_group_events
+            sync(client.group_id,client,metrics=metrics,resume=False,replay=True)
+        except Exception as error:
+            logger.exception("replay of meetup archive %s failed",path)
+            metrics.error = error
+        finally:
+            if client is not None:
+                client.close()
+        results[path] = metrics
+    return results
 
+def _changed_since (meetup_data,watermark):
+    """ True unless a past event was not updated after the watermark """
+    if meetup_data.get('status') != 'past':
+        # rsvp counts of upcoming events change without touching 'updated'
+        return True
+    updated = meetup_data.get('updated')
+    return updated is None or updated > watermark
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: Reports of what a sync wrote or, for a dry run, would write
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from collections import OrderedDict
+import six
+
+# ########################################################################### #
+
+class SyncStats (object):
+    """ Tally of the rows a sync inserted, updated, deleted or left unchanged
+
+    Counts are kept per model name, e.g. ``stats.get('event','inserted')``.
+    Meetup keys which match no model field are counted per model in
+    ``unknown_keys``.
+    """
+
+    OUTCOMES = ('inserted','updated','deleted','unchanged')
+
+    def __init__ (self):
+        self.counts = {}
+        # model name -> {meetup key: records} of keys matching no field
+        self.unknown_keys = {}
+
+    def add (self,model_name,outcome,n=1):
+        counts = self.counts.setdefault(model_name,dict.fromkeys(self.OUTCOMES,0))
+        counts[outcome] += n
+
+    def get (self,model_name,outcome):
+        return self.counts.get(model_name,{}).get(outcome,0)
+
+    @property
+    def changed (self):
+        """ Number of rows inserted, updated or deleted, over every model """
+        return sum(c['inserted']+c['updated']+c['deleted'] for c in self.counts.values())
+
+    def add_unknown_keys (self,model_name,meetup_keys,n=1):
+        keys = self.unknown_keys.setdefault(model_name,{})
+        for key in meetup_keys:
+            keys[key] = keys.get(key,0)+n
+
+    def merge (self,other):
+        for model_name,counts in other.counts.items():
+            for outcome,n in counts.items():
+                self.add(model_name,outcome,n)
+        for model_name,keys in other.unknown_keys.items():
+            for key,n in keys.items():
+                self.add_unknown_keys(model_name,[key],n)
+        return self
+
+    def unknown_keys_report (self):
+        """ One line naming the ignored meetup keys, "" if there were none """
+        parts = []
+        for name in sorted(self.unknown_keys):
+            keys = self.unknown_keys[name]
+            parts.append("{}: ".format(name)+", ".join(
+                "{} ({})".format(k,keys[k]) for k in sorted(keys)))
+        return "; ".join(parts)
+
+    def as_dict (self):
+        return {name:dict(counts) for name,counts in self.counts.items()}
+
+    def __str__ (self):
+        lines = []
+        for name in sorted(self.counts):
+            counts = self.counts[name]
+            lines.append("{}: ".format(name)+", ".join(
+                "{} {}".format(counts[o],o) for o in self.OUTCOMES))
+        return "; ".join(lines)
+
+class SyncDiff (object):
+    """ Rows a sync would create, update or delete, found without writing
+
+    Kept per model name: ``created`` maps each new primary key to its
+    values, ``updated`` each changed primary key to ``{field: (old, new)}``,
+    ``deleted`` lists primary keys and ``unchanged`` counts the rest.
+    """
+
+    def __init__ (self):
+        self.created = OrderedDict()
+        self.updated = OrderedDict()
+        self.deleted = OrderedDict()
+        self.unchanged = {}
+
+    def add_created (self,model_name,pk,values):
+        self.created.setdefault(model_name,OrderedDict())[pk] = values
+
+    def add_updated (self,model_name,pk,changes):
+        self.updated.setdefault(model_name,OrderedDict())[pk] = changes
+
+    def add_deleted (self,model_name,pks):
+        self.deleted.setdefault(model_name,[]).extend(pks)
+
+    def add_unchanged (self,model_name,n=1):
+        self.unchanged[model_name] = self.unchanged.get(model_name,0)+n
+
+    def model_names (self):
+        names = set(self.created)|set(self.updated)|set(self.deleted)|set(self.unchanged)
+        return sorted(names)
+
+    @property
+    def changed (self):
+        """ Number of rows which would be created, updated or deleted """
+        return (sum(len(v) for v in self.created.values())
+                +sum(len(v) for v in self.updated.values())
+                +sum(len(v) for v in self.deleted.values()))
+
+    def merge (self,other):
+        for name,rows in other.created.items():
+            self.created.setdefault(name,OrderedDict()).update(rows)
+        for name,rows in other.updated.items():
+            self.updated.setdefault(name,OrderedDict()).update(rows)
+        for name,pks in other.deleted.items():
+            self.add_deleted(name,pks)
+        for name,n in other.unchanged.items():
+            self.add_unchanged(name,n)
+        return self
+
+    def lines (self):
+        """ One line per row which would change, e.g. for a console """
+        lines = []
+        for name in self.model_names():
+            for pk in self.created.get(name,()):
+                lines.append("create {} {}".format(name,pk))
+            for pk,changes in self.updated.get(name,{}).items():
+                lines.append("update {} {}: ".format(name,pk)+", ".join(
+                    "{} {!r} -> {!r}".format(f,old,new) for f,(old,new) in changes.items()))
+            for pk in self.deleted.get(name,()):
+                lines.append("delete {} {}".format(name,pk))
+        return lines
+
+    def as_dict (self):
+        def jsonable (value):
+            if value is None or isinstance(value,(bool,int,float)+six.string_types):
+                return value
+            return six.text_type(value)
+        data = {}
+        for name in self.model_names():
+            data[name] = OrderedDict([
+                ('created',OrderedDict(
+                    (six.text_type(pk),{f:jsonable(v) for f,v in values.items()})
+                    for pk,values in self.created.get(name,{}).items())),
+                ('updated',OrderedDict(
+                    (six.text_type(pk),{f:[jsonable(old),jsonable(new)] for f,(old,new) in changes.items()})
+                    for pk,changes in self.updated.get(name,{}).items())),
+                ('deleted',[jsonable(pk) for pk in self.deleted.get(name,())]),
+                ('unchanged',self.unchanged.get(name,0)),
+            ])
+        return data
+
+    def __str__ (self):
+        lines = []
+        for name in self.model_names():
+            lines.append("{}: {} to create, {} to update, {} to delete, {} unchanged".format(
+                name,len(self.created.get(name,())),len(self.updated.get(name,())),
+                len(self.deleted.get(name,())),self.unchanged.get(name,0)))
+        return "; ".join(lines)
@@ -11,9 +11,9 @@ DATE: Mon Sep 15 09:18:17 2014
 
 from __future__ import print_function, division, unicode_literals
 import os
-import time
 import datetime
 import pytz
+import six
 
 # ########################################################################### #
 
@@ -27,37 +27,64 @@ def to_meetup_geo (geo):
     """ from geo location to Meetup data geo """
     return geo
 
+_timezones = {}
+
+def get_timezone (name):
+    """ pytz timezone for a name, looked up once per name """
+    try:
+        return _timezones[name]
+    except KeyError:
+        tz = _timezones[name] = pytz.timezone(name)
+        return tz
+
+# Meetup times are milliseconds since this instant
+EPOCH = datetime.datetime(1970,1,1,tzinfo=pytz.utc)
+
+def _as_timezone (tzinfo):
+    """ tzinfo object for a tzinfo or a name, None for "" """
+    if isinstance(tzinfo,datetime.tzinfo):
+        return tzinfo
+    elif tzinfo:
+        return get_timezone(tzinfo)
+
 def fro_meetup_timestamp (t,tzinfo=""):
     """ Take time stamp from Meetup, convert to datetime
     assumes utc if not tzinfo is given
 
+    Milliseconds are kept as microseconds of the datetime.
+
     t : integer
         time in milliseconds
     tzinfo : string or pytz.timezone object
 
 
     """
-    # convert to structured time
-    struct_time = time.gmtime(int(t) / 1000.0)
-    # get datetime object
-    keys = ['year','month','day','hour','minute','second']
-    kws = {k:struct_time[i] for i,k in enumerate(keys)}
-    kws['tzinfo'] = pytz.utc
-    dt = datetime.datetime(**kws)
-    # apply timezone info if needed
-    if isinstance(tzinfo,datetime.tzinfo):
-        return dt.astimezone(tzinfo)
-    elif len(tzinfo):
-        return dt.astimezone(pytz.timezone(tzinfo))
-    else:
+    if isinstance(t,six.string_types):
+        t = int(t)
+    dt = EPOCH+datetime.timedelta(milliseconds=t)
+    tz = _as_timezone(tzinfo)
+    if tz is None:
         return dt
+    return dt.astimezone(tz)
 
 def to_meetup_timestamp (ts):
-    """ Convert to meetup's time stamp
+    """ Convert a datetime to meetup's time stamp
 
+    The inverse of fro_meetup_timestamp,
+    ``fro_meetup_timestamp(*to_meetup_timestamp(ts)) == ts`` to the
+    millisecond. Naive datetimes are taken to be utc.
 
-    """
-    tzinfo = str(ts.tzinfo)
-    t = time.mktime(d.timetuple())
-    return t,tzinfo
+    ts : datetime.datetime
+
+    Returns
+    t : integer
+        time in milliseconds
+    tzinfo : string
+        name of the timezone of ts, "UTC" for naive datetimes
 
+    """
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=pytz.utc)
+    delta = ts-EPOCH
+    t = (delta.days*86400+delta.seconds)*1000+delta.microseconds//1000
+    return t,str(ts.tzinfo)
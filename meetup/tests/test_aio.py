@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the asyncio meetup client
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import sys
+import threading
+import time
+import unittest
+
+from mock import MagicMock
+from mock import Mock
+from mock import patch
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from meetup.aio import AsyncMeetupClient
+    from meetup.exceptions import MeetupClientError
+    from meetup.retry import RetryPolicy
+
+
+MEETUP_KEY = "abc123"
+
+
+# ########################################################################### #
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio client needs Python 3.5+")
+class AsyncMeetupClientTests(unittest.TestCase):
+    """Tests for the AsyncMeetupClient.
+    """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.transport = Mock()
+        self.json_body = MagicMock()
+        self.response_headers = {
+            'X-RateLimit-Remaining': "14",
+            'X-RateLimit-Reset': "2"
+        }
+        self.transport.request.return_value = Mock(
+            status_code=200,
+            headers=self.response_headers,
+            json=Mock(return_value=self.json_body)
+        )
+        self.client = AsyncMeetupClient(
+            api_key=MEETUP_KEY,
+            transport=self.transport,
+            loop=self.loop
+        )
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_until_complete(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_invoke_get_calls_transport(self):
+        result = self.run_until_complete(
+            self.client.invoke("2/groups", {"member_id": "12345"})
+        )
+        self.assertIs(self.json_body, result)
+        self.transport.request.assert_called_once()
+        self.assertEqual('GET', self.transport.request.call_args[0][0])
+
+    def test_get_events_defaults_status(self):
+        self.run_until_complete(self.client.get_events(group_id=1))
+        called_url = self.transport.request.call_args[0][1]
+        self.assertIn('/2/events?', called_url)
+        self.assertIn('status=upcoming%2Cpast', called_url)
+
+    def test_get_next_page_uses_meta_to_fetch_next(self):
+        result = self.run_until_complete(
+            self.client.get_next_page({"meta": {"next": "http://foo.co/2"}})
+        )
+        self.assertIs(self.json_body, result)
+        self.transport.request.assert_called_once_with(
+            "GET", "http://foo.co/2"
+        )
+
+    def test_get_next_page_no_next_is_none(self):
+        result = self.run_until_complete(self.client.get_next_page({}))
+        self.assertIsNone(result)
+        self.transport.request.assert_not_called()
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        counts = {'active': 0, 'peak': 0}
+        response = self.transport.request.return_value
+
+        def slow_request(*args, **kwargs):
+            with lock:
+                counts['active'] += 1
+                counts['peak'] = max(counts['peak'], counts['active'])
+            time.sleep(0.02)
+            with lock:
+                counts['active'] -= 1
+            return response
+
+        self.transport.request.side_effect = slow_request
+        executor = ThreadPoolExecutor(max_workers=8)
+        client = AsyncMeetupClient(
+            transport=self.transport,
+            max_concurrency=2,
+            loop=self.loop,
+            executor=executor
+        )
+        calls = [client.invoke("2/groups/{}".format(i)) for i in range(6)]
+        self.run_until_complete(asyncio.gather(*calls))
+        executor.shutdown()
+        self.assertEqual(6, self.transport.request.call_count)
+        self.assertEqual(2, counts['peak'])
+
+    def test_server_error_is_retried(self):
+        failure = Mock(status_code=503, headers={}, json=Mock(return_value={}))
+        self.transport.request.side_effect = [
+            failure, self.transport.request.return_value
+        ]
+        self.client.client.retry_policy = RetryPolicy(backoff_factor=0)
+        result = self.run_until_complete(self.client.invoke("2/groups"))
+        self.assertIs(self.json_body, result)
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_client_error_raises(self):
+        self.transport.request.return_value = Mock(
+            status_code=400, headers={}, json=Mock(return_value={})
+        )
+        with self.assertRaises(MeetupClientError):
+            self.run_until_complete(self.client.invoke("2/groups"))
+
+    def test_hit_rate_limit_sleeps_without_blocking(self):
+        self.response_headers['X-RateLimit-Remaining'] = "0"
+        self.response_headers['X-RateLimit-Reset'] = "3"
+        self.run_until_complete(self.client.invoke("2/groups/foo"))
+
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            done = self.loop.create_future()
+            done.set_result(None)
+            return done
+
+        with patch.object(asyncio, "sleep", side_effect=fake_sleep):
+            with patch.object(time, "sleep") as mock_sleep:
+                self.run_until_complete(self.client.invoke("2/groups/bar"))
+        mock_sleep.assert_not_called()
+        self.assertEqual([3], sleeps)
+
+
+    @unittest.skipIf(sys.version_info < (3, 7), "asyncio.run needs Python 3.7+")
+    def test_client_serves_several_runs(self):
+        client = AsyncMeetupClient(api_key=MEETUP_KEY, transport=self.transport,
+                                   max_concurrency=2)
+
+        async def fetch():
+            return await asyncio.gather(*[client.invoke("2/groups")
+                                          for _ in range(3)])
+
+        # each run has a new loop, closed at its end
+        self.assertEqual(3, len(asyncio.run(fetch())))
+        self.assertEqual(3, len(asyncio.run(fetch())))
+        self.assertEqual(6, self.transport.request.call_count)
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
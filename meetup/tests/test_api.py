@@ -16,10 +16,21 @@ import unittest
 from mock import MagicMock
 from mock import Mock
 from mock import patch
-import requests
 from six.moves.urllib_parse import urlparse, parse_qs
 
+import requests
+
 from meetup.api import MeetupClient
+from meetup.api import MeetupTransport
+from meetup.exceptions import MeetupClientError
+from meetup.exceptions import MeetupConnectionError
+from meetup.exceptions import MeetupRateLimitError
+from meetup.exceptions import MeetupResponseError
+from meetup.exceptions import MeetupServerError
+from meetup.retry import NO_RETRY
+from meetup.retry import RetryPolicy
+from meetup.signals import api_request_finished
+from meetup.signals import rate_limit_waited
 
 
 MEETUP_KEY = "abc123"
@@ -33,7 +44,8 @@ class MeetupClientTests(unittest.TestCase):
     """
 
     def setUp(self):
-        self.client = MeetupClient(api_key=MEETUP_KEY)
+        self.transport = Mock()
+        self.client = MeetupClient(api_key=MEETUP_KEY, transport=self.transport)
         self.json_body = MagicMock()
         self.response_headers = {
             'X-RateLimit-Remaining': "14",
@@ -41,9 +53,11 @@ class MeetupClientTests(unittest.TestCase):
         }
         self.mock_json = Mock(return_value=self.json_body)
         self.mock_response = Mock(
+            status_code=200,
             headers=self.response_headers,
             json=self.mock_json
         )
+        self.transport.request.return_value = self.mock_response
 
     def assertGetCallMatches(self, called_url, expected_path, params_dict):
         parsed_url = urlparse(called_url)
@@ -58,21 +72,22 @@ class MeetupClientTests(unittest.TestCase):
             query_dict
         )
 
-    @patch.object(requests, "get")
-    @patch.object(requests, "post")
-    @patch.object(requests, "delete")
-    def test_oauth_requests(self, mock_delete, mock_post, mock_get):
-        mock_get.return_value = self.mock_response
-        self.client = MeetupClient(oauth_token=MEETUP_KEY)
+    def test_oauth_requests(self):
+        mock_request = self.transport.request
+        self.client = MeetupClient(
+            oauth_token=MEETUP_KEY,
+            transport=self.transport
+        )
         self.client.invoke(
             meetup_method="2/groups",
             params={"member_id": "12345"},
             method="GET"
         )
 
-        mock_get.assert_called_once()
-        called_url = mock_get.call_args[0][0]
-        headers = mock_get.call_args[1]['headers']
+        mock_request.assert_called_once()
+        self.assertEqual('GET', mock_request.call_args[0][0])
+        called_url = mock_request.call_args[0][1]
+        headers = mock_request.call_args[1]['headers']
         self.assertEqual({'Authorization': 'Bearer abc123'}, headers)
 
         self.assertGetCallMatches(
@@ -84,13 +99,14 @@ class MeetupClientTests(unittest.TestCase):
             }
         )
 
-        mock_post.return_value = self.mock_response
+        mock_request.reset_mock()
         self.client.invoke(
             meetup_method="2/groups",
             params={"name": "Awesome Team"},
             method="POST"
         )
-        mock_post.assert_called_once_with(
+        mock_request.assert_called_once_with(
+            "POST",
             "https://api.meetup.com/2/groups",
             data={
                 "name": "Awesome Team"
@@ -98,13 +114,14 @@ class MeetupClientTests(unittest.TestCase):
             headers={'Authorization': 'Bearer abc123'}
         )
 
-        mock_delete.return_value = self.mock_response
+        mock_request.reset_mock()
         self.client.invoke(
             meetup_method="2/groups/awesome-team",
             params={"id": 72},
             method="DELETE"
         )
-        mock_delete.assert_called_once_with(
+        mock_request.assert_called_once_with(
+            "DELETE",
             "https://api.meetup.com/2/groups/awesome-team",
             params={
                 "id": 72
@@ -112,9 +129,8 @@ class MeetupClientTests(unittest.TestCase):
             headers={'Authorization': 'Bearer abc123'}
         )
 
-    @patch.object(requests, "get")
-    def test_invoke_get_calls_requests(self, mock_get):
-        mock_get.return_value = self.mock_response
+    def test_invoke_get_calls_requests(self):
+        mock_get = self.transport.request
         result = self.client.invoke(
             meetup_method="2/groups",
             params={
@@ -123,7 +139,8 @@ class MeetupClientTests(unittest.TestCase):
             method="GET"
         )
         mock_get.assert_called_once()
-        called_url = mock_get.call_args[0][0]
+        self.assertEqual('GET', mock_get.call_args[0][0])
+        called_url = mock_get.call_args[0][1]
 
         self.assertGetCallMatches(
             called_url,
@@ -138,9 +155,8 @@ class MeetupClientTests(unittest.TestCase):
         self.mock_json.assert_called_once_with()
         self.assertIs(self.json_body, result)
 
-    @patch.object(requests, "patch")
-    def test_invoke_patch_calls_requests(self, mock_patch):
-        mock_patch.return_value = self.mock_response
+    def test_invoke_patch_calls_requests(self):
+        mock_patch = self.transport.request
         result = self.client.invoke(
             meetup_method="foo/events/1734824",
             params={
@@ -149,6 +165,7 @@ class MeetupClientTests(unittest.TestCase):
             method="PATCH"
         )
         mock_patch.assert_called_once_with(
+            "PATCH",
             "https://api.meetup.com/foo/events/1734824",
             data={
                 "key": "abc123",
@@ -158,9 +175,8 @@ class MeetupClientTests(unittest.TestCase):
         self.mock_json.assert_called_once_with()
         self.assertIs(self.json_body, result)
 
-    @patch.object(requests, "post")
-    def test_invoke_post_calls_requests(self, mock_post):
-        mock_post.return_value = self.mock_response
+    def test_invoke_post_calls_requests(self):
+        mock_post = self.transport.request
         result = self.client.invoke(
             meetup_method="2/groups",
             params={
@@ -169,6 +185,7 @@ class MeetupClientTests(unittest.TestCase):
             method="POST"
         )
         mock_post.assert_called_once_with(
+            "POST",
             "https://api.meetup.com/2/groups",
             data={
                 "key": "abc123",
@@ -178,9 +195,8 @@ class MeetupClientTests(unittest.TestCase):
         self.mock_json.assert_called_once_with()
         self.assertIs(self.json_body, result)
 
-    @patch.object(requests, "delete")
-    def test_invoke_delete_calls_requests(self, mock_delete):
-        mock_delete.return_value = self.mock_response
+    def test_invoke_delete_calls_requests(self):
+        mock_delete = self.transport.request
         result = self.client.invoke(
             meetup_method="2/groups/awesome-team",
             params={
@@ -189,6 +205,7 @@ class MeetupClientTests(unittest.TestCase):
             method="DELETE"
         )
         mock_delete.assert_called_once_with(
+            "DELETE",
             "https://api.meetup.com/2/groups/awesome-team",
             params={
                 "key": "abc123",
@@ -199,9 +216,8 @@ class MeetupClientTests(unittest.TestCase):
         self.assertIs(self.json_body, result)
 
     @patch.object(time, "sleep")
-    @patch.object(requests, "get")
-    def test_hit_rate_limit_waits(self, mock_get, mock_sleep):
-        mock_get.return_value = self.mock_response
+    def test_hit_rate_limit_waits(self, mock_sleep):
+        mock_get = self.transport.request
         self.response_headers['X-RateLimit-Remaining'] = "0"
         self.response_headers['X-RateLimit-Reset'] = "4"
         self.client.invoke("2/groups/foo")
@@ -215,9 +231,8 @@ class MeetupClientTests(unittest.TestCase):
         self.client.invoke("2/groups/chew")
         mock_sleep.assert_called_once_with(2)
 
-    @patch.object(requests, "get")
-    def test_get_next_page_uses_meta_to_fetch_next(self, mock_get):
-        mock_get.return_value = self.mock_response
+    def test_get_next_page_uses_meta_to_fetch_next(self):
+        mock_get = self.transport.request
         result = self.client.get_next_page(
             {
                 "meta": {
@@ -225,7 +240,7 @@ class MeetupClientTests(unittest.TestCase):
                 }
             }
         )
-        mock_get.assert_called_once_with("http://meetup.foo.co/page-2")
+        mock_get.assert_called_once_with("GET", "http://meetup.foo.co/page-2")
         self.mock_json.assert_called_once_with()
         self.assertIs(self.json_body, result)
 
@@ -243,6 +258,268 @@ class MeetupClientTests(unittest.TestCase):
         result = self.client.get_next_page({})
         self.assertIsNone(result)
 
+    def test_get_next_page_empty_next_is_none(self):
+        result = self.client.get_next_page({"meta": {"next": ""}})
+        self.assertIsNone(result)
+        self.transport.request.assert_not_called()
+
+    def _paged_responses(self, pages):
+        responses = []
+        for i, results in enumerate(pages):
+            is_last = i == len(pages) - 1
+            body = {
+                'results': results,
+                'meta': {'next': '' if is_last else 'http://foo.co/%d' % (i + 2)}
+            }
+            responses.append(Mock(
+                status_code=200,
+                headers=self.response_headers,
+                json=Mock(return_value=body)
+            ))
+        self.transport.request.side_effect = responses
+
+    def test_iter_results_follows_meta_next(self):
+        self._paged_responses([[1, 2], [3], [4, 5]])
+        records = list(self.client.iter_results("2/events", {"group_id": 7}))
+        self.assertEqual([1, 2, 3, 4, 5], records)
+        called_urls = [c[0][1] for c in self.transport.request.call_args_list]
+        self.assertEqual(
+            ['http://foo.co/2', 'http://foo.co/3'],
+            called_urls[1:]
+        )
+
+    def test_get_page_adds_the_api_key(self):
+        self.client.get_page("http://foo.co/2?offset=1")
+        self.client.get_page("http://foo.co/3?offset=2&sig_id=1&sig=abc")
+        called_urls = [c[0][1] for c in self.transport.request.call_args_list]
+        self.assertEqual(
+            ["http://foo.co/2?offset=1&key=" + MEETUP_KEY,
+             "http://foo.co/3?offset=2&sig_id=1&sig=abc"],
+            called_urls
+        )
+
+    def test_iter_pages_resumes_at_next_url(self):
+        self._paged_responses([[3], [4, 5]])
+        records = list(self.client.iter_results(
+            "2/events", next_url="http://foo.co/2?key=" + MEETUP_KEY))
+        self.assertEqual([3, 4, 5], records)
+        called_urls = [c[0][1] for c in self.transport.request.call_args_list]
+        self.assertEqual(
+            ["http://foo.co/2?key=" + MEETUP_KEY, "http://foo.co/2"],
+            called_urls
+        )
+
+    def test_iter_results_without_prefetch(self):
+        self._paged_responses([[1], [2]])
+        records = self.client.iter_results("2/events", prefetch=False)
+        self.assertEqual(1, next(records))
+        self.assertEqual(1, self.transport.request.call_count)
+        self.assertEqual([2], list(records))
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_iter_results_prefetches_next_page(self):
+        self._paged_responses([[1], [2]])
+        records = self.client.iter_results("2/events")
+        self.assertEqual(1, next(records))
+        # the second page is requested while the first is still consumed
+        deadline = time.time() + 1
+        while self.transport.request.call_count < 2 and time.time() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(2, self.transport.request.call_count)
+        self.assertEqual([2], list(records))
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_requests_send_signal(self):
+        self.mock_response.content = b'{"results": []}'
+        self.mock_response.status_code = 200
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append((sender, kwargs))
+
+        api_request_finished.connect(receiver)
+        try:
+            self.client.invoke("2/groups")
+        finally:
+            api_request_finished.disconnect(receiver)
+        self.assertEqual(1, len(received))
+        sender, kwargs = received[0]
+        self.assertIs(self.client, sender)
+        self.assertEqual('GET', kwargs['method'])
+        self.assertEqual(200, kwargs['status_code'])
+        self.assertEqual(15, kwargs['size'])
+        self.assertTrue(kwargs['elapsed'] >= 0)
+
+    @patch.object(time, "sleep")
+    def test_rate_limit_wait_sends_signal(self, mock_sleep):
+        self.response_headers['X-RateLimit-Remaining'] = "0"
+        self.response_headers['X-RateLimit-Reset'] = "4"
+        received = []
+
+        def receiver(sender, seconds, **kwargs):
+            received.append(seconds)
+
+        rate_limit_waited.connect(receiver)
+        try:
+            self.client.invoke("2/groups/foo")
+            self.client.invoke("2/groups/bar")
+        finally:
+            rate_limit_waited.disconnect(receiver)
+        self.assertEqual([4], received)
+
+    def test_close_closes_transport(self):
+        with self.client as client:
+            self.assertIs(self.client, client)
+        self.transport.close.assert_called_once_with()
+
+
+@patch.object(time, "sleep")
+class MeetupClientErrorTests(unittest.TestCase):
+    """Tests that failed requests raise typed errors and are retried.
+    """
+
+    def setUp(self):
+        self.transport = Mock()
+        self.client = MeetupClient(
+            api_key=MEETUP_KEY,
+            transport=self.transport,
+            retry_policy=RetryPolicy(max_attempts=3, jitter=False)
+        )
+
+    def make_response(self, status_code, body=None, headers=None):
+        json = Mock(return_value=body)
+        if body is None:
+            json.side_effect = ValueError("No JSON object could be decoded")
+        return Mock(status_code=status_code, headers=headers or {}, json=json)
+
+    def test_server_error_is_retried(self, mock_sleep):
+        self.transport.request.side_effect = [
+            self.make_response(503),
+            self.make_response(502),
+            self.make_response(200, {'results': []}),
+        ]
+        result = self.client.invoke("2/groups")
+        self.assertEqual({'results': []}, result)
+        self.assertEqual(3, self.transport.request.call_count)
+        self.assertEqual([((0.5,),), ((1.0,),)], mock_sleep.call_args_list)
+
+    def test_gives_up_after_max_attempts(self, mock_sleep):
+        self.transport.request.return_value = self.make_response(500)
+        with self.assertRaises(MeetupServerError) as raised:
+            self.client.invoke("2/groups")
+        self.assertEqual(500, raised.exception.status_code)
+        self.assertEqual(3, self.transport.request.call_count)
+
+    def test_client_error_is_not_retried(self, mock_sleep):
+        body = {'errors': [{'code': 'not_found'}]}
+        self.transport.request.return_value = self.make_response(404, body)
+        with self.assertRaises(MeetupClientError) as raised:
+            self.client.invoke("2/groups")
+        self.assertEqual(body, raised.exception.body)
+        self.assertEqual(1, self.transport.request.call_count)
+
+    def test_rate_limited_honours_retry_after(self, mock_sleep):
+        self.transport.request.side_effect = [
+            self.make_response(429, {}, {'Retry-After': '7'}),
+            self.make_response(200, {'results': []}),
+        ]
+        self.client.invoke("2/groups")
+        mock_sleep.assert_called_once_with(7.0)
+
+    def test_rate_limited_honours_rate_limit_reset(self, mock_sleep):
+        headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '5'}
+        self.transport.request.side_effect = [
+            self.make_response(429, {}, headers),
+            self.make_response(200, {'results': []}),
+        ]
+        self.client.invoke("2/groups")
+        # the rate limiter waits out the window before the retry
+        self.assertIn(((5,),), mock_sleep.call_args_list)
+
+    def test_post_is_not_replayed_after_server_error(self, mock_sleep):
+        self.transport.request.return_value = self.make_response(503)
+        with self.assertRaises(MeetupServerError):
+            self.client.invoke("2/event", {"name": "x"}, method='POST')
+        self.assertEqual(1, self.transport.request.call_count)
+
+    def test_post_is_replayed_when_never_sent(self, mock_sleep):
+        self.transport.request.side_effect = [
+            requests.exceptions.ConnectTimeout("connect timed out"),
+            self.make_response(200, {'id': 1}),
+        ]
+        result = self.client.invoke("2/event", {"name": "x"}, method='POST')
+        self.assertEqual({'id': 1}, result)
+
+    def test_post_is_not_replayed_after_read_timeout(self, mock_sleep):
+        self.transport.request.side_effect = requests.exceptions.ReadTimeout()
+        with self.assertRaises(MeetupConnectionError) as raised:
+            self.client.invoke("2/event", {"name": "x"}, method='POST')
+        self.assertTrue(raised.exception.connected)
+        self.assertEqual(1, self.transport.request.call_count)
+
+    def test_connection_reset_is_retried_for_get(self, mock_sleep):
+        self.transport.request.side_effect = [
+            requests.exceptions.ConnectionError("connection reset by peer"),
+            self.make_response(200, {'results': []}),
+        ]
+        self.assertEqual({'results': []}, self.client.invoke("2/groups"))
+
+    def test_invalid_json_raises(self, mock_sleep):
+        self.transport.request.return_value = self.make_response(200)
+        with self.assertRaises(MeetupResponseError):
+            self.client.get_next_page({'meta': {'next': 'http://foo.co/2'}})
+
+    def test_no_retry_policy(self, mock_sleep):
+        self.client.retry_policy = NO_RETRY
+        self.transport.request.return_value = self.make_response(429, {})
+        with self.assertRaises(MeetupRateLimitError):
+            self.client.invoke("2/groups")
+        self.assertEqual(1, self.transport.request.call_count)
+
+
+class RetryPolicyTests(unittest.TestCase):
+    """Tests for the backoff curve of the RetryPolicy.
+    """
+
+    def test_backoff_is_exponential_and_capped(self):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1,
+                             max_backoff=5, jitter=False)
+        error = MeetupConnectionError("reset")
+        delays = [policy.get_delay('GET', n, error) for n in range(1, 6)]
+        self.assertEqual([1, 2, 4, 5, 5], delays)
+
+    def test_jitter_stays_under_curve(self):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1)
+        error = MeetupConnectionError("reset")
+        for attempt in range(1, 6):
+            delay = policy.get_delay('GET', attempt, error)
+            self.assertTrue(0 <= delay <= 2 ** (attempt - 1))
+
+
+class MeetupTransportTests(unittest.TestCase):
+    """Tests for the pooled session transport.
+    """
+
+    def test_request_applies_default_timeout(self):
+        session = MagicMock()
+        transport = MeetupTransport(timeout=7, session=session)
+        transport.request('GET', 'https://api.meetup.com/2/groups')
+        session.request.assert_called_once_with(
+            'GET',
+            'https://api.meetup.com/2/groups',
+            timeout=7
+        )
+
+    def test_pool_size_is_configurable(self):
+        transport = MeetupTransport(pool_connections=2, pool_maxsize=25)
+        adapter = transport.session.get_adapter('https://api.meetup.com')
+        self.assertEqual(25, adapter._pool_maxsize)
+        self.assertEqual(2, adapter._pool_connections)
+
+    def test_keep_alive_disabled_closes_connections(self):
+        transport = MeetupTransport(keep_alive=False)
+        self.assertEqual('close', transport.session.headers['Connection'])
+
 
 class MeetupAPIEndpointsTests(MeetupClientTests):
     """Test cases for individual API endpoints.
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the archiving and replaying of api.meetup.com pages
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from meetup.api import MeetupClient
+from meetup.archive import ArchiveWriter
+from meetup.archive import ReplayClient
+from meetup.archive import read_archive
+from meetup.archive import strip_secrets
+from meetup.exceptions import MeetupReplayError
+
+
+MEETUP_KEY = "abc123"
+NEXT_URL = "https://api.meetup.com/2/events?group_id=1&offset=1&key=abc123&page=2"
+
+
+# ########################################################################### #
+
+
+def make_response(body):
+    return Mock(status_code=200, headers={}, json=Mock(return_value=body))
+
+
+class ArchiveTests(unittest.TestCase):
+    """Pages archived by a MeetupClient are served again by a ReplayClient.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "1.jsonl.gz")
+        self.pages = [
+            {'results': [{'id': 1}], 'meta': {'next': ""}},
+            {'results': [{'id': "e1"}, {'id': "e2"}], 'meta': {'next': NEXT_URL}},
+            {'results': [{'id': "e3"}], 'meta': {'next': ""}},
+        ]
+        transport = Mock()
+        transport.request.side_effect = [make_response(p) for p in self.pages]
+        with ArchiveWriter(self.path, group_id=1) as archive:
+            client = MeetupClient(api_key=MEETUP_KEY, transport=transport,
+                                  archive=archive)
+            self.groups = client.invoke("/2/groups", {'group_id': 1})
+            self.events = list(client.iter_results("/2/events", {'group_id': 1},
+                                                   prefetch=False))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_archive_records_requests_and_pages(self):
+        records = list(read_archive(self.path))
+        self.assertEqual(1, records[0]['group_id'])
+        self.assertEqual({'method': "2/groups", 'params': {'group_id': 1},
+                          'page': self.pages[0]}, records[1])
+        self.assertEqual("2/events", records[2]['method'])
+        self.assertEqual(strip_secrets(NEXT_URL), records[3]['url'])
+        self.assertEqual(4, len(records))
+
+    def test_archive_never_holds_the_api_key(self):
+        with gzip.open(self.path, 'rb') as fp:
+            self.assertNotIn(MEETUP_KEY, fp.read().decode('utf-8'))
+
+    def test_replay_serves_the_same_results(self):
+        with ReplayClient(self.path) as client:
+            self.assertEqual(1, client.group_id)
+            self.assertEqual(self.groups['results'],
+                             client.invoke("/2/groups", {'group_id': 1})['results'])
+            # params may differ, e.g. the time of an incremental sync
+            events = list(client.iter_results("/2/events", {'time': "1,"}))
+        self.assertEqual(self.events, events)
+
+    def test_replay_out_of_order(self):
+        with ReplayClient(self.path) as client:
+            events = list(client.iter_results("/2/events", prefetch=False))
+            groups = client.invoke("2/groups")
+        self.assertEqual(self.events, events)
+        self.assertEqual(self.groups, groups)
+
+    def test_replay_missing_page(self):
+        with ReplayClient(self.path) as client:
+            client.invoke("/2/groups")
+            with self.assertRaises(MeetupReplayError):
+                client.invoke("/2/groups")
+
+    def test_replay_rejects_writes(self):
+        with ReplayClient(self.path) as client:
+            with self.assertRaises(MeetupReplayError):
+                client.invoke("/2/event", {'name': "x"}, method='POST')
+
+    def test_replay_rejects_other_files(self):
+        path = os.path.join(self.directory, "other.jsonl.gz")
+        with gzip.open(path, 'wb') as fp:
+            fp.write(b'{"results": []}\n')
+        with self.assertRaises(MeetupReplayError):
+            ReplayClient(path)
+
+
+class StripSecretsTests(unittest.TestCase):
+
+    def test_strip_secrets(self):
+        self.assertEqual("https://api.meetup.com/2/events?group_id=1&offset=1&page=2",
+                         strip_secrets(NEXT_URL))
+
+    def test_strip_is_idempotent(self):
+        url = strip_secrets("https://api.meetup.com/2/events?status=past%2Cupcoming&sig=x")
+        self.assertEqual(url, strip_secrets(url))
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
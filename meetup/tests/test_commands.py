@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the management commands
+
+    django-admin test meetup.tests.test_commands --settings=meetup.tests.settings
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+import json
+import threading
+from django.core.management import call_command, load_command_class
+from django.core.management.base import CommandError
+from django.test import TestCase
+from mock import Mock, patch
+from six import StringIO
+from meetup.caching import get_cache
+from meetup.management.options import get_group_ids
+from meetup.models import Event,Group
+from meetup.tests.test_models_sync import event_data,group_data
+import unittest
+
+# ########################################################################### #
+
+def meetup_client (failing=()):
+    """ Stub of the client get_client builds, two events per group """
+    client = Mock()
+    def invoke (meetup_method,params=None):
+        if params['group_id'] in failing:
+            raise RuntimeError("meetup is down")
+        return {'results':[group_data(params['group_id'])]}
+    def iter_pages (meetup_method,params,next_url=None):
+        group_id = params['group_id']
+        yield {'results':[event_data(10*group_id+i,group_id=group_id) for i in range(2)]}
+    client.invoke.side_effect = invoke
+    client.iter_pages.side_effect = iter_pages
+    return client
+
+
+class TestSyncGroupEventsCommand (TestCase):
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def call (self,*args,**options):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        failing = options.pop('failing',())
+        with patch('meetup.sync.get_client',side_effect=lambda *a,**kw: meetup_client(failing)):
+            call_command('sync_group_events',*args,stdout=self.stdout,stderr=self.stderr,**options)
+
+    def event_groups (self):
+        return sorted(set(Event.objects.values_list('group',flat=True)))
+
+    def test_several_groups (self):
+        self.call(1,2)
+        self.assertEqual([1,2],self.event_groups())
+        self.assertEqual(4,Event.objects.count())
+        self.assertIn("synced 2 of 2 groups",self.stdout.getvalue())
+
+    def test_default_group (self):
+        self.call()
+        self.assertEqual([1],self.event_groups())
+
+    def test_all_known (self):
+        Group.objects.from_meetup_data(group_data(3))
+        self.call(1,all_known=True)
+        self.assertEqual([1,3],self.event_groups())
+
+    def test_failing_group_does_not_stop_the_others (self):
+        with self.assertRaises(CommandError) as raised:
+            self.call(1,3,2,failing=(3,))
+        self.assertIn("3",str(raised.exception))
+        self.assertEqual([1,2],self.event_groups())
+        self.assertIn("group 3:",self.stderr.getvalue())
+        self.assertIn("synced 2 of 3 groups",self.stdout.getvalue())
+
+    def test_json_summary_on_stdout (self):
+        self.call(1,2,json_summary='-')
+        summary = json.loads(self.stdout.getvalue())
+        self.assertEqual([1,2],[group['group_id'] for group in summary['groups']])
+        self.assertIn("synced 2 of 2 groups",self.stderr.getvalue())
+
+    def test_workers (self):
+        # sqlite cannot write from several threads, stub the sync of a group
+        threads = {}
+        started = threading.Condition()
+        def sync (group_id,client,**kws):
+            with started:
+                threads[group_id] = threading.current_thread().name
+                started.notify_all()
+                # every group is in flight before any finishes
+                while len(threads) < 3:
+                    started.wait(5)
+        with patch('meetup.management.commands.sync_group_events.sync_group_events',sync):
+            self.call(1,2,3,workers=3)
+        self.assertEqual([1,2,3],sorted(threads))
+        self.assertEqual(3,len(set(threads.values())))
+        self.assertIn("synced 3 of 3 groups",self.stdout.getvalue())
+
+
+class TestGroupOptions (TestCase):
+
+    def group_ids (self,command,*args):
+        parser = load_command_class('meetup',command).create_parser('manage.py',command)
+        return get_group_ids(vars(parser.parse_args([str(a) for a in args])))
+
+    def test_every_command_picks_the_same_groups (self):
+        Group.objects.from_meetup_data(group_data(3))
+        for command in ('sync_group_events','sync_group_members','run_sync_scheduler'):
+            self.assertEqual([1],self.group_ids(command))
+            self.assertEqual([2,1],self.group_ids(command,2,1))
+            self.assertEqual([2,3],self.group_ids(command,2,'--all-known'))
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the api.meetup.com response caches
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from django.core.cache.backends.locmem import LocMemCache
+from mock import Mock, patch
+
+from meetup.api import MeetupClient
+from meetup.exceptions import MeetupResponseError
+from meetup.http_cache import DjangoCache
+from meetup.http_cache import FileCache
+from meetup.http_cache import MemoryCache
+
+
+# ########################################################################### #
+
+
+class MemoryCacheTests(unittest.TestCase):
+    """Tests for the least recently used memory cache.
+    """
+
+    def make_cache(self, **kwargs):
+        return MemoryCache(**kwargs)
+
+    def test_set_and_get(self):
+        cache = self.make_cache()
+        cache.set('a', {'body': [1], 'expires': 10})
+        self.assertEqual({'body': [1], 'expires': 10}, cache.get('a'))
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_evicts_least_recently_used(self):
+        cache = self.make_cache(maxsize=2)
+        cache.set('a', {'body': 'a'})
+        cache.set('b', {'body': 'b'})
+        cache.get('a')
+        cache.set('c', {'body': 'c'})
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_freshness_follows_ttl(self):
+        cache = self.make_cache(ttl=60)
+        response = Mock(headers={'ETag': '"v1"'})
+        entry = cache.make_entry({'id': 1}, response, now=100)
+        self.assertTrue(cache.is_fresh(entry, now=159))
+        self.assertFalse(cache.is_fresh(entry, now=160))
+        self.assertEqual(
+            {'If-None-Match': '"v1"'},
+            cache.conditional_headers(entry)
+        )
+
+
+class FileCacheTests(MemoryCacheTests):
+    """Runs the same checks against the file cache.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_cache(self, maxsize=1024, **kwargs):
+        directory = os.path.join(self.tmpdir, "http")
+        return FileCache(directory, max_entries=maxsize, **kwargs)
+
+    def test_evicts_least_recently_used(self):
+        cache = self.make_cache(maxsize=2)
+        cache.set('a', {'body': 'a'})
+        cache.set('b', {'body': 'b'})
+        # age the files so the touch on read decides the order
+        for key in ('a', 'b'):
+            os.utime(cache._path(key), (time.time() - 100,) * 2)
+        cache.get('a')
+        cache.set('c', {'body': 'c'})
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+
+class MeetupClientCacheTests(unittest.TestCase):
+    """Tests for GET requests served through a cache.
+    """
+
+    def setUp(self):
+        self.transport = Mock()
+        self.cache = MemoryCache(ttl=60)
+        self.client = MeetupClient(
+            api_key="abc123",
+            transport=self.transport,
+            cache=self.cache
+        )
+
+    def make_response(self, status_code, body=None, headers=None):
+        return Mock(
+            status_code=status_code,
+            headers=headers or {},
+            json=Mock(return_value=body)
+        )
+
+    def expire_all(self):
+        for entry in self.cache._entries.values():
+            entry['expires'] = 0
+
+    def test_fresh_entry_is_served_without_request(self):
+        self.transport.request.return_value = self.make_response(200, {'a': 1})
+        self.assertEqual({'a': 1}, self.client.invoke("2/groups"))
+        self.assertEqual({'a': 1}, self.client.invoke("2/groups"))
+        self.assertEqual(1, self.transport.request.call_count)
+
+    def test_stale_entry_is_revalidated(self):
+        self.transport.request.side_effect = [
+            self.make_response(200, {'a': 1}, {
+                'ETag': '"v1"',
+                'Last-Modified': 'Mon, 15 Sep 2014 00:12:21 GMT',
+            }),
+            self.make_response(304),
+        ]
+        self.client.invoke("2/groups")
+        self.expire_all()
+        self.assertEqual({'a': 1}, self.client.invoke("2/groups"))
+        headers = self.transport.request.call_args[1]['headers']
+        self.assertEqual('"v1"', headers['If-None-Match'])
+        self.assertEqual('Mon, 15 Sep 2014 00:12:21 GMT',
+                         headers['If-Modified-Since'])
+        # the 304 made the entry fresh again
+        self.client.invoke("2/groups")
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_changed_response_replaces_entry(self):
+        self.transport.request.side_effect = [
+            self.make_response(200, {'a': 1}, {'ETag': '"v1"'}),
+            self.make_response(200, {'a': 2}, {'ETag': '"v2"'}),
+        ]
+        self.client.invoke("2/groups")
+        self.expire_all()
+        self.assertEqual({'a': 2}, self.client.invoke("2/groups"))
+        self.assertEqual({'a': 2}, self.client.invoke("2/groups"))
+
+    def test_not_modified_without_entry(self):
+        response = self.make_response(304)
+        response.json.side_effect = ValueError("no body")
+        self.transport.request.return_value = response
+        with self.assertRaises(MeetupResponseError) as raised:
+            self.client.invoke("2/groups")
+        self.assertIn("not cached", str(raised.exception))
+        self.assertNotIn("abc123", str(raised.exception))
+        self.assertFalse(response.json.called)
+        self.assertEqual(0, len(self.cache))
+
+    def test_post_is_not_cached(self):
+        self.transport.request.return_value = self.make_response(200, {'a': 1})
+        self.client.invoke("2/event", {'name': 'x'}, method='POST')
+        self.client.invoke("2/event", {'name': 'x'}, method='POST')
+        self.assertEqual(2, self.transport.request.call_count)
+        self.assertEqual(0, len(self.cache))
+
+
+
+class DjangoCacheTests(unittest.TestCase):
+    """Entries kept in a Django cache backend outlive their freshness.
+    """
+
+    def setUp(self):
+        # a LocMemCache with its default timeout, without django settings
+        backend = LocMemCache('meetup-tests', {})
+        patcher = patch.object(DjangoCache, 'backend', backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transport = Mock()
+        self.client = MeetupClient(api_key="abc123", transport=self.transport,
+                                   cache=DjangoCache())
+
+    def make_response(self, status_code, body=None, headers=None):
+        return Mock(status_code=status_code, headers=headers or {},
+                    json=Mock(return_value=body))
+
+    def test_stale_entry_is_revalidated(self):
+        self.transport.request.side_effect = [
+            self.make_response(200, {'a': 1}, {'ETag': '"v1"'}),
+            self.make_response(304),
+        ]
+        now = time.time()
+        with patch('time.time', return_value=now):
+            self.client.invoke("2/groups")
+        # past the default ttl and the backend's default timeout
+        with patch('time.time', return_value=now + 301):
+            self.assertEqual({'a': 1}, self.client.invoke("2/groups"))
+        headers = self.transport.request.call_args[1]['headers']
+        self.assertEqual('"v1"', headers['If-None-Match'])
+
+    def test_timeout(self):
+        self.assertEqual(3000, DjangoCache().timeout)
+        self.assertEqual(600, DjangoCache(ttl=60).timeout)
+        self.assertEqual(5, DjangoCache(timeout=5).timeout)
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
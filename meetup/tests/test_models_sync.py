@@ -2,33 +2,704 @@
 # -*- coding: utf-8 -*-
 """
 PURPOSE: For testing meetup models
+
+    django-admin test meetup.tests.test_models_sync --settings=meetup.tests.settings
+
 AUTHOR: dylangregersen
 DATE: Mon Sep 15 00:52:58 2014
 """
 # ########################################################################### #
 
-# import modules 
+# import modules
 
 from __future__ import print_function, division, unicode_literals
-import os 
-from meetup.models import Event,Group,Venue,Member
+import datetime
+import os
+import shutil
+import tempfile
+import warnings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mock import Mock, patch
+from meetup.archive import ArchiveWriter
+from meetup.caching import get_cache
+from meetup.models import Event,Group,Member,SyncState,Venue
+from meetup.sync import (close_old_connections,diff_group_events,replay_archives,sync_group_events,
+                         sync_group_members,sync_groups)
+from meetup.sync_results import SyncDiff,SyncStats
+from meetup.sync_utils import to_meetup_timestamp
 import unittest
 
 # ########################################################################### #
 
+def group_data (group_id=1,**kws):
+    data = dict(id=group_id,name="g{}".format(group_id),urlname="g{}".format(group_id),
+                link="https://www.meetup.com/g{}/".format(group_id),visibility="public",
+                timezone="US/Mountain",lat="40.5",lon="-111.5",members="12",who="Pythonistas")
+    data.update(kws)
+    return data
+
+def venue_data (venue_id=1,**kws):
+    data = dict(id=venue_id,name="v{}".format(venue_id),city="Salt Lake City",
+                lat=40.7,lon=-111.8,repinned=False)
+    data.update(kws)
+    return data
+
+def profile_data (member_id=1,group_id=1,**kws):
+    data = dict(member_id=member_id,name="m{}".format(member_id),bio="",status="active",
+                created=1411338964000,updated=1411338964000,visited=1411338964123,
+                profile_url="https://www.meetup.com/members/{}/".format(member_id),
+                group=dict(id=group_id,urlname="g{}".format(group_id)),role="member")
+    data.update(kws)
+    return data
+
+def event_data (event_id=1,group_id=1,**kws):
+    data = dict(id=str(event_id),name="e{}".format(event_id),status="upcoming",
+                visibility="public",time=1411338964123,updated=1411338964000,
+                group=dict(id=group_id,name="g{}".format(group_id),join_mode="open"),
+                venue=venue_data())
+    data.update(kws)
+    return data
+
+
+class TestMeetupDataToKws (TestCase):
+
+    def test_field_map_is_built_once_per_model (self):
+        self.assertIs(Group.objects._field_map(),Group.objects._field_map())
+        self.assertEqual('n_members',Group.objects._field_map()['members'][0])
+        self.assertEqual('event_timestamp',Event.objects._field_map()['time'][0])
+
+    def test_group_converters (self):
+        kws = Group.objects._meetup_data_to_kws(group_data(),stats=SyncStats())
+        self.assertEqual(12,kws['n_members'])
+        self.assertEqual("US/Mountain",kws['timezone'])
+        self.assertEqual(40.5,kws['lat'])
+
+    def test_event_time_keeps_milliseconds (self):
+        Group.objects.from_meetup_data(group_data())
+        kws = Event.objects._meetup_data_to_kws(event_data(),stats=SyncStats())
+        self.assertEqual(123000,kws['event_timestamp'].microsecond)
+
+    def test_unknown_keys_are_tallied_in_stats (self):
+        stats = SyncStats()
+        Group.objects.from_meetup_data(group_data(),stats=stats)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            Event.objects.bulk_from_meetup_data([event_data(1),event_data(2)],stats=stats)
+        self.assertEqual([],caught)
+        self.assertEqual({'updated':2},stats.unknown_keys['event'])
+        self.assertEqual({'repinned':1},stats.unknown_keys['venue'])
+        self.assertIn("event: updated (2);",stats.unknown_keys_report())
+        # the keys the hooks read are not unknown
+        Member.objects.bulk_from_meetup_data([profile_data(1)],stats=stats)
+        self.assertEqual({'role':1},stats.unknown_keys['member'])
+
+    def test_unknown_keys_without_stats_warn_once (self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            Venue.objects.from_meetup_data(venue_data(1,extra_key_a=1))
+            Venue.objects.from_meetup_data(venue_data(2,extra_key_a=1))
+        messages = [str(w.message) for w in caught if "extra_key_a" in str(w.message)]
+        self.assertEqual(1,len(messages))
+
+
+def written_sql (queries):
+    """ The statements of a CaptureQueriesContext, without savepoints """
+    return [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+
+class TestBulkFromMeetupData (TestCase):
+
+    def test_insert_update_split (self):
+        Venue.objects.bulk_from_meetup_data([venue_data(i) for i in range(1,4)])
+        records = [venue_data(1),venue_data(2,name="moved"),venue_data(3,city="Provo"),
+                   venue_data(4),venue_data(5)]
+        stats = SyncStats()
+        with CaptureQueriesContext(connection) as queries:
+            Venue.objects.bulk_from_meetup_data(records,stats=stats)
+        sql = written_sql(queries)
+        # one in_bulk lookup, one insert and one update per set of changed columns
+        self.assertEqual(['SELECT','INSERT','UPDATE','UPDATE'],[q.split()[0] for q in sql])
+        self.assertEqual(2,stats.get('venue','inserted'))
+        self.assertEqual(2,stats.get('venue','updated'))
+        self.assertEqual(1,stats.get('venue','unchanged'))
+        self.assertEqual("moved",Venue.objects.get(pk=2).name)
+        self.assertEqual("Provo",Venue.objects.get(pk=3).city)
+        self.assertEqual(5,Venue.objects.count())
+
+    def test_queries_per_batch (self):
+        with CaptureQueriesContext(connection) as queries:
+            Venue.objects.bulk_from_meetup_data([venue_data(i) for i in range(5)],batch_size=2)
+        sql = written_sql(queries)
+        self.assertEqual(3,len([q for q in sql if q.startswith('SELECT')]))
+        self.assertEqual(3,len([q for q in sql if q.startswith('INSERT')]))
+        self.assertEqual(6,len(sql))
+
+    def test_resync_round_trip (self):
+        records = [venue_data(i) for i in range(5)]
+        Venue.objects.bulk_from_meetup_data(records)
+        stats = SyncStats()
+        with CaptureQueriesContext(connection) as queries:
+            venues = Venue.objects.bulk_from_meetup_data(records,stats=stats)
+        self.assertEqual(['SELECT'],[q.split()[0] for q in written_sql(queries)])
+        self.assertEqual(5,stats.get('venue','unchanged'))
+        self.assertEqual(0,stats.changed)
+        self.assertEqual(list(range(5)),[v.pk for v in venues])
+        venue = Venue.objects.get(pk=3)
+        self.assertEqual(("v3",40.7,-111.8),(venue.name,venue.lat,venue.lon))
+
+
+
+class TestChangeDetection (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([event_data(i) for i in range(1,4)])
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def writes (self,queries):
+        # the sync's own bookkeeping is always written
+        return [q for q in written_sql(queries) if not q.startswith('SELECT')
+                and 'meetup_syncstate' not in q]
+
+    def test_field_changes (self):
+        event = Event.objects.get(pk=1)
+        kws = Event.objects._meetup_data_to_kws(event_data(1,name="renamed"),stats=SyncStats())
+        self.assertEqual({'name':("e1","renamed")},dict(Event.objects._field_changes(event,kws)))
+        kws = Event.objects._meetup_data_to_kws(event_data(1),stats=SyncStats())
+        self.assertEqual([],Event.objects._changed_fields(event,kws))
+
+    def test_update_fields_are_the_changed_columns (self):
+        stats = SyncStats()
+        with CaptureQueriesContext(connection) as queries:
+            Group.objects.from_meetup_data(group_data(who="Rustaceans"),stats=stats)
+        updates = [q for q in written_sql(queries) if q.startswith('UPDATE')]
+        self.assertEqual(1,len(updates))
+        self.assertIn('"who"',updates[0])
+        self.assertNotIn('"name"',updates[0])
+        self.assertEqual(1,stats.get('group','updated'))
+
+        with CaptureQueriesContext(connection) as queries:
+            Event.objects.bulk_from_meetup_data([event_data(1,name="renamed"),event_data(2)])
+        updates = [q for q in written_sql(queries) if q.startswith('UPDATE')]
+        self.assertEqual(1,len(updates))
+        self.assertIn('"name"',updates[0])
+        self.assertNotIn('"status"',updates[0])
+
+    def test_same_payload_twice (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.side_effect = lambda *args,**kws: iter(
+            [{'results':[event_data(i) for i in range(1,6)]}])
+        stats = sync_group_events(1,client,full=True)
+        self.assertEqual(2,stats.get('event','inserted'))
+        self.assertEqual(3,stats.get('event','unchanged'))
+        self.assertEqual(2,stats.get('event_venue','inserted'))
+        self.assertEqual(0,stats.get('event','updated'))
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = sync_group_events(1,client,full=True)
+        self.assertEqual([],self.writes(queries))
+        self.assertEqual(0,stats.changed)
+        self.assertEqual(5,stats.get('event','unchanged'))
+        self.assertEqual(5,stats.get('event_venue','unchanged'))
+        self.assertEqual(1,stats.get('group','unchanged'))
+        self.assertEqual(1,stats.get('venue','unchanged'))
+
+
+
+class TestEventVenues (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+
+    def venue_ids (self,event_id):
+        return sorted(Event.objects.get(pk=event_id).venue.values_list('pk',flat=True))
+
+    def test_bulk_writes_each_venue_once (self):
+        records = [event_data(i,venue=venue_data(1+i%2)) for i in range(10)]
+        stats = SyncStats()
+        with CaptureQueriesContext(connection) as queries:
+            Event.objects.bulk_from_meetup_data(records,stats=stats)
+        # a lookup of the group, a lookup and insert of the venues, of the
+        # events and of their links
+        sql = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(7,len(sql))
+        self.assertEqual(2,Venue.objects.count())
+        self.assertEqual(2,stats.get('venue','inserted'))
+        self.assertEqual(10,stats.get('event_venue','inserted'))
+        self.assertEqual([1],self.venue_ids(0))
+        self.assertEqual([2],self.venue_ids(1))
+
+    def test_bulk_unchanged_links_are_not_written (self):
+        records = [event_data(i) for i in range(5)]
+        Event.objects.bulk_from_meetup_data(records)
+        stats = SyncStats()
+        Event.objects.bulk_from_meetup_data(records,stats=stats)
+        self.assertEqual(5,stats.get('event_venue','unchanged'))
+        self.assertEqual(0,stats.changed)
+
+    def test_moved_event_is_relinked (self):
+        Event.objects.bulk_from_meetup_data([event_data(1,venue=venue_data(1))])
+        stats = SyncStats()
+        Event.objects.bulk_from_meetup_data([event_data(1,venue=venue_data(2))],stats=stats)
+        self.assertEqual([2],self.venue_ids(1))
+        self.assertEqual(1,stats.get('event_venue','updated'))
+        # the per record path relinks the same way
+        Event.objects.from_meetup_data(event_data(1,venue=venue_data(3)))
+        self.assertEqual([3],self.venue_ids(1))
+
+    def test_venueless_events (self):
+        record = event_data(1)
+        del record['venue']
+        Event.objects.bulk_from_meetup_data([record,event_data(2)])
+        Event.objects.from_meetup_data(event_data(3,venue=None))
+        self.assertEqual([],self.venue_ids(1))
+        self.assertEqual([1],self.venue_ids(2))
+        self.assertEqual([],self.venue_ids(3))
+        # a record without a venue leaves the links alone
+        record = event_data(2)
+        del record['venue']
+        Event.objects.bulk_from_meetup_data([record])
+        self.assertEqual([1],self.venue_ids(2))
+
+
+
+class TestMembers (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+
+    def test_profile_times (self):
+        member = Member.objects.from_meetup_data(profile_data())
+        self.assertEqual(123000,member.visited.microsecond)
+        self.assertEqual([1],list(member.groups.values_list('pk',flat=True)))
+
+    def test_bulk_upsert_and_memberships (self):
+        stats = SyncStats()
+        Member.objects.bulk_from_meetup_data([profile_data(i) for i in range(5)],stats=stats)
+        self.assertEqual(5,stats.get('member','inserted'))
+        self.assertEqual(5,stats.get('membership','inserted'))
+        stats = SyncStats()
+        records = [profile_data(i) for i in range(5)]
+        records[0]['name'] = "renamed"
+        Member.objects.bulk_from_meetup_data(records,stats=stats)
+        self.assertEqual(1,stats.get('member','updated'))
+        self.assertEqual(4,stats.get('member','unchanged'))
+        self.assertEqual(5,stats.get('membership','unchanged'))
+        self.assertEqual(5,Group.objects.get(pk=1).members.count())
+
+    def test_membership_of_other_groups_is_kept (self):
+        Group.objects.from_meetup_data(group_data(2))
+        Member.objects.bulk_from_meetup_data([profile_data(1,group_id=1)])
+        Member.objects.bulk_from_meetup_data([profile_data(1,group_id=2)])
+        member = Member.objects.get(pk=1)
+        self.assertEqual([1,2],sorted(member.groups.values_list('pk',flat=True)))
+
+    def test_sync_group_members (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[profile_data(i) for i in range(7)]}])
+        stats = sync_group_members(1,client,batch_size=3)
+        client.iter_pages.assert_called_once_with("/2/profiles",{'group_id':1},next_url=None)
+        self.assertEqual(7,stats.get('member','inserted'))
+        self.assertEqual(7,Member.objects.filter(groups=1).count())
+        state = SyncState.objects.get(group=1,endpoint='members')
+        self.assertEqual(1411338964000,state.watermark)
+        self.assertIsNotNone(state.last_sync)
+
+
+
+class TestCheckpoints (TestCase):
+
+    NEXT = "https://api.meetup.com/2/events?offset=1&group_id=1&key=secret"
+
+    def tearDown (self):
+        # the sync caches the group's next event
+        get_cache().clear()
+
+    def meetup_client (self,*pages):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        def iter_pages (meetup_method,params,next_url=None):
+            for page in pages:
+                if isinstance(page,Exception):
+                    raise page
+                yield page
+        client.iter_pages.side_effect = iter_pages
+        return client
+
+    def test_interrupted_run_is_resumed (self):
+        first = {'results':[event_data(i) for i in range(4)],'meta':{'next':self.NEXT}}
+        client = self.meetup_client(first,RuntimeError("rate limit ban"))
+        with self.assertRaises(RuntimeError):
+            sync_group_events(1,client,batch_size=3,full=True)
+        state = SyncState.objects.get(group=1,endpoint='events')
+        # both batches of the first page are committed with their checkpoint
+        self.assertEqual(2,state.batches)
+        self.assertEqual(4,Event.objects.count())
+        self.assertNotIn("secret",state.cursor)
+        self.assertIsNone(state.last_sync)
+        run_id = state.run_id
+
+        client = self.meetup_client({'results':[event_data(i) for i in range(4,6)]})
+        sync_group_events(1,client,batch_size=3)
+        self.assertEqual(state.cursor,client.iter_pages.call_args[1]['next_url'])
+        state = SyncState.objects.get(group=1,endpoint='events')
+        self.assertEqual(run_id,state.run_id)
+        self.assertEqual(3,state.batches)
+        self.assertIsNone(state.cursor)
+        self.assertEqual(state.run_started,state.last_full_sync)
+        self.assertEqual(6,Event.objects.count())
+
+    def test_restart_ignores_the_checkpoint (self):
+        first = {'results':[event_data(1)],'meta':{'next':self.NEXT}}
+        with self.assertRaises(RuntimeError):
+            sync_group_events(1,self.meetup_client(first,RuntimeError()),full=True)
+        run_id = SyncState.objects.get(group=1,endpoint='events').run_id
+        client = self.meetup_client({'results':[event_data(1)]})
+        sync_group_events(1,client,full=True,resume=False)
+        self.assertIsNone(client.iter_pages.call_args[1]['next_url'])
+        self.assertNotEqual(run_id,SyncState.objects.get(group=1,endpoint='events').run_id)
+
+    def test_stale_checkpoint_is_not_resumed (self):
+        state = SyncState(group_id=1,endpoint='events',cursor=self.NEXT,run_full=True,
+                          run_started=timezone.now()-datetime.timedelta(days=3))
+        now = timezone.now()
+        self.assertFalse(state.can_resume(None,datetime.timedelta(hours=24),now))
+        self.assertTrue(state.can_resume(None,datetime.timedelta(days=4),now))
+        self.assertFalse(state.can_resume(False,datetime.timedelta(days=4),now))
+
+
+
+class TestIncrementalSync (TestCase):
+
+    WATERMARK = 1411338964000
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([event_data(i,status="past") for i in (1,2)])
+        self.last_sync = timezone.now()-datetime.timedelta(hours=1)
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def sync (self,*records,**kws):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':list(records)}])
+        sync_group_events(1,client,**kws)
+        self.params = client.iter_pages.call_args[0][1]
+        return SyncState.objects.get(group=1,endpoint='events')
+
+    def previous_sync (self,full_days_ago=1):
+        SyncState.objects.create(group_id=1,endpoint='events',watermark=self.WATERMARK,
+                                 last_sync=self.last_sync,
+                                 last_full_sync=timezone.now()-datetime.timedelta(days=full_days_ago))
+
+    def test_first_sync_is_full (self):
+        state = self.sync(event_data(1,status="past",updated=self.WATERMARK+5))
+        self.assertNotIn('time',self.params)
+        self.assertEqual(",".join(Event.STATUS_OPTIONS),self.params['status'])
+        self.assertTrue(state.run_full)
+        self.assertEqual(state.last_sync,state.last_full_sync)
+        self.assertEqual(self.WATERMARK+5,state.watermark)
+
+    def test_incremental_run_of_a_new_group_is_full (self):
+        # nothing to start an incremental window from
+        state = self.sync(event_data(1,status="past",name="renamed"),full=False)
+        self.assertNotIn('time',self.params)
+        self.assertTrue(state.run_full)
+        self.assertEqual(state.last_sync,state.last_full_sync)
+        self.assertEqual("renamed",Event.objects.get(pk=1).name)
+
+    def test_incremental_time_window (self):
+        self.previous_sync()
+        with patch('meetup.sync.MEETUP_SYNC_LOOKBACK',2):
+            state = self.sync(event_data(3))
+        since = self.last_sync-datetime.timedelta(days=2)
+        self.assertEqual("{},".format(to_meetup_timestamp(since)[0]),self.params['time'])
+        self.assertFalse(state.run_full)
+        self.assertLess(self.last_sync,state.last_sync)
+        self.assertEqual(self.WATERMARK,state.watermark)
+
+    def test_watermark_skips_past_events_not_updated (self):
+        self.previous_sync()
+        state = self.sync(event_data(1,status="past",name="stale"),
+                          event_data(2,status="past",name="edited",updated=self.WATERMARK+1),
+                          event_data(3,name="rsvps"))
+        names = dict(Event.objects.values_list('pk','name'))
+        self.assertEqual({1:"e1",2:"edited",3:"rsvps"},names)
+        self.assertEqual(self.WATERMARK+1,state.watermark)
+
+    def test_full_sync_after_interval (self):
+        self.previous_sync(full_days_ago=8)
+        state = self.sync(event_data(1,status="past",name="stale"))
+        self.assertNotIn('time',self.params)
+        self.assertTrue(state.run_full)
+        self.assertEqual(state.last_sync,state.last_full_sync)
+        self.assertEqual("stale",Event.objects.get(pk=1).name)
+
+    def test_full_sync_interval_setting (self):
+        self.previous_sync(full_days_ago=8)
+        with patch('meetup.sync.MEETUP_FULL_SYNC_INTERVAL',10):
+            state = self.sync(event_data(1,status="past",name="stale"))
+        self.assertIn('time',self.params)
+        self.assertFalse(state.run_full)
+        self.assertEqual("e1",Event.objects.get(pk=1).name)
+
+    def test_dry_run_asks_for_the_same_window (self):
+        self.previous_sync()
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[event_data(1,status="past",name="stale")]}])
+        diff = diff_group_events(1,client)
+        self.sync(event_data(1,status="past",name="stale"))
+        self.assertEqual(self.params,client.iter_pages.call_args[0][1])
+        # the watermark filters the dry run alike
+        self.assertFalse(diff.updated)
+
+
+
+class TestDryRun (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([event_data(1),event_data(2)])
+
+    def test_from_meetup_data_returns_one_per_record (self):
+        kws = Venue.objects.from_meetup_data([venue_data(1),venue_data(2)],sync=False)
+        self.assertEqual([1,2],[k['id'] for k in kws])
+        self.assertEqual(1,Venue.objects.from_meetup_data(venue_data(1)).pk)
+
+    def test_diff_meetup_data (self):
+        diff = SyncDiff()
+        records = [event_data(1,name="renamed"),event_data(2),
+                   event_data(3,venue=venue_data(9))]
+        with CaptureQueriesContext(connection) as queries:
+            Event.objects.diff_meetup_data(records,diff=diff)
+        self.assertFalse([q for q in queries.captured_queries
+                          if not q['sql'].startswith('SELECT')])
+        self.assertEqual({'name':("e1","renamed")},dict(diff.updated['event'][1]))
+        self.assertEqual([3],list(diff.created['event']))
+        self.assertEqual("e3",diff.created['event'][3]['name'])
+        self.assertEqual([9],list(diff.created['venue']))
+        self.assertEqual(1,diff.unchanged['event'])
+        self.assertEqual(2,Event.objects.count())
+        self.assertFalse(Venue.objects.filter(pk=9).exists())
+
+    def test_incremental_dry_run_of_an_unsynced_group (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[event_data(2,status="past")]}])
+        diff = diff_group_events(1,client,full=False)
+        self.assertNotIn('time',client.iter_pages.call_args[0][1])
+        self.assertEqual(("upcoming","past"),diff.updated['event'][2]['status'])
+        self.assertFalse(SyncState.objects.exists())
+
+    def test_diff_group_events_writes_nothing (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data(who="Rustaceans")]}
+        client.iter_pages.return_value = iter([{'results':[event_data(2,status="past"),
+                                                           event_data(3)]}])
+        diff = diff_group_events(1,client,full=True)
+        self.assertEqual(("Pythonistas","Rustaceans"),diff.updated['group'][1]['who'])
+        self.assertEqual(("upcoming","past"),diff.updated['event'][2]['status'])
+        self.assertEqual([3],list(diff.created['event']))
+        self.assertEqual("Pythonistas",Group.objects.get(pk=1).who)
+        self.assertEqual(2,Event.objects.count())
+        self.assertFalse(SyncState.objects.exists())
+
+
+
+class TestReconcile (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([self.event(i) for i in range(1,6)])
+        self.day3 = Event.objects.get(pk=3).event_timestamp
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def event (self,event_id):
+        # event i is scheduled i days after the first
+        return event_data(event_id,time=1411338964000+event_id*86400000)
+
+    def statuses (self):
+        return dict(Event.objects.values_list('pk','status'))
+
+    def test_cancel_orphans_in_window (self):
+        stats = SyncStats()
+        orphans = Event.objects.reconcile(1,{3},since=self.day3,stats=stats)
+        self.assertEqual([4,5],sorted(orphans))
+        self.assertEqual({1:'upcoming',2:'upcoming',3:'upcoming',4:'cancelled',5:'cancelled'},
+                         self.statuses())
+        self.assertEqual(2,stats.get('event','updated'))
+        # already cancelled orphans are not counted again
+        self.assertEqual([],Event.objects.reconcile(1,{3},since=self.day3))
+
+    def test_delete_orphans (self):
+        stats = SyncStats()
+        Event.objects.reconcile(1,{1,2},action='delete',stats=stats,batch_size=2)
+        self.assertEqual([1,2],sorted(self.statuses()))
+        self.assertEqual(3,stats.get('event','deleted'))
+        self.assertEqual(3,stats.changed)
+
+    def test_diff_records_orphans (self):
+        diff = SyncDiff()
+        Event.objects.reconcile(1,{1,2,3,4},diff=diff)
+        Event.objects.reconcile(1,{1,2,3},since=self.day3,action='delete',diff=diff)
+        self.assertEqual({'status':('upcoming','cancelled')},dict(diff.updated['event'][5]))
+        self.assertEqual([4,5],diff.deleted['event'])
+        self.assertEqual(5,Event.objects.filter(status='upcoming').count())
+
+    def test_sync_cancels_events_meetup_dropped (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[self.event(i) for i in (1,2,4)]}])
+        stats = sync_group_events(1,client,full=True,reconcile=True)
+        self.assertEqual({1:'upcoming',2:'upcoming',3:'cancelled',4:'upcoming',5:'cancelled'},
+                         self.statuses())
+        self.assertEqual(2,stats.get('event','updated'))
+
+    def test_sync_keeps_orphans_when_disabled (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[event_data(1)]}])
+        with patch('meetup.sync.MEETUP_SYNC_ORPHANS',None):
+            sync_group_events(1,client,full=True,reconcile=True)
+        self.assertEqual(['upcoming'],list(set(self.statuses().values())))
+
+    def test_sync_reconciles_only_when_asked (self):
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[self.event(1)]}])
+        sync_group_events(1,client,full=True)
+        self.assertEqual(['upcoming'],list(set(self.statuses().values())))
+
+    def test_incremental_sync_keeps_events_outside_the_window (self):
+        # the previous sync looked back to day 3
+        now = timezone.now()
+        SyncState.objects.create(group_id=1,endpoint='events',last_full_sync=now,
+                                 last_sync=self.day3+datetime.timedelta(days=30))
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[self.event(3)]}])
+        sync_group_events(1,client,reconcile=True)
+        self.assertEqual({1:'upcoming',2:'upcoming',3:'upcoming',4:'cancelled',5:'cancelled'},
+                         self.statuses())
+        self.assertFalse(SyncState.objects.get(group=1,endpoint='events').run_full)
+
+    def test_sync_groups_reconciles (self):
+        sync = Mock()
+        with patch('meetup.sync.get_client'):
+            sync_groups([1],sync_function=sync)
+        self.assertTrue(sync.call_args[1]['reconcile'])
+
+
+
+class TestConnections (TestCase):
+
+    def test_close_old_connections_outside_transactions (self):
+        idle = Mock(in_atomic_block=False)
+        busy = Mock(in_atomic_block=True)
+        with patch('meetup.sync.connections') as connections:
+            connections.all.return_value = [idle,busy]
+            close_old_connections()
+        idle.close_if_unusable_or_obsolete.assert_called_once_with()
+        self.assertFalse(busy.close_if_unusable_or_obsolete.called)
+
+    def test_sync_groups_closes_around_each_group (self):
+        calls = []
+        sync = Mock(side_effect=lambda group_id,client,**kws: calls.append(group_id))
+        with patch('meetup.sync.get_client'), \
+             patch('meetup.sync.close_old_connections',side_effect=lambda: calls.append('close')):
+            sync_groups([1,2],sync_function=sync)
+        self.assertEqual(['close',1,'close','close',2,'close'],calls)
+
+
+
+class TestClients (TestCase):
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def meetup_client (self,**kws):
+        client = Mock(**kws)
+        client.invoke.return_value = {'results':[group_data()]}
+        # an empty page does for events and members
+        client.iter_pages.return_value = iter([{'results':[]}])
+        return client
+
+    def test_built_client_is_closed (self):
+        for sync in (sync_group_events,sync_group_members,diff_group_events):
+            client = self.meetup_client()
+            with patch('meetup.sync.get_client',return_value=client):
+                sync(1)
+            client.close.assert_called_once_with()
+
+    def test_built_client_is_closed_on_failure (self):
+        client = self.meetup_client()
+        client.invoke.side_effect = RuntimeError("meetup is down")
+        for sync in (sync_group_events,sync_group_members,diff_group_events):
+            with patch('meetup.sync.get_client',return_value=client):
+                self.assertRaises(RuntimeError,sync,1)
+        self.assertEqual(3,client.close.call_count)
+
+    def test_given_client_is_left_open (self):
+        for sync in (sync_group_events,sync_group_members,diff_group_events):
+            client = self.meetup_client()
+            sync(1,client)
+            self.assertFalse(client.close.called)
+
+
+
+class TestReplay (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([event_data(i) for i in range(1,4)])
+        self.last_sync = timezone.now()-datetime.timedelta(hours=1)
+        SyncState.objects.create(group_id=1,endpoint='events',watermark=1411338964000,
+                                 last_sync=self.last_sync,last_full_sync=self.last_sync)
+        self.directory = tempfile.mkdtemp()
+        # an older archive which only has events 1 and 4
+        self.path = os.path.join(self.directory,"1.jsonl.gz")
+        with ArchiveWriter(self.path,group_id=1) as archive:
+            archive.write_page({'results':[group_data()]},"/2/groups",{'group_id':1})
+            archive.write_page({'results':[event_data(1,name="renamed"),event_data(4)],
+                                'meta':{'next':""}},"/2/events",{'group_id':1})
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+        get_cache().clear()
+
+    def test_replay_writes_the_archive_only (self):
+        results = replay_archives([self.path])
+        self.assertIsNone(results[self.path].error)
+        self.assertEqual("renamed",Event.objects.get(pk=1).name)
+        self.assertTrue(Event.objects.filter(pk=4).exists())
+        # the events missing from the archive are not reconciled
+        self.assertEqual(['upcoming'],list(set(Event.objects.values_list('status',flat=True))))
+        state = SyncState.objects.get(group=1,endpoint='events')
+        self.assertEqual(1411338964000,state.watermark)
+        self.assertEqual(self.last_sync,state.last_sync)
+        self.assertEqual(self.last_sync,state.last_full_sync)
+        self.assertEqual("",state.run_id)
+
+    def test_dry_run_replay (self):
+        diff = replay_archives([self.path],dry_run=True)[self.path].diff
+        self.assertEqual([1],list(diff.updated['event']))
+        self.assertEqual([4],list(diff.created['event']))
+        self.assertFalse(diff.deleted)
+        self.assertEqual(3,Event.objects.count())
 
-# TODO: implement tests
 
-def test_Event_meetup_data_to_kws ():
-    # one for Event,Group,Venue,Member
-    pass
-    
-def test_Event_object_to_meetup_data ():
-    # one for Event,Group,Venue,Member
-    pass
-        
-pass 
 # ########################################################################### #
 if __name__ == "__main__":
-    pass
-    
+    unittest.main()
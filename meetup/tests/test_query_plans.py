@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing that the hot Event queries use the shipped indexes
+
+Each test asks the database for the plan of a query the package runs on
+every page or sync and asserts one of the indexes of migrations 0001/0002
+serves it. Run with
+
+    django-admin test meetup.tests.test_query_plans --settings=meetup.tests.settings
+
+on SQLite, or against PostgreSQL with MEETUP_TEST_DATABASE_URL set (see
+meetup/tests/settings.py). On PostgreSQL sequential scans are disabled for
+the tests since a test sized table is cheaper to scan than to index.
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import datetime
+import unittest
+
+import django
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from meetup.models import Event, Group, STATUS_OPTIONS
+
+
+GROUP_STATUS_TS = 'meetup_event_group_status_ts'
+STATUS_TS = 'meetup_event_status_ts'
+UPCOMING_TS = 'meetup_event_upcoming_ts'
+
+
+# ########################################################################### #
+
+
+@unittest.skipUnless(hasattr(QuerySet, 'explain'), "QuerySet.explain needs Django 2.1")
+@unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'),
+                     "query plans are only checked on SQLite and PostgreSQL")
+class EventQueryPlanTests(TestCase):
+    """The Event read paths are served by an index, without a sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - datetime.timedelta(days=300)
+        events = []
+        for gid in range(1, 6):
+            group = Group.objects.create(
+                id=gid, name="g{}".format(gid), urlname="g{}".format(gid),
+                link="https://www.meetup.com/g{}/".format(gid),
+                visibility="public", lat=0, lon=0)
+            for i in range(100):
+                events.append(Event(
+                    group=group, name="e{}".format(i),
+                    status=STATUS_OPTIONS[i % len(STATUS_OPTIONS)],
+                    visibility="public",
+                    event_timestamp=start + datetime.timedelta(days=i)))
+        Event.objects.bulk_create(events)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, *names):
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in names),
+                        "none of {} in plan:\n{}".format(names, plan))
+        # the index order is used rather than sorting the rows
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_next_upcoming(self):
+        queryset = Event.objects.filter(status='upcoming', group=1)
+        queryset = queryset.order_by('event_timestamp')[:1]
+        names = (GROUP_STATUS_TS, UPCOMING_TS) if django.VERSION >= (2, 2) else (GROUP_STATUS_TS,)
+        self.assertUsesIndex(queryset, *names)
+
+    def test_group_past_events_page(self):
+        queryset = Event.objects.filter(status='past', group=1)
+        self.assertUsesIndex(queryset.order_by('-event_timestamp')[:20], GROUP_STATUS_TS)
+
+    def test_group_upcoming_events(self):
+        queryset = Event.objects.filter(status='upcoming', group=1)
+        self.assertUsesIndex(queryset.order_by('event_timestamp')[:20], GROUP_STATUS_TS, UPCOMING_TS)
+
+    def test_past_of_every_group(self):
+        self.assertUsesIndex(Event.objects.past().order_by('-event_timestamp'), STATUS_TS)
+
+    def test_upcoming_of_every_group(self):
+        self.assertUsesIndex(Event.objects.upcoming().order_by('event_timestamp'), STATUS_TS)
+
+    def test_admin_status_filter(self):
+        self.assertUsesIndex(Event.objects.filter(status='cancelled'), STATUS_TS, GROUP_STATUS_TS)
+
+    def test_admin_status_and_group_filter(self):
+        self.assertUsesIndex(Event.objects.filter(status='cancelled', group=2), GROUP_STATUS_TS)
+
+    def test_reconcile_window(self):
+        since = timezone.now() - datetime.timedelta(days=30)
+        queryset = Event.objects.filter(group=3, status__in=STATUS_OPTIONS,
+                                        event_timestamp__gte=since)
+        self.assertUsesIndex(queryset.values_list('pk', 'status'), GROUP_STATUS_TS)
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
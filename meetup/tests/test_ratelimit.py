@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the shared rate limiters
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from meetup.ratelimit import InProcessRateLimiter
+from meetup.ratelimit import SQLiteRateLimiter
+
+
+# ########################################################################### #
+
+
+class InProcessRateLimiterTests(unittest.TestCase):
+    """Tests for the token bucket arithmetic.
+    """
+
+    def make_limiter(self):
+        return InProcessRateLimiter(burst=5)
+
+    def test_no_budget_known_does_not_wait(self):
+        limiter = self.make_limiter()
+        self.assertEqual(0, limiter.reserve(now=100))
+
+    def test_exhausted_budget_waits_for_reset(self):
+        limiter = self.make_limiter()
+        limiter.update(0, 4, now=100)
+        self.assertEqual(4, limiter.reserve(now=100.5))
+        self.assertEqual(0, limiter.reserve(now=104))
+
+    def test_bursts_while_budget_is_large(self):
+        limiter = self.make_limiter()
+        limiter.update(30, 10, now=100)
+        waits = [limiter.reserve(now=100) for _ in range(25)]
+        self.assertEqual([0] * 25, waits)
+
+    def test_paces_remaining_budget_over_window(self):
+        limiter = self.make_limiter()
+        limiter.update(4, 8, now=100)
+        waits = [limiter.reserve(now=100) for _ in range(4)]
+        self.assertEqual([0, 2, 4, 6], waits)
+        # the budget is spent, the last reservation waits for the reset
+        self.assertEqual(8, limiter.reserve(now=100))
+
+    def test_update_replaces_estimate(self):
+        limiter = self.make_limiter()
+        limiter.update(1, 8, now=100)
+        limiter.reserve(now=100)
+        limiter.update(50, 8, now=101)
+        self.assertEqual(0, limiter.reserve(now=101))
+
+
+class SQLiteRateLimiterTests(InProcessRateLimiterTests):
+    """Runs the same checks against the SQLite backed bucket.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "ratelimit.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_limiter(self):
+        return SQLiteRateLimiter(self.path, burst=5)
+
+    def test_budget_is_shared_between_limiters(self):
+        worker_a = self.make_limiter()
+        worker_b = self.make_limiter()
+        worker_a.update(2, 8, now=100)
+        self.assertEqual(0, worker_a.reserve(now=100))
+        self.assertEqual(4, worker_b.reserve(now=100))
+        self.assertEqual(8, worker_a.reserve(now=100))
+
+    def test_keys_are_separate_buckets(self):
+        limiter = SQLiteRateLimiter(self.path, key='one', burst=5)
+        other = SQLiteRateLimiter(self.path, key='two', burst=5)
+        limiter.update(0, 8, now=100)
+        self.assertEqual(0, other.reserve(now=100))
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the sync scheduler
+
+    django-admin test meetup.tests.test_scheduler --settings=meetup.tests.settings
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from collections import OrderedDict
+from django.test import TestCase
+from mock import patch
+from meetup.instrumentation import SyncMetrics
+from meetup.models import Event,Group,SyncState
+from meetup.scheduler import Cadence,SyncScheduler,DAY,HOUR
+from meetup.sync_utils import fro_meetup_timestamp
+import unittest
+
+# ########################################################################### #
+
+NOW = 1411338964.0
+
+class Clock (object):
+
+    def __init__ (self,now=NOW):
+        self.now = now
+
+    def __call__ (self):
+        return self.now
+
+def metrics_for (group_ids,changed=(),failed=()):
+    results = OrderedDict()
+    for group_id in group_ids:
+        metrics = SyncMetrics(group_id)
+        if group_id in changed:
+            metrics.stats.add('event','updated')
+        if group_id in failed:
+            metrics.error = RuntimeError("boom")
+        results[group_id] = metrics
+    return results
+
+
+class TestCadence (TestCase):
+
+    def setUp(self):
+        self.cadence = Cadence(min_interval=300,max_interval=DAY)
+
+    def test_proximity (self):
+        self.assertEqual(300,self.cadence.proximity_interval(2*HOUR))
+        self.assertEqual(HOUR,self.cadence.proximity_interval(3*DAY))
+        self.assertEqual(DAY,self.cadence.proximity_interval(30*DAY))
+        self.assertEqual(DAY,self.cadence.proximity_interval(None))
+
+    def test_activity (self):
+        self.assertEqual(HOUR,self.cadence.activity_interval(2*HOUR,True))
+        self.assertEqual(4*HOUR,self.cadence.activity_interval(2*HOUR,False))
+        self.assertEqual(300,self.cadence.activity_interval(400,True))
+        self.assertEqual(DAY,self.cadence.activity_interval(DAY,False))
+
+    def test_shorter_wait_wins (self):
+        self.assertEqual(300,self.cadence.next_interval(DAY,False,HOUR))
+        self.assertEqual(2*HOUR,self.cadence.next_interval(4*HOUR,True,None))
+
+
+class TestSyncScheduler (TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = SyncScheduler(clock=self.clock,workers=2,
+                                       cadence=Cadence(min_interval=300,max_interval=DAY))
+
+    def test_duplicates_are_coalesced (self):
+        self.assertTrue(self.scheduler.schedule(1,NOW+100))
+        self.assertFalse(self.scheduler.schedule(1,NOW+200))
+        self.assertTrue(self.scheduler.schedule(1,NOW+50))
+        self.assertEqual(1,len(self.scheduler))
+        self.assertEqual(NOW+50,self.scheduler.next_due())
+        self.assertEqual([1],self.scheduler.pop_due(NOW+1000))
+        self.assertEqual([],self.scheduler.pop_due(NOW+1000))
+
+    def test_pop_due_in_due_order (self):
+        self.scheduler.schedule(1,NOW+30)
+        self.scheduler.schedule(2,NOW+10)
+        self.scheduler.schedule(3,NOW+20)
+        self.scheduler.schedule(4,NOW+500)
+        self.assertEqual([2,3],self.scheduler.pop_due(NOW+100,limit=2))
+        self.assertEqual([1],self.scheduler.pop_due(NOW+100))
+
+    def test_run_pending_reschedules_by_activity (self):
+        self.scheduler.schedule(1)
+        self.scheduler.schedule(2)
+        self.scheduler._intervals = {1:2*HOUR,2:2*HOUR}
+        with patch('meetup.scheduler.sync_groups',return_value=metrics_for([1,2],changed=[1])) as sync:
+            results = self.scheduler.run_pending()
+        self.assertEqual([1,2],sorted(sync.call_args[0][0]))
+        self.assertEqual([1,2],list(results))
+        self.assertEqual(NOW+HOUR,self.scheduler._due[1])
+        self.assertEqual(NOW+4*HOUR,self.scheduler._due[2])
+
+    def test_failed_sync_backs_off (self):
+        self.scheduler.schedule(1)
+        self.scheduler._intervals = {1:HOUR}
+        with patch('meetup.scheduler.sync_groups',return_value=metrics_for([1],changed=[1],failed=[1])):
+            self.scheduler.run_pending()
+        self.assertEqual(NOW+2*HOUR,self.scheduler._due[1])
+
+    def test_run_iterations (self):
+        self.scheduler.schedule(1)
+        sleeps = []
+        def sleep (seconds):
+            sleeps.append(seconds)
+            self.clock.now += seconds
+        self.scheduler.sleep = sleep
+        with patch('meetup.scheduler.sync_groups',side_effect=lambda ids,**kw: metrics_for(ids)):
+            self.scheduler.run(iterations=3)
+        # dormant group: first wait is the maximum
+        self.assertEqual([DAY,DAY],sleeps)
+
+    def test_run_closes_old_connections (self):
+        self.scheduler.schedule(1)
+        with patch('meetup.scheduler.sync_groups',side_effect=lambda ids,**kw: metrics_for(ids)), \
+             patch('meetup.scheduler.close_old_connections') as close:
+            self.scheduler.run(iterations=1)
+        self.assertEqual(2,close.call_count)
+
+    def test_initial_due_follows_last_sync_and_next_event (self):
+        group = Group.objects.create(id=7,name="g",urlname="g",link="https://www.meetup.com/g/",
+                                     visibility="public",lat=0,lon=0)
+        last_sync = fro_meetup_timestamp((NOW-600)*1000)
+        SyncState.objects.create(group=group,endpoint='events',last_sync=last_sync)
+        Event.objects.create(group=group,status='upcoming',visibility='public',
+                             event_timestamp=fro_meetup_timestamp((NOW+2*HOUR)*1000))
+        with patch('meetup.scheduler.next_event',return_value=Event.objects.get()):
+            scheduler = SyncScheduler([7,8],clock=self.clock,cadence=Cadence(300,DAY))
+        # 7 synced 10 minutes ago with an event in 2 hours is due now,
+        # 8 never synced is due now too
+        self.assertEqual(NOW,scheduler._due[7])
+        self.assertEqual(NOW,scheduler._due[8])
+        self.assertEqual(300,scheduler._intervals[7])
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the reports of a sync
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+import datetime
+import json
+from unittest import TestCase
+from meetup.sync_results import SyncDiff,SyncStats
+import unittest
+
+# ########################################################################### #
+
+class TestSyncStats (TestCase):
+
+    def setUp(self):
+        self.stats = SyncStats()
+        self.stats.add('event','inserted',2)
+        self.stats.add('event','unchanged')
+        self.stats.add_unknown_keys('event',['rsvp_rules'],2)
+
+    def test_counts (self):
+        self.assertEqual(2,self.stats.get('event','inserted'))
+        self.assertEqual(0,self.stats.get('venue','inserted'))
+        self.assertEqual(2,self.stats.changed)
+        self.assertEqual("event: 2 inserted, 0 updated, 0 deleted, 1 unchanged",str(self.stats))
+
+    def test_merge (self):
+        other = SyncStats()
+        other.add('venue','updated')
+        other.add_unknown_keys('event',['rsvp_rules','fee'])
+        self.stats.merge(other)
+        self.assertEqual(3,self.stats.changed)
+        self.assertEqual("event: fee (1), rsvp_rules (3)",self.stats.unknown_keys_report())
+
+
+class TestSyncDiff (TestCase):
+
+    def setUp(self):
+        self.diff = SyncDiff()
+        self.diff.add_created('event',3,{'name':"e3",'event_timestamp':datetime.datetime(2014,9,21)})
+        self.diff.add_updated('event',1,{'name':("e1","renamed")})
+        self.diff.add_unchanged('event',4)
+
+    def test_counts (self):
+        self.assertEqual(2,self.diff.changed)
+        self.assertEqual("event: 1 to create, 1 to update, 0 to delete, 4 unchanged",str(self.diff))
+        self.assertEqual(["create event 3","update event 1: name 'e1' -> 'renamed'"],
+                         self.diff.lines())
+
+    def test_merge (self):
+        other = SyncDiff()
+        other.add_deleted('event',[7])
+        other.add_unchanged('event')
+        self.diff.merge(other)
+        self.assertEqual(3,self.diff.changed)
+        self.assertEqual(5,self.diff.unchanged['event'])
+
+    def test_as_dict_is_json (self):
+        data = json.loads(json.dumps(self.diff.as_dict()))
+        self.assertEqual("2014-09-21 00:00:00",data['event']['created']['3']['event_timestamp'])
+        self.assertEqual(["e1","renamed"],data['event']['updated']['1']['name'])
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
@@ -7,51 +7,66 @@ DATE: Mon Sep 15 00:52:58 2014
 """
 # ########################################################################### #
 
-# import modules 
+# import modules
 
 from __future__ import print_function, division, unicode_literals
-import os 
+import datetime
 from unittest import TestCase
-from meetup.sync_utils import fro_meetup_timestamp
+import pytz
+from meetup.sync_utils import fro_meetup_timestamp,to_meetup_timestamp,fro_meetup_geo
 import unittest
 
 # ########################################################################### #
 
-# TODO: implement tests
+MOUNTAIN = pytz.timezone("US/Mountain")
 
 class TestMeetupConversions (TestCase):
-    
+
     def setUp(self):
-        pass 
-        
-    def test_parse_meetup_time ():
-        meetup_time = 1411338964000.0        
-        sol = datetime.datetime(2014,9,21,16,36,4,tzinfo=pytz.timezone("US/Mountain"))
+        self.meetup_time = 1411338964000
+        self.sol = MOUNTAIN.localize(datetime.datetime(2014,9,21,16,36,4))
+
+    def test_parse_meetup_time (self):
         # pass in tz as string
-        tzinfo = "US/Mountain"
-        ans = fro_meetup_timestamp(meetup_time,tzinfo)
-        assert sol == ans 
+        ans = fro_meetup_timestamp(self.meetup_time,"US/Mountain")
+        self.assertEqual(self.sol,ans)
+        self.assertEqual("MDT",ans.tzname())
 
-    def test_parse_meetup_time_tzinfo ():
-        meetup_time = 1411338964000.0        
-        sol = datetime.datetime(2014,9,21,16,36,4,tzinfo=pytz.timezone("US/Mountain"))    
+    def test_parse_meetup_time_tzinfo (self):
         # pass in timezone as object
-        tzinfo = pytz.timezone("US/Mountain")
-        ans = fro_meetup_timestamp(meetup_time,tzinfo)
-        assert sol == ans 
-            
-    def test_to_meetup_timestamp ():        
-        d = datetime.datetime(2014,9,21,16,36,4,tzinfo=pytz.timezone("US/Mountain"))
-        sol = 1411338964000.0   
-        ans = to_meetup_timestamp(d)
-        assert sol == ans 
-                
-    def test_geo_stamp ():
-        pass
-
-
-pass 
+        ans = fro_meetup_timestamp(float(self.meetup_time),MOUNTAIN)
+        self.assertEqual(self.sol,ans)
+
+    def test_parse_meetup_time_utc (self):
+        ans = fro_meetup_timestamp(str(self.meetup_time))
+        self.assertEqual(datetime.datetime(2014,9,21,22,36,4,tzinfo=pytz.utc),ans)
+
+    def test_parse_meetup_time_keeps_milliseconds (self):
+        ans = fro_meetup_timestamp(self.meetup_time+123,"US/Mountain")
+        self.assertEqual(123000,ans.microsecond)
+
+    def test_to_meetup_timestamp (self):
+        ans = to_meetup_timestamp(self.sol)
+        self.assertEqual((self.meetup_time,"US/Mountain"),ans)
+
+    def test_to_meetup_timestamp_naive_is_utc (self):
+        d = datetime.datetime(2014,9,21,22,36,4,5000)
+        self.assertEqual((self.meetup_time+5,"UTC"),to_meetup_timestamp(d))
+
+    def test_round_trip (self):
+        for t in (0,-1500,self.meetup_time,self.meetup_time+999):
+            for tzinfo in ("","US/Mountain","Asia/Tokyo"):
+                d = fro_meetup_timestamp(t,tzinfo)
+                ms,name = to_meetup_timestamp(d)
+                self.assertEqual(t,ms)
+                self.assertEqual(d,fro_meetup_timestamp(ms,name))
+
+    def test_geo_stamp (self):
+        self.assertEqual(40.5,fro_meetup_geo("40.5"))
+        self.assertIsNone(fro_meetup_geo(""))
+
+
 # ########################################################################### #
 if __name__ == "__main__":
-    pass
-    
+    unittest.main()
+
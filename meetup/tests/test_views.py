@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PURPOSE: For testing the views and their per group cache
+
+    django-admin test meetup.tests.test_views --settings=meetup.tests.settings
+"""
+# ########################################################################### #
+
+# import modules
+
+from __future__ import print_function, division, unicode_literals
+from django.test import RequestFactory, TestCase
+from mock import Mock, patch
+from meetup import caching
+from meetup.caching import cached_for_group,get_cache,group_version,invalidate_group
+from meetup.models import Event,Group
+from meetup.tests.test_models_sync import event_data,group_data
+from meetup.sync import sync_group_events
+from meetup.views import next_group_event,past_events_page,upcoming_events,view_upcoming_past_events
+import unittest
+
+# ########################################################################### #
+
+DAY = 86400000
+
+def dated_event (event_id,status="upcoming",**kws):
+    # event i is scheduled i days after the first
+    return event_data(event_id,status=status,time=1411338964000+event_id*DAY,**kws)
+
+
+class TestGroupCache (TestCase):
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def test_value_is_built_once (self):
+        build = Mock(return_value=[1,2])
+        self.assertEqual([1,2],cached_for_group(1,"numbers",build))
+        self.assertEqual([1,2],cached_for_group(1,"numbers",build))
+        self.assertEqual(1,build.call_count)
+
+    def test_cached_none_is_a_hit (self):
+        build = Mock(return_value=None)
+        cached_for_group(1,"nothing",build)
+        self.assertIsNone(cached_for_group(1,"nothing",build))
+        self.assertEqual(1,build.call_count)
+
+    def test_invalidate_changes_the_version (self):
+        version = group_version(1)
+        self.assertEqual(version,group_version(1))
+        other = group_version(2)
+        build = Mock(side_effect=["old","new"])
+        cached_for_group(1,"value",build)
+        invalidate_group(1)
+        self.assertNotEqual(version,group_version(1))
+        self.assertEqual(other,group_version(2))
+        self.assertEqual("new",cached_for_group(1,"value",build))
+
+    def test_invalidate_leaves_other_groups (self):
+        build = Mock(return_value="two")
+        cached_for_group(2,"value",build)
+        invalidate_group(1)
+        cached_for_group(2,"value",build)
+        self.assertEqual(1,build.call_count)
+
+    def test_disabled (self):
+        build = Mock(return_value="value")
+        with patch('meetup.caching.MEETUP_VIEW_CACHE',None):
+            self.assertIsNone(caching.get_cache())
+            cached_for_group(1,"value",build)
+            cached_for_group(1,"value",build)
+            invalidate_group(1)
+        self.assertEqual(2,build.call_count)
+
+
+class TestViews (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data(
+            [dated_event(i) for i in range(1,4)]+[dated_event(i,status="past") for i in range(4,9)])
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def test_upcoming_events (self):
+        pairs = upcoming_events(1,limit=2)
+        # the next two, latest first
+        self.assertEqual([2,1],[event.pk for event,_ in pairs])
+        self.assertEqual([1,1],[venue.pk for _,venue in pairs])
+        with self.assertNumQueries(0):
+            self.assertEqual([2,1],[event.pk for event,_ in upcoming_events(1,limit=2)])
+
+    def test_past_events_page (self):
+        page = past_events_page(1,2,per_page=2)
+        self.assertEqual([6,5],[event.pk for event,_ in page.object_list])
+        self.assertEqual(3,page.paginator.num_pages)
+        self.assertTrue(page.has_next())
+        with self.assertNumQueries(0):
+            page = past_events_page(1,2,per_page=2)
+        self.assertEqual([6,5],[event.pk for event,_ in page.object_list])
+        self.assertEqual(5,page.paginator.count)
+        # out of range gives the last page
+        self.assertEqual([4],[event.pk for event,_ in past_events_page(1,9,per_page=2).object_list])
+
+    def test_invalidated_by_a_write (self):
+        upcoming_events(1,limit=5)
+        Event.objects.bulk_from_meetup_data([dated_event(9)])
+        self.assertEqual(3,len(upcoming_events(1,limit=5)))
+        invalidate_group(1)
+        self.assertEqual([9,3,2,1],[event.pk for event,_ in upcoming_events(1,limit=5)])
+
+    def test_view_upcoming_past_events (self):
+        request = RequestFactory().get("/events/",{'page':"1"})
+        with patch('meetup.views.render') as render:
+            view_upcoming_past_events(request)
+            with self.assertNumQueries(0):
+                view_upcoming_past_events(request)
+        self.assertEqual("meetup/events.html",render.call_args[0][1])
+        context = render.call_args[0][2]
+        self.assertEqual(1,context['group'].pk)
+        self.assertEqual([3,2,1],[event.pk for event,_ in context['upcoming_events']])
+        self.assertEqual([8,7,6,5,4],[event.pk for event,_ in context['past_events'].object_list])
+        self.assertEqual(context['upcoming_events']+list(context['past_events'].object_list),
+                         context['events_venues'])
+
+
+class TestNextEvent (TestCase):
+
+    def setUp (self):
+        Group.objects.from_meetup_data(group_data())
+        Event.objects.bulk_from_meetup_data([dated_event(i) for i in (2,3)])
+
+    def tearDown (self):
+        get_cache().clear()
+
+    def test_served_from_cache (self):
+        self.assertEqual(2,next_group_event(1).pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(2,next_group_event(1).pk)
+            self.assertEqual(2,caching.next_event(1).pk)
+        # a filter is not cached
+        with self.assertNumQueries(1):
+            self.assertEqual(3,next_group_event(1,pk=3).pk)
+
+    def test_no_upcoming_event_is_cached (self):
+        self.assertIsNone(next_group_event(2))
+        with self.assertNumQueries(0):
+            self.assertIsNone(next_group_event(2))
+
+    def test_not_cached_when_disabled (self):
+        with patch('meetup.caching.MEETUP_CACHE_NEXT_EVENT',False):
+            next_group_event(1)
+            with self.assertNumQueries(1):
+                next_group_event(1)
+
+    def test_sync_refreshes (self):
+        self.assertEqual(2,next_group_event(1).pk)
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[dated_event(1)]}])
+        sync_group_events(1,client,full=True)
+        # cached again by the sync, the page does not query
+        with self.assertNumQueries(0):
+            self.assertEqual(1,next_group_event(1).pk)
+
+    def test_sync_without_changes_keeps_the_cache (self):
+        self.assertEqual(2,next_group_event(1).pk)
+        version = group_version(1)
+        client = Mock()
+        client.invoke.return_value = {'results':[group_data()]}
+        client.iter_pages.return_value = iter([{'results':[dated_event(2)]}])
+        sync_group_events(1,client,full=True)
+        self.assertEqual(version,group_version(1))
+
+
+# ########################################################################### #
+if __name__ == "__main__":
+    unittest.main()
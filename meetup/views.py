@@ -9,11 +9,16 @@ DATE: Tue Sep 16 08:40:49 2014
 
 from __future__ import print_function, division, unicode_literals
 from django.conf import settings
-from django.shortcuts import render,render_to_response
+from django.core.paginator import Paginator,Page,EmptyPage,PageNotAnInteger
+from django.shortcuts import render
+from meetup.caching import cached_for_group,next_event
 from meetup.models import Venue,Group,Event
-from django.template import RequestContext
 
 MEETUP_GROUP_ID = getattr(settings,"MEETUP_GROUP_ID",None)
+# most upcoming events listed by view_upcoming_past_events
+MEETUP_UPCOMING_EVENTS = getattr(settings,"MEETUP_UPCOMING_EVENTS",20)
+# past events per page of view_upcoming_past_events
+MEETUP_PAST_EVENTS_PER_PAGE = getattr(settings,"MEETUP_PAST_EVENTS_PER_PAGE",20)
 
 # ########################################################################### #
 
@@ -23,6 +28,9 @@ def next_group_event (group=MEETUP_GROUP_ID,**filter):
     default group is from ``django.conf.settings.MEETUP_GROUP_ID``. If None then
     you will have to give the group explicitly when calling this function
 
+    Without a filter the event is cached per group (see
+    ``settings.MEETUP_CACHE_NEXT_EVENT``) and refreshed by sync.
+
     Parameters
     ----------
     group : Group.object or Group.object.pk
@@ -34,34 +42,84 @@ def next_group_event (group=MEETUP_GROUP_ID,**filter):
     next : single Event.object or None
 
     """
-    filter['status'] = 'upcoming'
-    filter['group'] = Group.objects.get(pk=group)
-    events = Event.objects.filter(**filter).order_by("-event_timestamp")
-    n = len(events)
-    if n > 0:
-        return events[n-1]
+    group_id = getattr(group,'pk',group)
+    if filter:
+        return Event.objects.next_upcoming(group_id,**filter)
+    return next_event(group_id)
+
+def _events_with_venue (queryset):
+    """ List of (event, venue or None) with the venues prefetched """
+    pairs = []
+    for event in queryset.prefetch_related('venue'):
+        # all() is served by the prefetch, get() would query again
+        venues = list(event.venue.all())
+        pairs.append((event,venues[0] if venues else None))
+    return pairs
+
+def _page_number (value):
+    try:
+        return max(1,int(value))
+    except (TypeError,ValueError):
+        return 1
+
+def upcoming_events (group_id,limit=MEETUP_UPCOMING_EVENTS):
+    """ (event, venue) of the group's next ``limit`` events, cached """
+    def build ():
+        events = Event.objects.filter(status="upcoming",group=group_id).order_by("event_timestamp")
+        # latest first as the page has always listed them
+        return _events_with_venue(events[:limit])[::-1]
+    return cached_for_group(group_id,"upcoming:{}".format(limit),build)
+
+def past_events_page (group_id,number=1,per_page=MEETUP_PAST_EVENTS_PER_PAGE):
+    """ Page of (event, venue) of the group's past events, latest first, cached
+
+    Out of range page numbers give the last page.
+    """
+    def build ():
+        events = Event.objects.filter(status="past",group=group_id).order_by("-event_timestamp")
+        paginator = Paginator(events,per_page)
+        try:
+            page = paginator.page(number)
+        except (EmptyPage,PageNotAnInteger):
+            page = paginator.page(paginator.num_pages)
+        return paginator.count,page.number,_events_with_venue(page.object_list)
+    count,number,pairs = cached_for_group(
+        group_id,"past:{}:{}".format(per_page,number),build)
+    # rebuild the page around the cached rows without counting again
+    paginator = Paginator([],per_page)
+    paginator.count = count
+    return Page(pairs,number,paginator)
 
 def view_upcoming_past_events (request):
-    context = RequestContext(request)
-    group_id = MEETUP_GROUP_ID
+    """ The group's upcoming events and one page (``?page=``) of past events
 
-    group = Group.objects.get(pk=group_id)
+    Context
+    -------
+    group : Group.object
+    upcoming_events : list of (Event.object, Venue.object or None)
+    past_events : django.core.paginator.Page of (Event.object, Venue.object or None)
+    events_venues : list of (Event.object, Venue.object or None)
+        upcoming then the page of past events
+    """
+    group_id = MEETUP_GROUP_ID
 
-    events = list(Event.objects.order_by("-event_timestamp").filter(status="upcoming",group=group_id))
-    events += list(Event.objects.order_by("-event_timestamp").filter(status="past",group=group_id))
-    venues = [e.venue.get() for e in events]
+    group = cached_for_group(group_id,"group",lambda: Group.objects.get(pk=group_id))
+    upcoming = upcoming_events(group_id)
+    past = past_events_page(group_id,_page_number(request.GET.get('page')))
 
     context_dict = dict()
-    context_dict['events_venues'] = zip(events,venues)
+    context_dict['events_venues'] = upcoming+list(past.object_list)
+    context_dict['upcoming_events'] = upcoming
+    context_dict['past_events'] = past
     context_dict['group'] = group
 
-    return render_to_response("meetup/events.html",context_dict,context)
+    return render(request,"meetup/events.html",context_dict)
 
 def view_next_event (template):
     def render_view (request):
-        context = RequestContext(request)
         context_dict = dict(next_group_event=next_group_event())
-        return render_to_response(template,context_dict,context)
+        return render(request,template,context_dict)
+    return render_view
 
 # NOTES:
 #
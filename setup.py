@@ -40,6 +40,6 @@ setup(
     ],
     
     install_requires=install_requires, 
-    packages=find_packages(),  
+    packages=find_packages(exclude=['benchmarks','benchmarks.*']),
     include_package_data=True,         
 )